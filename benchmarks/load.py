@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(path)
+from optimization import service as svc
+from benchmarks import parks as bp
+
+'''
+This file considers load testing the optimization service (optimization/service.py) locally, with no outside services.
+- Request bodies come from the synthetic parks, with a number of distinct problems that the requests cycle through, so the share of coalesced solves can be controlled
+- Requests are sent by a pool of client threads, and the report has the throughput, the latency percentiles and the count of each status code (e.g., 429 once the service is at capacity)
+- With --serve, the service runs in this process on a free port, so a load test needs no other command
+- Usage: python -m benchmarks.load --serve --requests 200 --concurrency 16 --distinct 8 [--url http://127.0.0.1:8000]
+'''
+
+
+# Returns the body of a request for a synthetic park
+def set_body(park: bp.SyntheticPark, time_assumption: str = "constant", objective: str = "maximize", deadline: typing.Optional[float] = None) -> dict:
+    user_preferences = park.user_preferences
+    body = {
+        "time_assumption": time_assumption,
+        "objective": objective,
+        "rides": park.all_rides,
+        "wait_times": park.set_constant_wait_times() if time_assumption == "constant" else [park.set_dynamic_wait_times()[time_step] for time_step in range(1, park.time_steps+1)],
+        "preferences": {name: getattr(user_preferences, name) for name in svc.PREFERENCES},
+    }
+    if time_assumption == "dynamic":
+        body["frequency"] = park.frequency
+    if deadline != None:
+        body["deadline"] = deadline
+    return body
+
+# Sends the requests from a pool of client threads, returning the load test report
+def run(url: str, bodies: list, num_requests: int, concurrency: int) -> dict:
+    sessions = threading.local()
+
+    def send(index: int) -> tuple:
+        # One session per client thread, so that connections are kept alive between its requests
+        if getattr(sessions, "session", None) == None:
+            sessions.session = requests.Session()
+        start = time.perf_counter()
+        response = sessions.session.post(f"{url}/v1/optimize", json=bodies[index % len(bodies)], timeout=600)
+        return (response.status_code, time.perf_counter() - start, response.json().get("coalesced", False))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, range(num_requests)))
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    latencies = np.array([latency for status, latency, _ in results if status == 200])
+    return {
+        "requests": num_requests,
+        "concurrency": concurrency,
+        "distinct": len(bodies),
+        "seconds": elapsed,
+        "throughput": num_requests / elapsed,
+        "statuses": statuses,
+        "coalesced": sum(1 for _, _, coalesced in results if coalesced),
+        "latency": {f"p{q}": float(np.percentile(latencies, q)) for q in (50, 90, 99)} if len(latencies) else None,
+    }
+
+# Starts the service in a background thread on a free port, returning its URL
+def start_service(service: svc.OptimizationService) -> str:
+    ready = threading.Event()
+    ports = []
+
+    def on_ready(port: int):
+        ports.append(port)
+        ready.set()
+
+    threading.Thread(target=lambda: asyncio.run(svc.serve(service, "127.0.0.1", 0, ready=on_ready)), daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{ports[0]}"
+
+
+def main(arguments: typing.Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the optimization service")
+    parser.add_argument("--url", help="URL of a running service (the service is started in this process with --serve)")
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes of the service started with --serve")
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of client threads")
+    parser.add_argument("--distinct", type=int, default=8, help="Number of distinct problems that the requests cycle through")
+    parser.add_argument("--rides", type=int, default=50)
+    parser.add_argument("--time-steps", type=int, default=1, help="Number of time steps (more than 1 sends dynamic problems)")
+    parser.add_argument("--deadline", type=float, default=None)
+    args = parser.parse_args(arguments)
+    if args.url == None and not args.serve:
+        parser.error("either --url or --serve is required")
+
+    service = None
+    url = args.url
+    if url == None:
+        service = svc.OptimizationService(args.workers, args.queue_size)
+        url = start_service(service)
+    time_assumption = "dynamic" if args.time_steps > 1 else "constant"
+    bodies = [set_body(bp.SyntheticPark(args.rides, args.time_steps, "sparse", seed), time_assumption, deadline=args.deadline) for seed in range(args.distinct)]
+    try:
+        print(json.dumps(run(url.rstrip("/"), bodies, args.requests, args.concurrency), indent=2))
+    finally:
+        if service != None:
+            service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import numpy as np
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(path)
+from optimization import user_preferences as up
+
+'''
+This file considers generating synthetic parks for the benchmarks, so that every commit is timed against the same problems.
+- Every park is reproducible from its number of rides, number of time steps, preference density and seed
+- Each ride has a popularity, and its wait times follow a shared daily profile (short lines in the morning and evening, long lines around midday) with some noise
+- The day lasts DAY_LENGTH minutes, so the frequency of a dynamic park gets shorter as its number of time steps grows
+- The preference densities go from "none" (only the time and total rides preferences that the problems need) to "dense" (every preference is set)
+'''
+
+# Minutes from park opening to closing
+DAY_LENGTH = 720
+
+# Fractions and counts of the preferences at each density
+#   - required and avoid are fractions of the rides (at least one ride each when the fraction is not 0), and min_distinct is a fraction of the rides that are not avoided
+DENSITIES = {
+    "none": {"required": 0, "avoid": 0, "min_distinct": 0, "max_ride_repeats": None},
+    "sparse": {"required": 0.02, "avoid": 0.05, "min_distinct": 0, "max_ride_repeats": 4},
+    "dense": {"required": 0.05, "avoid": 0.1, "min_distinct": 0.25, "max_ride_repeats": 2},
+}
+
+
+class SyntheticPark():
+    def __init__(self, num_rides: int, time_steps: int = 1, density: str = "sparse", seed: int = 0) -> None:
+        if density not in DENSITIES:
+            raise ValueError(f"Unknown preference density: {density}")
+        self.num_rides = num_rides
+        self.time_steps = time_steps
+        self.density = density
+        self.seed = seed
+        self.all_rides = [f"Ride {i}" for i in range(num_rides)]
+        self.frequency = DAY_LENGTH // time_steps
+        random = np.random.RandomState([num_rides, time_steps, seed])
+        # A rides x time steps matrix of wait times (in minutes, rounded to 5 like the park data), from the popularity of each ride and the time of day
+        popularity = random.gamma(2, 12, num_rides)
+        middles = (np.arange(time_steps) + 0.5) / time_steps
+        profile = 0.5 + np.sin(np.pi * middles)
+        noise = random.uniform(0.8, 1.2, (num_rides, time_steps))
+        self.values = np.clip(5 * np.round(popularity[:, None] * profile[None, :] * noise / 5), 5, 180).astype(int)
+        self.user_preferences = self.set_user_preferences(random)
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the user preferences of the density, where the required rides are ones that fit in half of a time step
+    def set_user_preferences(self, random: np.random.RandomState) -> up.UserPreferences:
+        density = DENSITIES[self.density]
+        max_time = DAY_LENGTH * 2 // 3
+        order = random.permutation(self.num_rides)
+        num_avoid = int(np.ceil(density["avoid"] * self.num_rides))
+        avoid = [self.all_rides[i] for i in order[:num_avoid]]
+        fits = [i for i in order[num_avoid:] if self.values[i].min() <= self.frequency / 2]
+        # The required rides are also capped by the number of them whose longest wait times fit in a quarter of the max time
+        num_required = min(int(np.ceil(density["required"] * self.num_rides)), int(np.searchsorted(np.cumsum(self.values[fits].max(axis=1)), max_time / 4, side="right")))
+        required = [self.all_rides[i] for i in fits[:num_required]]
+        # The min distinct rides are capped by the number of rides whose longest wait times fit in half of the max time, so that every park is feasible
+        longest = np.sort(self.values[order[num_avoid:]].max(axis=1))
+        min_distinct = min(int(density["min_distinct"] * (self.num_rides - num_avoid)), int(np.searchsorted(np.cumsum(longest), max_time / 2, side="right")))
+        return up.UserPreferences(
+            required_rides=required if required else None,
+            avoid_rides=avoid if avoid else None,
+            min_distinct_rides=min_distinct if min_distinct > 0 else None,
+            max_ride_repeats=density["max_ride_repeats"],
+            max_time=max_time,
+            min_total_rides=max(num_required, min_distinct, 10),
+        )
+
+    # Returns the wait times of every ride at the first time step, as the wait_times of OptimizeConstant
+    def set_constant_wait_times(self) -> list:
+        return self.values[:, 0].tolist()
+
+    # Returns a dict where the keys are time steps, and the values are lists of the wait times of every ride at that time step, as the wait_times of OptimizeDynamic
+    def set_dynamic_wait_times(self) -> dict:
+        return {time_step: self.values[:, time_step-1].tolist() for time_step in range(1, self.time_steps+1)}
+
+    def __repr__(self) -> str:
+        return f"SyntheticPark(num_rides={self.num_rides}, time_steps={self.time_steps}, density={self.density!r}, seed={self.seed})"
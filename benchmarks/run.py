@@ -0,0 +1,253 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+import typing
+import numpy as np
+import pulp
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(path)
+from optimization import constant_times as ct
+from optimization import dynamic_times as dt
+from optimization import solvers as sv
+from benchmarks import parks as bp
+
+'''
+This file considers timing the optimizers on the synthetic parks, and comparing the timings between commits.
+- Model build (Python and PuLP), solve (the solver backend) and result extraction are timed separately for the MILP of each method, so that it is clear which one dominates at each size
+- The end to end time of each public method (including its preflight and presolve) is timed as well, along with the methods that do not build a single MILP (the knapsack DP and the Lagrangian decomposition)
+- The import time of the optimization modules (and the solver prewarm) is timed in fresh interpreters, since it is paid by every cold start of the app and the workers
+- Results are written as JSON, with one record per (method, park) pair and one per import, and compare() reports the records that got slower than a baseline file
+- Usage: python -m benchmarks.run --grid quick --output results.json [--compare baseline.json]
+'''
+
+# Sizes of the parks in each grid: numbers of rides, numbers of time steps (the constant times methods only use the first one) and preference densities
+GRIDS = {
+    "quick": {"rides": [10, 50], "time_steps": [1, 4], "densities": ["sparse"]},
+    "default": {"rides": [10, 50, 100, 250], "time_steps": [1, 4, 12], "densities": ["none", "sparse", "dense"]},
+    "full": {"rides": [10, 50, 100, 250, 500], "time_steps": [1, 4, 12, 24, 48], "densities": ["none", "sparse", "dense"]},
+}
+
+# (optimizer, method, keyword arguments, objective) of every benchmarked method
+#   - objective is the MILP timed phase by phase ("maximize" or "minimize"), or None for the methods that are only timed end to end
+METHODS = [
+    ("OptimizeConstant", "maximize_rides", {}, "maximize"),
+    ("OptimizeConstant", "maximize_rides", {"solver": "dp"}, None),
+    ("OptimizeConstant", "minimize_time", {}, "minimize"),
+    ("OptimizeDynamic", "maximize_rides", {}, "maximize"),
+    ("OptimizeDynamic", "maximize_rides_decomposed", {"workers": 1}, None),
+    ("OptimizeDynamic", "minimize_time", {}, "minimize"),
+]
+
+# Modules whose import is timed, each in a fresh interpreter
+#   - "optimization.solvers.prewarm" times solvers.prewarm() right after importing the solvers, i.e., the first solve of a process
+IMPORTS = ["optimization", "optimization.constant_times", "optimization.dynamic_times", "optimization.solvers.prewarm"]
+
+# Heavy dependencies that are reported when an import loads them
+DEPENDENCIES = ["numpy", "pandas", "pulp", "pyarrow", "highspy"]
+
+
+# Returns the optimizer of a method for a synthetic park
+def set_optimizer(name: str, park: bp.SyntheticPark, solver_config: sv.SolverConfig):
+    if name == "OptimizeConstant":
+        return ct.OptimizeConstant(park.all_rides, park.set_constant_wait_times(), park.user_preferences, solver_config=solver_config)
+    return dt.OptimizeDynamic(park.all_rides, park.time_steps, park.frequency, park.set_dynamic_wait_times(), park.user_preferences, solver_config=solver_config)
+
+# Returns the objective value of a solution returned by a method (the number of rides, or the total time of the minimization problem)
+def set_objective_value(solution, ride_weights, objective: typing.Optional[str]):
+    if solution == None:
+        return None
+    if hasattr(solution, "objective"):
+        return float(solution.objective)
+    if objective == "minimize":
+        return float(sum(value * (ride_weights[key[0]][key[1]-1] if isinstance(key, tuple) else ride_weights[key]) for key, value in solution.items()))
+    return float(sum(solution.values()))
+
+# Times the build, solve and extraction of the MILP of a method, returning a dict of the timings (the smallest of every repetition) and the model size
+def time_phases(optimizer, ride_weights, objective: str, repeats: int) -> dict:
+    build = optimizer.build_maximize_problem if objective == "maximize" else optimizer.build_minimize_problem
+    timings = {"build": [], "solve": [], "extract": []}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        prob, rides = build(ride_weights)
+        timings["build"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        report = sv.solve(prob, optimizer.solver_config)
+        timings["solve"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        solution = {key: variable.varValue for key, variable in rides.items()}
+        timings["extract"].append(time.perf_counter() - start)
+    record = {phase: min(values) for phase, values in timings.items()}
+    record.update({
+        # The solver's own wall time, without PuLP writing and reading the model
+        "solver_wall_time": report.wall_time,
+        "variables": prob.numVariables(),
+        "constraints": prob.numConstraints(),
+        "status": report.status,
+        "proven": report.set_proven_value(),
+        "gap": report.gap,
+        "milp_objective": pulp.value(prob.objective) if report.status == "Optimal" else None,
+    })
+    return record
+
+# Times a method on a synthetic park, returning its benchmark record
+def time_method(name: str, method: str, kwargs: dict, objective: typing.Optional[str], park: bp.SyntheticPark, solver_config: sv.SolverConfig, repeats: int = 1) -> dict:
+    record = {
+        "optimizer": name,
+        "method": method,
+        "options": kwargs,
+        "rides": park.num_rides,
+        "time_steps": park.time_steps if name == "OptimizeDynamic" else 1,
+        "density": park.density,
+        "seed": park.seed,
+    }
+    optimizer = set_optimizer(name, park, solver_config)
+    ride_weights = optimizer.set_ride_weights()
+    if objective != None:
+        record.update(time_phases(optimizer, ride_weights, objective, repeats))
+    totals = []
+    for _ in range(repeats):
+        # A fresh optimizer, so that no state is reused between repetitions
+        optimizer = set_optimizer(name, park, solver_config)
+        start = time.perf_counter()
+        solution = getattr(optimizer, method)(ride_weights, **kwargs)
+        totals.append(time.perf_counter() - start)
+    record["total"] = min(totals)
+    record["objective"] = set_objective_value(solution, ride_weights, objective if objective != None else "maximize")
+    return record
+
+# Times an import in a fresh interpreter, returning its benchmark record (the smallest time of every repetition, and the heavy dependencies it loaded)
+def time_import(module: str, repeats: int = 1) -> dict:
+    if module.endswith(".prewarm"):
+        statement = "from optimization import solvers as sv; start = time.perf_counter(); sv.prewarm()"
+    else:
+        statement = f"start = time.perf_counter(); import {module}"
+    code = f"import json, sys, time; {statement}; print(json.dumps([time.perf_counter() - start, [name for name in {DEPENDENCIES!r} if name in sys.modules]]))"
+    totals = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=path, capture_output=True, text=True, timeout=120, check=True).stdout
+        total, loaded = json.loads(output.strip().splitlines()[-1])
+        totals.append(total)
+    return {"module": module, "total": min(totals), "loaded": loaded}
+
+# Returns the (park, method) pairs of a grid, with the constant times methods only on the first number of time steps
+def set_cases(grid: dict, seed: int = 0) -> list:
+    cases = []
+    for density in grid["densities"]:
+        for num_rides in grid["rides"]:
+            for time_steps in grid["time_steps"]:
+                park = bp.SyntheticPark(num_rides, time_steps, density, seed)
+                for name, method, kwargs, objective in METHODS:
+                    if name == "OptimizeConstant" and time_steps != grid["time_steps"][0]:
+                        continue
+                    cases.append((park, name, method, kwargs, objective))
+    return cases
+
+# Returns the environment the benchmarks ran in, so that results from different machines or commits are not compared blindly
+def set_metadata(solver_config: sv.SolverConfig, grid: str) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=path, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pulp": pulp.__version__,
+        "solver": repr(solver_config),
+        "grid": grid,
+    }
+
+# Runs every case of a grid, returning the benchmark results as a JSON-serializable dict
+#   - progress is called with each record as soon as it is timed (e.g., to print it)
+def run(grid: str = "quick", solver_config: typing.Optional[sv.SolverConfig] = None, repeats: int = 1, seed: int = 0, progress: typing.Optional[typing.Callable] = None) -> dict:
+    if grid not in GRIDS:
+        raise ValueError(f"Unknown grid: {grid}")
+    # Every solve is capped, so that a hard instance does not stall the whole benchmark
+    solver_config = solver_config if solver_config != None else sv.SolverConfig(time_limit=30)
+    imports = []
+    for module in IMPORTS:
+        record = time_import(module, repeats)
+        imports.append(record)
+        if progress != None:
+            progress(record)
+    records = []
+    for park, name, method, kwargs, objective in set_cases(GRIDS[grid], seed):
+        record = time_method(name, method, kwargs, objective, park, solver_config, repeats)
+        records.append(record)
+        if progress != None:
+            progress(record)
+    return {"metadata": set_metadata(solver_config, grid), "imports": imports, "results": records}
+
+# Returns the key of a record, which is the same for the records of the same method and park in two result files
+def set_record_key(record: dict) -> tuple:
+    return (record["optimizer"], record["method"], json.dumps(record["options"], sort_keys=True), record["rides"], record["time_steps"], record["density"], record["seed"])
+
+# Returns the regressions between two result files, as dicts of the record key, the phase, and the baseline and current timings
+#   - A phase regressed if it got slower by more than threshold times, and by more than min_seconds (so that noise on tiny timings is ignored)
+def compare(baseline: dict, current: dict, threshold: float = 1.25, min_seconds: float = 0.01) -> list:
+    baseline_records = {set_record_key(record): record for record in baseline["results"]}
+    regressions = []
+    for record in current["results"]:
+        previous = baseline_records.get(set_record_key(record))
+        if previous == None:
+            continue
+        for phase in ("build", "solve", "extract", "total"):
+            if previous.get(phase) == None or record.get(phase) == None:
+                continue
+            if record[phase] > previous[phase] * threshold and record[phase] - previous[phase] > min_seconds:
+                regressions.append({"case": set_record_key(record), "phase": phase, "baseline": previous[phase], "current": record[phase]})
+    # Result files from before the import timings have no imports to compare
+    baseline_imports = {record["module"]: record for record in baseline.get("imports", [])}
+    for record in current.get("imports", []):
+        previous = baseline_imports.get(record["module"])
+        if previous != None and record["total"] > previous["total"] * threshold and record["total"] - previous["total"] > min_seconds:
+            regressions.append({"case": ("import", record["module"]), "phase": "import", "baseline": previous["total"], "current": record["total"]})
+    return regressions
+
+# Returns a one line summary of a record
+def set_summary(record: dict) -> str:
+    if "module" in record:
+        return f"import {record['module']}: total={record['total']:.4f}s loaded={','.join(record['loaded']) or None}"
+    phases = " ".join(f"{phase}={record[phase]:.4f}s" for phase in ("build", "solve", "extract", "total") if record.get(phase) != None)
+    options = "".join(f" {key}={value}" for key, value in record["options"].items())
+    return f"{record['optimizer']}.{record['method']}{options} rides={record['rides']} time_steps={record['time_steps']} density={record['density']}: {phases} objective={record['objective']}"
+
+
+def main(arguments: typing.Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time the optimizers on synthetic parks")
+    parser.add_argument("--grid", choices=sorted(GRIDS.keys()), default="quick")
+    parser.add_argument("--backend", choices=sv.BACKENDS, default="cbc")
+    parser.add_argument("--time-limit", type=float, default=30, help="Solver time limit of every solve, in seconds")
+    parser.add_argument("--repeats", type=int, default=1, help="Number of repetitions of every timing (the smallest one is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Path of the JSON results (printed to stdout if not given)")
+    parser.add_argument("--compare", help="Path of baseline JSON results to report the regressions against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio that counts as a regression")
+    args = parser.parse_args(arguments)
+
+    solver_config = sv.SolverConfig(backend=args.backend, time_limit=args.time_limit)
+    results = run(args.grid, solver_config, args.repeats, args.seed, progress=lambda record: print(set_summary(record), file=sys.stderr))
+    if args.output != None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare != None:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), results, args.threshold)
+        for regression in regressions:
+            print(f"Regression in {regression['phase']} of {regression['case']}: {regression['baseline']:.4f}s -> {regression['current']:.4f}s", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
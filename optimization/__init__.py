@@ -0,0 +1,23 @@
+import importlib
+
+'''
+This file considers importing the optimization package on its own, without importing any of its modules (or their dependencies) until they are used.
+- Each module is imported on its first access as an attribute of the package (e.g., optimization.constant_times), and `from optimization import constant_times` works as usual
+- Within the modules, pulp, numpy, pandas and pyarrow.compute are lazy imports (see lazy_imports.py), so importing an optimizer only costs its own Python code
+- solvers.prewarm finds the solver and runs a trivial solve, so that a process can pay for both at startup rather than on its first request
+'''
+
+MODULES = (
+    "anytime", "batch", "constant_times", "decomposition", "dynamic_times", "forecast", "group", "instrumentation", "itinerary", "knapsack", "lazy_imports", "park_service",
+    "persistent_model", "preflight", "presolve", "robust", "robustness", "rolling_horizon", "service", "solution_cache", "solver_pool", "solvers", "sweep", "user_preferences", "wait_time_store", "weight_matrix",
+)
+
+
+# Imports a module of the package on its first access
+def __getattr__(name: str):
+    if name in MODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__() -> list:
+    return sorted(list(globals().keys()) + list(MODULES))
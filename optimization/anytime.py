@@ -0,0 +1,288 @@
+from __future__ import annotations
+import copy
+import time
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import solvers as sv
+from optimization import weight_matrix as wm
+np = li.lazy_import("numpy")
+pulp = li.lazy_import("pulp")
+
+'''
+This file considers solving the dynamic optimization problems in anytime mode, so that a good plan is available right away and keeps improving until a deadline.
+- A greedy plan goes on the rides with the shortest total times first (i.e., the most rides per minute), while keeping the required, avoid, min distinct and max ride repeats preferences
+- A local search then drops one ride at a time and refills the freed time greedily, keeping every change that improves the plan
+- Finally, the exact MILP is warm started from the best plan, with a solver time limit of whatever time is left before the deadline
+- Every improvement is yielded as a (solution, objective, bound) tuple, where the bound is the best known bound on the optimal objective, so the caller can stop at any point
+'''
+
+# Below this many seconds before the deadline, the MILP is not started
+MIN_SOLVE_TIME = 0.05
+
+
+# Returns the max number of items that fit in a capacity when each item can be taken up to its upper bound times and may be split (a fractional knapsack, where every item is worth 1)
+def fractional_knapsack(weights: np.ndarray, upper_bounds: np.ndarray, capacity: float) -> float:
+    order = np.argsort(weights, kind="stable")
+    total = 0.0
+    for weight, bound in zip(weights[order].tolist(), upper_bounds[order].tolist()):
+        if bound <= 0:
+            continue
+        if weight <= 0:
+            total += bound
+            continue
+        amount = min(bound, capacity / weight)
+        total += amount
+        capacity -= amount * weight
+        if capacity <= 0:
+            break
+    return total
+
+
+class AnytimeSolver():
+    def __init__(self, optimizer, ride_weights: dict, objective: str = "maximize", solver_config: typing.Optional[sv.SolverConfig] = None) -> None:
+        if objective not in ("maximize", "minimize"):
+            raise ValueError(f"Unknown objective: {objective}")
+        # An OptimizeDynamic, whose preferences and MILP the solver follows
+        self.optimizer = optimizer
+        self.weights = wm.WeightMatrix.from_dict(ride_weights)
+        self.values = self.weights.matrix.astype(float)
+        self.objective = objective
+        self.solver_config = solver_config if solver_config != None else (optimizer.solver_config if optimizer.solver_config != None else sv.SolverConfig())
+        self.frequency = float(optimizer.frequency)
+        self.max_time = optimizer.max_time
+        self.min_distinct_rides = optimizer.min_distinct_rides
+        self.min_total_rides = optimizer.min_total_rides
+        self.required = np.array([ride in (optimizer.required_rides or []) for ride in self.weights.rides], dtype=bool)
+        self.avoid = np.array([ride in (optimizer.avoid_rides or []) for ride in self.weights.rides], dtype=bool)
+        repeats = float(optimizer.max_ride_repeats) if optimizer.max_ride_repeats != None else np.inf
+        self.ride_limits = np.where(self.avoid, 0, repeats)
+        # Every (ride, time step) cell, from the shortest total time to the longest
+        rows, columns = np.unravel_index(np.argsort(self.values, axis=None, kind="stable"), self.values.shape)
+        self.cells = list(zip(rows.tolist(), columns.tolist()))
+        # The stage ("greedy", "local search" or "milp") of the latest yielded plan, and the SolveReport of the MILP
+        self.stage = None
+        self.last_report = None
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns a bool as to whether a ride can be rode an unlimited number of times (a zero total time with no max ride repeats), which makes the maximization problem unbounded
+    def set_unbounded_value(self) -> bool:
+        return self.objective == "maximize" and bool(np.any((self.values <= 0) & np.isinf(self.ride_limits)[:, None]))
+
+    # Returns the objective value of a rides x time steps matrix of counts
+    def set_objective_value(self, counts: np.ndarray) -> float:
+        if self.objective == "maximize":
+            return float(counts.sum())
+        return float((counts * self.values).sum())
+
+    # Returns a key that is larger for a better plan (for the maximization problem, a plan with the same number of rides but less time is better, since it leaves more room)
+    def set_rank(self, counts: np.ndarray) -> tuple:
+        if self.objective == "maximize":
+            return (float(counts.sum()), -float((counts * self.values).sum()))
+        return (-float((counts * self.values).sum()),)
+
+    # Returns the best known bound on the optimal objective value, from relaxations that are cheap to solve
+    #   - Maximize: the fewest rides of a fractional knapsack per time step, over all time steps, and over the max time
+    #   - Minimize: the least time of the min total rides when every ride can be rode at its shortest total time
+    def set_bound(self) -> float:
+        limits = np.broadcast_to(self.ride_limits[:, None], self.values.shape)
+        if self.objective == "maximize":
+            bound = sum(fractional_knapsack(self.values[:, t], limits[:, t], self.frequency) for t in range(self.values.shape[1]))
+            if self.max_time != None:
+                bound = min(bound, fractional_knapsack(self.values.ravel(), limits.ravel(), float(self.max_time)))
+            if np.all(np.isfinite(self.ride_limits)):
+                bound = min(bound, float(self.ride_limits.sum()))
+            return float(np.floor(bound + 1e-9))
+        order = np.argsort(self.values.min(axis=1), kind="stable")
+        needed, bound = float(self.min_total_rides), 0.0
+        for i in order.tolist():
+            amount = min(needed, self.ride_limits[i])
+            bound += amount * self.values[i].min()
+            needed -= amount
+            if needed <= 0:
+                break
+        return bound
+
+    # Returns a dict where the keys are (ride, time step) tuples, and the values are the number of times to go on each ride (like the solutions of OptimizeDynamic)
+    def set_solution(self, counts: np.ndarray) -> dict:
+        return {(ride, t+1): float(counts[i, t]) for i, ride in enumerate(self.weights.rides) for t in range(self.values.shape[1])}
+
+    # ---------------
+    # Solving Methods
+    # ---------------
+
+    # Adds up to amount copies of ride i in time step t to a plan, and returns how many were added
+    def add(self, counts: np.ndarray, totals: np.ndarray, period_time: np.ndarray, i: int, t: int, amount: float) -> int:
+        weight = self.values[i, t]
+        amount = min(amount, self.ride_limits[i] - totals[i])
+        if self.objective == "maximize" and weight > 0:
+            amount = min(amount, (self.frequency - period_time[t]) // weight)
+            if self.max_time != None:
+                amount = min(amount, (self.max_time - float((period_time).sum())) // weight)
+        if amount <= 0 or not np.isfinite(amount):
+            return 0
+        amount = int(amount)
+        counts[i, t] += amount
+        totals[i] += amount
+        period_time[t] += amount * weight
+        return amount
+
+    # Fills a plan with the rides with the shortest total times (for the maximization problem until no ride fits, and for the minimization problem until the min total rides are reached), skipping the excluded cells
+    def fill(self, counts: np.ndarray, excluded: typing.Optional[tuple] = None):
+        totals = counts.sum(axis=1)
+        period_time = (counts * self.values).sum(axis=0)
+        for i, t in self.cells:
+            if (i, t) == excluded:
+                continue
+            if self.objective == "maximize":
+                self.add(counts, totals, period_time, i, t, np.inf)
+            else:
+                missing = self.min_total_rides - totals.sum()
+                if missing <= 0:
+                    break
+                self.add(counts, totals, period_time, i, t, missing)
+
+    # Returns a greedy plan as a rides x time steps matrix of counts, or None if the greedy plan misses a preference
+    def greedy(self) -> typing.Optional[np.ndarray]:
+        counts = np.zeros(self.values.shape, dtype=np.int64)
+        totals = np.zeros(len(self.weights.rides), dtype=np.int64)
+        period_time = np.zeros(self.values.shape[1])
+
+        # Ride each required ride once, in its time step with the shortest total time that still has room
+        for i in np.flatnonzero(self.required).tolist():
+            if not any(self.add(counts, totals, period_time, i, t, 1) for t in np.argsort(self.values[i], kind="stable").tolist()):
+                return None
+
+        # Ride the remaining rides with the shortest total times once, until the min distinct rides constraint is satisfied
+        if self.min_distinct_rides != None:
+            missing = int(self.min_distinct_rides) - int(np.count_nonzero(totals))
+            for i in np.argsort(self.values.min(axis=1), kind="stable").tolist():
+                if missing <= 0:
+                    break
+                if totals[i] == 0 and any(self.add(counts, totals, period_time, i, t, 1) for t in np.argsort(self.values[i], kind="stable").tolist()):
+                    missing -= 1
+            if missing > 0:
+                return None
+
+        self.fill(counts)
+        if self.objective == "minimize" and counts.sum() < self.min_total_rides:
+            return None
+        return counts
+
+    # Returns a bool as to whether one ride of a cell can be dropped without missing the required rides or min distinct rides preferences
+    def set_droppable_value(self, counts: np.ndarray, i: int) -> bool:
+        if counts[i].sum() > 1:
+            return True
+        if self.required[i]:
+            return False
+        return self.min_distinct_rides == None or np.count_nonzero(counts.sum(axis=1)) > self.min_distinct_rides
+
+    # Improves a plan by dropping one ride at a time (from the longest total time to the shortest) and refilling the freed time without it, yielding every improved plan
+    #   - Stops once a pass finds no improvement, or at the deadline (a time.perf_counter() value)
+    def local_search(self, counts: np.ndarray, deadline: float = float("inf")):
+        counts = counts.copy()
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            rank = self.set_rank(counts)
+            for i, t in reversed(self.cells):
+                if time.perf_counter() >= deadline:
+                    return
+                if counts[i, t] == 0 or not self.set_droppable_value(counts, i):
+                    continue
+                candidate = counts.copy()
+                candidate[i, t] -= 1
+                # Refill without the dropped cell first, so that the freed time goes to other rides
+                self.fill(candidate, excluded=(i, t))
+                self.fill(candidate)
+                if self.objective == "minimize" and candidate.sum() < self.min_total_rides:
+                    continue
+                if self.set_rank(candidate) > rank:
+                    counts = candidate
+                    rank = self.set_rank(counts)
+                    improved = True
+                    yield counts.copy()
+
+    # Solves the MILP of the optimizer, warm started from a plan and stopped at the deadline, returning the plan found (or None) and the bound it proves
+    def solve_milp(self, counts: np.ndarray, deadline: float = float("inf")) -> tuple:
+        if self.objective == "maximize":
+            prob, rides = self.optimizer.build_maximize_problem(self.weights)
+        else:
+            prob, rides = self.optimizer.build_minimize_problem(self.weights)
+        for (ride, time_step), variable in rides.items():
+            variable.setInitialValue(float(counts[self.weights.index[ride], time_step-1]))
+        config = copy.copy(self.solver_config)
+        if np.isfinite(deadline):
+            remaining = deadline - time.perf_counter()
+            config.time_limit = remaining if config.time_limit == None else min(config.time_limit, remaining)
+        self.last_report = sv.solve(prob, config, warm_start=True)
+        if pulp.LpStatus[prob.status] != "Optimal":
+            return (None, None)
+        solution = np.zeros(self.values.shape, dtype=np.int64)
+        for (ride, time_step), variable in rides.items():
+            solution[self.weights.index[ride], time_step-1] = int(round(pulp.value(variable) or 0))
+        objective = self.set_objective_value(solution)
+        if self.last_report.set_proven_value():
+            return (solution, objective)
+        if self.last_report.gap != None:
+            # The relative gap is taken with respect to the plan found
+            return (solution, objective * (1 + self.last_report.gap) if self.objective == "maximize" else objective * (1 - self.last_report.gap))
+        return (solution, None)
+
+    # Yields a (solution, objective, bound) tuple for the greedy plan, and then for every improved plan or bound, until the optimal plan is proven or the deadline is reached
+    #   - deadline is the number of seconds the whole solve may take (None lets the MILP run to optimality, or to the time limit of its solver configuration)
+    #   - The caller can also stop at any point by no longer iterating
+    def solve(self, deadline: typing.Optional[float] = None):
+        if self.set_unbounded_value() or (self.objective == "minimize" and self.min_total_rides == None):
+            return
+        deadline = time.perf_counter() + deadline if deadline != None else np.inf
+        bound = self.set_bound()
+        counts = self.greedy()
+        objective = None
+        if counts is not None:
+            self.stage = "greedy"
+            objective = self.set_objective_value(counts)
+            yield (self.set_solution(counts), objective, bound)
+            if objective == bound:
+                return
+            # Only the plans with a better objective are yielded, although ties that leave more room also move the search along
+            for candidate in self.local_search(counts, deadline):
+                counts = candidate
+                if self.set_objective_value(counts) != objective:
+                    self.stage = "local search"
+                    objective = self.set_objective_value(counts)
+                    yield (self.set_solution(counts), objective, bound)
+                    if objective == bound:
+                        return
+        else:
+            counts = np.zeros(self.values.shape, dtype=np.int64)
+
+        if deadline - time.perf_counter() < MIN_SOLVE_TIME:
+            return
+        solution, milp_bound = self.solve_milp(counts, deadline)
+        if solution is None:
+            return
+        milp_objective = self.set_objective_value(solution)
+        improved = objective == None or (milp_objective > objective if self.objective == "maximize" else milp_objective < objective)
+        if milp_bound != None:
+            # The number of rides is an integer, so its bound can be rounded down
+            milp_bound = min(bound, float(np.floor(milp_bound + 1e-9))) if self.objective == "maximize" else max(bound, milp_bound)
+        if improved or (milp_bound != None and milp_bound != bound):
+            self.stage = "milp"
+            bound = milp_bound if milp_bound != None else bound
+            yield (self.set_solution(solution if improved else counts), milp_objective if improved else objective, bound)
+
+    # Runs the whole solve, calling callback(solution, objective, bound) with every improvement, and returns the last (solution, objective, bound) tuple (None if no plan was found)
+    def run(self, deadline: typing.Optional[float] = None, callback: typing.Optional[typing.Callable] = None) -> typing.Optional[tuple]:
+        result = None
+        for result in self.solve(deadline):
+            if callback != None:
+                callback(*result)
+        return result
@@ -0,0 +1,60 @@
+import typing
+from concurrent.futures import ProcessPoolExecutor
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import user_preferences as up
+from optimization import constant_times as ct
+
+'''
+This file considers solving the constant times optimization problems for many users against the same park snapshot.
+- The ride weights are built once and shared by every solve (and sent once to each worker process)
+- Users with identical preferences (e.g., members of the same group) share a single solve
+- The distinct solves run across a pool of worker processes, and the results are returned in the same order as the preferences
+'''
+
+# Park snapshot shared by every solve in a worker process, set once by initialize_worker
+shared_park = {}
+
+# Stores the park snapshot in the worker process
+def initialize_worker(all_rides: list, wait_times: list, ride_weights: dict):
+    shared_park.update({"all_rides": all_rides, "wait_times": wait_times, "ride_weights": ride_weights})
+
+# Solves the optimization problem for a single set of user preferences against the shared park snapshot
+def solve_preferences(args: tuple):
+    user_preferences, objective, solver = args
+    park = ct.OptimizeConstant(shared_park["all_rides"], shared_park["wait_times"], user_preferences)
+    if objective == "maximize":
+        return park.maximize_rides(shared_park["ride_weights"], solver=solver)
+    return park.minimize_time(shared_park["ride_weights"])
+
+# Returns a list with the optimal solution (or None) for each user preferences, in the same order as the given preferences
+#   - objective is either "maximize" (maximize_rides) or "minimize" (minimize_time)
+#   - workers is the number of worker processes (None uses every core, and 1 solves everything in the current process)
+#   - solver is passed to maximize_rides ("pulp", "dp" or "auto")
+def solve_batch(all_rides: list, wait_times: list, preferences: list, objective: str = "maximize", workers: typing.Optional[int] = None, solver: str = "pulp") -> list:
+    if objective not in ("maximize", "minimize"):
+        raise ValueError(f"Unknown objective: {objective}")
+
+    # Shared structures are built once for every user
+    ride_weights = {all_rides[i]: wait_times[i] for i in range(len(all_rides))}
+
+    # Remove duplicate preferences, keeping the index of the distinct solve each user maps to
+    distinct = {}
+    for user_preferences in preferences:
+        distinct.setdefault(user_preferences.canonical_key(), user_preferences)
+    keys = list(distinct.keys())
+    tasks = [(distinct[key], objective, solver) for key in keys]
+
+    if workers == 1 or len(tasks) <= 1:
+        initialize_worker(all_rides, wait_times, ride_weights)
+        solutions = list(map(solve_preferences, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker, initargs=(all_rides, wait_times, ride_weights)) as executor:
+            solutions = list(executor.map(solve_preferences, tasks))
+
+    results = dict(zip(keys, solutions))
+    # Each user gets their own copy, so that changing one result does not change the results of users with identical preferences
+    return [dict(results[user_preferences.canonical_key()]) if results[user_preferences.canonical_key()] != None else None for user_preferences in preferences]
@@ -1,19 +1,43 @@
-import pulp
+from __future__ import annotations
+import typing
 import sys
 import os
 path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.append(path)
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
 from optimization import user_preferences as up
+from optimization import persistent_model as pm
+from optimization import solvers as sv
+from optimization import presolve as ps
+from optimization import preflight as pf
+from optimization import instrumentation as it
+from optimization import knapsack as ks
+from optimization import sweep as sw
+pulp = li.lazy_import("pulp")
+np = li.lazy_import("numpy")
 
 ''' 
 This file considers the optimization problems assuming constant wait and ride times
 '''
 
 class OptimizeConstant():
-    def __init__(self, all_rides: list, wait_times: list, user_preferences: up.UserPreferences) -> None:
+    def __init__(self, all_rides: list, wait_times: list, user_preferences: up.UserPreferences, model: typing.Optional[pm.PersistentModel] = None, solver_config: typing.Optional[sv.SolverConfig] = None, presolve: bool = True) -> None:
         self.all_rides = all_rides
         self.wait_times = wait_times
         # self.ride_times = ride_times
+        self.user_preferences = user_preferences
+        # A persistent model to reuse between solves, if given
+        self.model = model
+        # The solver backend, threads, time limit and gap of every solve (PuLP's default CBC configuration if None)
+        self.solver_config = solver_config
+        # The SolveReport (status, wall time and gap) of the most recent solve, or None if no solver was called
+        self.last_report = None
+        # Whether to decide the trivial rides before building a PuLP model, and the upper bounds of the rides merged by the presolve
+        self.presolve = presolve
+        self.ride_bounds = {}
+        # The Conflicts found by the most recent preflight analysis, which say which preferences contradict each other
+        self.conflicts = []
         self.required_rides = user_preferences.required_rides
         self.avoid_rides = user_preferences.avoid_rides
         self.require_and_avoid = user_preferences.require_and_avoid_rides()
@@ -29,57 +53,100 @@ class OptimizeConstant():
     # Returns a dict where the keys are ride names, and the values are total weights (i.e., wait times plus ride times)
     def set_ride_weights(self) -> dict:
         return {self.all_rides[i]: self.wait_times[i] for i in range(len(self.all_rides))}
+
+    # Returns the max number of times a ride can be rode (the max ride repeats, unless the ride stands for several rides merged by the presolve)
+    def set_ride_bound(self, ride):
+        return self.ride_bounds.get(ride, self.max_ride_repeats)
+
+    # Returns an optimizer for the rides left after a presolve, which solves the reduced problem as usual
+    def set_reduced_optimizer(self, presolve: ps.Presolve):
+        ride_weights = presolve.set_ride_weights()
+        optimizer = OptimizeConstant(list(ride_weights.keys()), list(ride_weights.values()), presolve.set_user_preferences(), solver_config=self.solver_config, presolve=False)
+        optimizer.ride_bounds = presolve.set_ride_bounds()
+        return optimizer
     
-    # Returns a bool as to whether the a combination of user preferences leads to a contradiction 
-    def set_contradiction_value(self) -> bool:
-        valid = False
-        # If the min total rides is greater than the product of the size of all distinct rides and the max ride repeats, then contradiction as no feasible solution exists
-        if self.max_ride_repeats != None and self.min_total_rides != None:
-            if (len(self.all_rides) * int(self.max_ride_repeats) < self.min_total_rides):
-                valid = True
-
-        if self.min_distinct_rides != None and self.avoid_rides != None:
-            if len(self.all_rides) < int(self.min_distinct_rides) + len(self.avoid_rides):
-                valid = True
-        return valid
+    # Returns a bool as to whether a combination of user preferences leads to a contradiction, keeping the conflicting preferences in self.conflicts
+    #   - objective ("maximize" or "minimize") adds the time bounds of that optimization problem to the checks shared by both
+    @it.instrumented("preflight")
+    def set_contradiction_value(self, ride_weights: typing.Optional[dict] = None, objective: typing.Optional[str] = None) -> bool:
+        self.conflicts = pf.analyze(self, ride_weights if ride_weights != None else self.set_ride_weights(), objective)
+        it.annotate(conflicts=len(self.conflicts))
+        return len(self.conflicts) > 0
     
     # --------------------
     # Maximization Methods
     # --------------------
 
     # Maximizes the total number of rides to go on, given user constraints
-    def maximize_rides(self, ride_weights: dict):
+    #   - solver="pulp" builds and solves a MILP with PuLP
+    #   - solver="dp" solves the problem as a bounded knapsack with dynamic programming, falling back to PuLP if the DP table would be too large
+    #   - solver="auto" uses the DP whenever the wait times are integers and the DP table is small enough, and PuLP otherwise
+    @it.instrumented()
+    def maximize_rides(self, ride_weights: dict, solver: str = "pulp"):
+        if solver not in ("pulp", "dp", "auto"):
+            raise ValueError(f"Unknown solver: {solver}")
 
         # Deal with the possibility of a preference contradiction before moving forward
-        if self.set_contradiction_value():
+        if self.set_contradiction_value(ride_weights, "maximize"):
+            return None
+
+        if solver != "pulp":
+            # The DP cannot represent an unbounded problem, nor rides that are both required and avoided
+            if self.max_time == None or self.require_and_avoid:
+                return None
+            knapsack = ks.BoundedKnapsack(ride_weights, self.max_time, self.max_ride_repeats, self.required_rides, self.avoid_rides, self.min_distinct_rides)
+            if not knapsack.set_integral_value():
+                if solver == "dp":
+                    raise ValueError("The dp solver requires non-negative integer wait times and max time")
+            elif knapsack.set_fits_value():
+                return knapsack.solve()
+
+        # Reuse the persistent model if one was given, which only updates the parts of the model tied to changed preferences
+        if self.model != None:
+            if self.max_time == None or self.require_and_avoid:
+                return None
+            solution = self.model.solve(ride_weights, self.user_preferences)
+            self.last_report = self.model.last_report
+            return solution
+
+        # The user must set a max time constraint, or else the solution would be unbounded
+        # User cannot require to go on a ride while also avoiding it
+        if self.max_time == None or self.require_and_avoid:
+            return None
+
+        # Decide the trivial rides first, and solve the problem of the rides that are left
+        if self.presolve:
+            return ps.solve(self, "maximize_rides", ride_weights)
+
+        prob, rides = self.build_maximize_problem(ride_weights)
+        self.last_report = sv.solve(prob, self.solver_config)
+
+        # Check to see if the solution is optimal
+        if pulp.LpStatus[prob.status] == "Optimal":
+            with it.span("extract"):
+                return ({i: pulp.value(rides[i]) for i in ride_weights.keys()})
+        else:
             return None
 
+    # Returns the PuLP problem for maximizing the total number of rides, along with its ride variables
+    @it.instrumented("build")
+    def build_maximize_problem(self, ride_weights: dict) -> tuple:
         prob = pulp.LpProblem("Maximize the number of total rides to go on", pulp.LpMaximize)
 
         # Variable: ride_i will be an LpInteger with a lower bound of 0 and an upper bound of the maximum number of times a single ride can be rode constraint (set by the user)
         rides = pulp.LpVariable.dicts("ride", ride_weights.keys(), lowBound=0, upBound=self.max_ride_repeats,  cat=pulp.LpInteger)
+        for i, bound in self.ride_bounds.items():
+            rides[i].upBound = bound
+        it.lap("variables")
 
-        # Variable: ride_rode_i will be an LpBinary that is used in the minimum distinct rides constraint (set by the user)
-        rides_rode = pulp.LpVariable.dicts("ride_rode",
-                                        ride_weights.keys(), cat=pulp.LpBinary)
-        
         # Objective function: maximize the sum of ride_i's
         prob += pulp.lpSum(rides[i] for i in ride_weights.keys())
 
-        
-
         # Constraint: the sum of the dot product of the rides and their corresponding weights must be at most the user's max time constraint
-        #   - In this case, the user must set a max time constraint, or else the solution would be unbounded
-        if self.max_time != None:
-            prob += pulp.lpDot([rides[i] for i in ride_weights.keys()], [ride_weights.get(i) for i in ride_weights.keys()]) <= self.max_time
-        else:
-            return None
-        
+        prob += pulp.lpDot([rides[i] for i in ride_weights.keys()], [ride_weights.get(i) for i in ride_weights.keys()]) <= self.max_time
+
         # Constraint: ride_i >= 1 if the user wants to ride ride_i at least once
         # Constraint: ride_i = 0 if the user wants to avoid ride_i all together
-        # User cannot require to go on a ride while also avoiding it
-        if self.require_and_avoid:
-                return None 
         if self.required_rides != None:
             for i in self.all_rides:
                 if i in self.required_rides:
@@ -92,53 +159,70 @@ class OptimizeConstant():
         # Constraint: the number of non-zero ride_i's must be at least the user's minimum distinct number of rides constraint
         #   - The user can opt to not include this preference without implying an unbounded solution
         if self.min_distinct_rides != None:
-            for i in ride_weights.keys():
-                # Case 1: rides[i] = 0 implies rides_rode[i] = 0
-                # Case 2: rides[i] >= 1 implies unique_ride[i] >= 1
-                    #   - Since unique_ride[i] is binary, then case 2 implies unique_ride[i] = 1
-                prob += rides[i] >= 1 * rides_rode[i]
-                # The number of distinct rides rode must be at least the user's minimum distinct number of rides constraint
-                prob += pulp.lpSum(rides_rode) >= self.min_distinct_rides
+            self.add_min_distinct_rides_constraint(prob, rides, ride_weights)
 
-        prob.solve()
-
-        # Check to see if the solution is optimal
-        if pulp.LpStatus[prob.status] == "Optimal":
-            return ({i: pulp.value(rides[i]) for i in ride_weights.keys()})
-        else:
-            return None
+        it.lap("constraints")
+        it.annotate_model(prob)
+        return (prob, rides)
 
     # --------------------
     # Minimization methods
     # --------------------
 
     # Minimizes the total amount of time waiting and riding rides, given user constraints
+    @it.instrumented()
     def minimize_time(self, ride_weights: dict):
 
         # Deal with the possibility of a preference contradiction before moving forward; same implementation as maximization method
-        if self.set_contradiction_value():
+        if self.set_contradiction_value(ride_weights, "minimize"):
             return None
 
+        # Reuse the persistent model if one was given; same implementation as maximization method
+        if self.model != None:
+            if self.min_total_rides == None or self.require_and_avoid:
+                return None
+            solution = self.model.solve(ride_weights, self.user_preferences)
+            self.last_report = self.model.last_report
+            return solution
+
+        # Constraint: optimal solution must include a total of at least some specified number of rides, set by the user
+        #   - If not set by the user, optimal solution will be not going on any rides, which is trivial
+        # Constraint: require and avoid rides; same implementation as maximization method
+        if self.min_total_rides == None or self.require_and_avoid:
+            return None
+
+        # Presolve; same implementation as maximization method
+        if self.presolve:
+            return ps.solve(self, "minimize_time", ride_weights)
+
+        prob, rides = self.build_minimize_problem(ride_weights)
+        self.last_report = sv.solve(prob, self.solver_config)
+
+        # Check to see if the solution is optimal
+        if pulp.LpStatus[prob.status] == "Optimal":
+            with it.span("extract"):
+                return ({i: pulp.value(rides[i]) for i in ride_weights.keys()})
+        else:
+            return None
+
+    # Returns the PuLP problem for minimizing the total amount of time, along with its ride variables
+    @it.instrumented("build")
+    def build_minimize_problem(self, ride_weights: dict) -> tuple:
         prob = pulp.LpProblem("Minimize the total amount of time waiting and riding rides", pulp.LpMinimize)
 
         # Variables: defined the same as in the maximization problem
         rides = pulp.LpVariable.dicts("ride", ride_weights.keys(), lowBound=0, upBound=self.max_ride_repeats,  cat=pulp.LpInteger)
-        rides_rode = pulp.LpVariable.dicts("ride_rode",
-                                        ride_weights.keys(), cat=pulp.LpBinary)
+        for i, bound in self.ride_bounds.items():
+            rides[i].upBound = bound
+        it.lap("variables")
 
         # Objective function: minimize the weighted sum of rides to go on
         prob += pulp.lpSum(rides[i] * ride_weights.get(i) for i in ride_weights.keys())
 
         # Constraint: optimal solution must include a total of at least some specified number of rides, set by the user
-        #   - If not set by the user, optimal solution will be not going on any rides, which is trivial
-        if self.min_total_rides != None:
-            prob += pulp.lpSum(rides[i] for i in ride_weights.keys()) >= self.min_total_rides
-        else:
-            return None
-        
+        prob += pulp.lpSum(rides[i] for i in ride_weights.keys()) >= self.min_total_rides
+
         # Constraint: require and avoid rides; same implementation as maximization method
-        if self.require_and_avoid:
-                return None 
         if self.required_rides != None:
             for i in self.all_rides:
                 if i in self.required_rides:
@@ -150,14 +234,75 @@ class OptimizeConstant():
 
         # Constraint: min distinct rides; same implementation as maximization method
         if self.min_distinct_rides != None:
-            for i in ride_weights.keys():
-                prob += rides[i] >= 1 * rides_rode[i]
-                prob += pulp.lpSum(rides_rode) >= self.min_distinct_rides
+            self.add_min_distinct_rides_constraint(prob, rides, ride_weights)
 
-        prob.solve()
+        it.lap("constraints")
+        it.annotate_model(prob)
+        return (prob, rides)
 
-        # Check to see if the solution is optimal
-        if pulp.LpStatus[prob.status] == "Optimal":
-            return ({i: pulp.value(rides[i]) for i in ride_weights.keys()})
-        else:
-            return None
+    # -------------
+    # Sweep methods
+    # -------------
+
+    # Maximizes the total number of rides at every max time of a range in one computation, returning a SweepResult (the trade-off curve, and the solution at each max time if plans is True)
+    #   - solver="dp" reads every max time off a single knapsack DP table, solver="pulp" solves a persistent model once per max time with warm starts, and solver="auto" uses the DP whenever it can
+    #   - The max time preference of the user is ignored, since it is the swept one
+    def sweep_max_time(self, max_times, ride_weights: typing.Optional[dict] = None, plans: bool = False, solver: str = "auto") -> sw.SweepResult:
+        max_times = list(max_times)
+        ride_weights = ride_weights if ride_weights != None else self.set_ride_weights()
+        if solver not in ("pulp", "dp", "auto"):
+            raise ValueError(f"Unknown solver: {solver}")
+        if self.require_and_avoid or len(max_times) == 0:
+            return sw.SweepResult("max_time", max_times, [None] * len(max_times), [None] * len(max_times) if plans else None, "dp")
+
+        if solver != "pulp":
+            knapsack = ks.BoundedKnapsack(ride_weights, max(0, max(max_times)), self.max_ride_repeats, self.required_rides, self.avoid_rides, self.min_distinct_rides)
+            integral = knapsack.set_integral_value() and all(float(max_time) == int(max_time) for max_time in max_times)
+            if not integral and solver == "dp":
+                raise ValueError("The dp solver requires non-negative integer wait times and max times")
+            if integral and knapsack.set_fits_value():
+                results = knapsack.sweep_capacities(max_times, plans)
+                return sw.SweepResult("max_time", max_times, [objective for objective, _ in results], [plan for _, plan in results] if plans else None, "dp")
+        return sw.sweep_persistent(self, "max_time", max_times, ride_weights, plans)
+
+    # Minimizes the total amount of time for every min total rides value of a range in one computation, returning a SweepResult (same solvers as sweep_max_time)
+    #   - The min total rides preference of the user is ignored, since it is the swept one
+    def sweep_min_total_rides(self, min_total_rides, ride_weights: typing.Optional[dict] = None, plans: bool = False, solver: str = "auto") -> sw.SweepResult:
+        totals = list(min_total_rides)
+        ride_weights = ride_weights if ride_weights != None else self.set_ride_weights()
+        if solver not in ("pulp", "dp", "auto"):
+            raise ValueError(f"Unknown solver: {solver}")
+        # The DP only needs the time of a feasible solution of the largest feasible total, since no smaller total takes longer
+        bounds = [sw.set_time_bound(ride_weights, self.user_preferences, total) for total in set(totals)]
+        bound = max((bound for bound in bounds if bound != None), default=None)
+        if self.require_and_avoid or bound == None:
+            return sw.SweepResult("min_total_rides", totals, [None] * len(totals), [None] * len(totals) if plans else None, "dp")
+
+        if solver != "pulp":
+            # No optimal solution goes on a ride more often than the largest total, so the repeats can be capped by it (which also bounds the rides with no wait)
+            repeats = max(max(totals), 1) if self.max_ride_repeats == None else min(self.max_ride_repeats, max(max(totals), 1))
+            knapsack = ks.BoundedKnapsack(ride_weights, int(np.ceil(bound)), repeats, self.required_rides, self.avoid_rides, self.min_distinct_rides)
+            integral = knapsack.set_integral_value() and all(float(total) == int(total) for total in totals)
+            if not integral and solver == "dp":
+                raise ValueError("The dp solver requires non-negative integer wait times and min total rides")
+            if integral and knapsack.set_fits_value():
+                results = knapsack.sweep_total_rides(totals, plans)
+                return sw.SweepResult("min_total_rides", totals, [objective for objective, _ in results], [plan for _, plan in results] if plans else None, "dp")
+        return sw.sweep_persistent(self, "min_total_rides", totals, ride_weights, plans)
+
+    # -------------------
+    # Constraint methods
+    # -------------------
+
+    # Adds the min distinct rides constraint to a problem
+    def add_min_distinct_rides_constraint(self, prob: pulp.LpProblem, rides: dict, ride_weights: dict):
+        # Variable: ride_rode_i will be an LpBinary that is used in the minimum distinct rides constraint (set by the user)
+        rides_rode = pulp.LpVariable.dicts("ride_rode", ride_weights.keys(), cat=pulp.LpBinary)
+        for i in ride_weights.keys():
+            # Case 1: rides[i] = 0 implies rides_rode[i] = 0
+            # Case 2: rides[i] >= 1 implies unique_ride[i] >= 1
+                #   - Since unique_ride[i] is binary, then case 2 implies unique_ride[i] = 1
+            prob += rides[i] >= 1 * rides_rode[i]
+        # The number of distinct rides rode must be at least the user's minimum distinct number of rides constraint
+        #   - This is a single aggregate constraint over all ride_rode_i's, added once after every ride is linked to its binary
+        prob += pulp.lpSum(rides_rode.values()) >= self.min_distinct_rides
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import typing
+from concurrent.futures import ProcessPoolExecutor
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import user_preferences as up
+from optimization import weight_matrix as wm
+from optimization import knapsack as ks
+np = li.lazy_import("numpy")
+
+'''
+This file considers the dynamic maximization problem as a set of per time step knapsacks, coordinated by Lagrangian relaxation.
+- Only the frequency constraint of each time step is kept in its subproblem, so the time steps can be solved independently (and in parallel)
+- The constraints that couple the time steps (max time, max ride repeats, required rides and min distinct rides) are moved into the objective function with a multiplier each
+- The multipliers are updated with subgradient steps, and every iteration gives an upper bound on the optimal number of rides
+- A greedy repair of each subproblem solution gives a feasible plan, which is a lower bound, and the gap between both bounds is reported
+'''
+
+class DecompositionResult():
+    def __init__(self, solution: dict, objective: float, bound: float, iterations: int) -> None:
+        self.solution = solution
+        self.objective = objective
+        self.bound = bound
+        self.iterations = iterations
+        # Relative optimality gap between the best plan found and the Lagrangian upper bound
+        self.gap = (bound - objective) / max(bound, 1)
+
+    def __repr__(self) -> str:
+        return f"DecompositionResult(objective={self.objective}, bound={self.bound}, gap={self.gap:.4f}, iterations={self.iterations})"
+
+
+# Solves the knapsack of a single time step; defined at the module level so that it can be sent to worker processes
+def solve_period(args: tuple) -> np.ndarray:
+    profits, weights, upper_bounds, frequency = args
+    return ks.solve_profit_knapsack(profits, weights, upper_bounds, frequency)
+
+
+class LagrangianDecomposition():
+    def __init__(self, weights: wm.WeightMatrix, frequency: int, user_preferences: up.UserPreferences) -> None:
+        self.weights = weights
+        self.values = weights.matrix.astype(np.int64)
+        self.frequency = int(frequency)
+        self.max_time = user_preferences.max_time
+        self.max_ride_repeats = user_preferences.max_ride_repeats
+        self.min_distinct_rides = user_preferences.min_distinct_rides
+        self.required = np.array([ride in (user_preferences.required_rides or []) for ride in weights.rides], dtype=bool)
+        self.avoid = np.array([ride in (user_preferences.avoid_rides or []) for ride in weights.rides], dtype=bool)
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns a bool as to whether the weights and frequency are non-negative integers, which the knapsack subproblems require
+    def set_integral_value(self) -> bool:
+        values = np.asarray(self.weights.matrix, dtype=float)
+        return bool(np.all(values >= 0) and np.all(values == np.floor(values)) and float(self.frequency) >= 0)
+
+    # Returns a rides x time steps matrix of the max number of times each ride can be rode in each time step (-1 if unbounded)
+    def set_upper_bounds(self) -> np.ndarray:
+        fits = np.where(self.values > 0, self.frequency // np.maximum(self.values, 1), -1)
+        if self.max_ride_repeats != None:
+            bounds = np.where(fits >= 0, np.minimum(fits, int(self.max_ride_repeats)), int(self.max_ride_repeats))
+        else:
+            bounds = fits
+        bounds[self.avoid] = 0
+        return bounds
+
+    # ---------------
+    # Solving Methods
+    # ---------------
+
+    # Returns a feasible plan that follows the counts of a subproblem solution as closely as possible, or None if the greedy repair fails
+    def repair(self, hint: np.ndarray, upper_bounds: np.ndarray):
+        num_rides, time_steps = self.values.shape
+        values = self.values.tolist()
+        bounds = upper_bounds.tolist()
+        hints = hint.tolist()
+        counts = [[0] * time_steps for _ in range(num_rides)]
+        totals = [0] * num_rides
+        ride_limits = [0 if avoided else (int(self.max_ride_repeats) if self.max_ride_repeats != None else sys.maxsize) for avoided in self.avoid.tolist()]
+        period_time = [0] * time_steps
+        time_left = [sys.maxsize if self.max_time == None else int(self.max_time)]
+
+        # Adds up to amount copies of ride i in time step t, and returns how many were added
+        def add(i: int, t: int, amount: int) -> int:
+            weight = values[i][t]
+            amount = min(amount, bounds[i][t] - counts[i][t], ride_limits[i] - totals[i])
+            if weight > 0:
+                amount = min(amount, (self.frequency - period_time[t]) // weight, time_left[0] // weight)
+            if amount <= 0:
+                return 0
+            counts[i][t] += amount
+            totals[i] += amount
+            period_time[t] += amount * weight
+            time_left[0] -= amount * weight
+            return amount
+
+        # Returns the time steps of ride i, preferring the ones the subproblems chose and then the cheapest ones
+        def periods(i: int) -> list:
+            return sorted(range(time_steps), key=lambda t: (-hints[i][t], values[i][t]))
+
+        # Ride each required ride once
+        for i in np.flatnonzero(self.required).tolist():
+            if not any(add(i, t, 1) for t in periods(i)):
+                return None
+
+        # Ride the cheapest remaining rides once until the min distinct rides constraint is satisfied
+        if self.min_distinct_rides != None:
+            missing = int(self.min_distinct_rides) - sum(1 for total in totals if total > 0)
+            for i in np.argsort(self.values.min(axis=1), kind="stable").tolist():
+                if missing <= 0:
+                    break
+                if totals[i] == 0 and ride_limits[i] > 0 and any(add(i, t, 1) for t in periods(i)):
+                    missing -= 1
+            if missing > 0:
+                return None
+
+        # Follow the subproblem solutions, then fill any remaining time with the cheapest rides
+        rows, columns = np.unravel_index(np.argsort(self.values, axis=None, kind="stable"), self.values.shape)
+        cells = list(zip(rows.tolist(), columns.tolist()))
+        for i, t in cells:
+            if hints[i][t] > 0:
+                add(i, t, hints[i][t] - counts[i][t])
+        for i, t in cells:
+            add(i, t, sys.maxsize)
+        return np.array(counts, dtype=np.int64)
+
+    # Maximizes the total number of rides, returning a DecompositionResult, or None if the problem is unbounded or no feasible plan was found
+    #   - workers is the number of processes solving the time step subproblems (None uses every core, and 1 solves them in the current process)
+    #   - executor is a shared executor (e.g., a ProcessPoolExecutor kept by the caller) to solve the subproblems in, instead of starting a process pool for this solve
+    def solve(self, workers: typing.Optional[int] = 1, max_iterations: int = 100, tolerance: float = 1e-6, executor=None):
+        upper_bounds = self.set_upper_bounds()
+        # A ride with zero weight and no max ride repeats can be rode an unlimited number of times
+        if np.any(upper_bounds < 0):
+            return None
+        num_rides, time_steps = self.values.shape
+        max_time = self.max_time != None
+        max_ride_repeats = self.max_ride_repeats != None
+        min_distinct_rides = self.min_distinct_rides != None
+
+        # Multipliers of the max time (time_price), max ride repeats (repeat_prices), required rides (required_prices) and min distinct rides (distinct_prices, distinct_price) constraints
+        time_price = 0.0
+        repeat_prices = np.zeros(num_rides)
+        required_prices = np.zeros(num_rides)
+        distinct_prices = np.zeros(num_rides)
+        distinct_price = 0.0
+
+        best_counts, best_objective, best_bound = None, -1, np.inf
+        step_scale, stalled = 2.0, 0
+
+        # Starting a process pool takes longer than most subproblems, so a pool is only started when workers asks for one and no executor is shared
+        owned = executor == None and workers != 1
+        if owned:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            iteration = 0
+            for iteration in range(1, max_iterations + 1):
+                # Each ride in each time step is worth one ride, minus the prices of the coupling constraints it uses up
+                profits = 1 - time_price * self.values - repeat_prices[:, None] + required_prices[:, None] + distinct_prices[:, None]
+                tasks = [(profits[:, t], self.values[:, t], upper_bounds[:, t], self.frequency) for t in range(time_steps)]
+                columns = list(executor.map(solve_period, tasks)) if executor != None else list(map(solve_period, tasks))
+                counts = np.column_stack(columns)
+                totals = counts.sum(axis=1)
+                chosen = (distinct_price - distinct_prices > 0) & ~self.avoid
+
+                # The Lagrangian function is an upper bound on the optimal number of rides
+                bound = float((profits * counts).sum())
+                if max_time:
+                    bound += time_price * self.max_time
+                if max_ride_repeats:
+                    bound += repeat_prices.sum() * self.max_ride_repeats
+                bound -= required_prices[self.required].sum()
+                if min_distinct_rides:
+                    bound += (distinct_price - distinct_prices)[chosen].sum() - distinct_price * self.min_distinct_rides
+                # The number of rides is an integer, so the bound can be rounded down
+                bound = np.floor(bound + tolerance)
+                if bound < best_bound:
+                    best_bound, stalled = bound, 0
+                else:
+                    stalled += 1
+                    if stalled >= 5:
+                        step_scale, stalled = step_scale / 2, 0
+
+                plan = self.repair(counts, upper_bounds)
+                if plan is not None and plan.sum() > best_objective:
+                    best_counts, best_objective = plan, int(plan.sum())
+                if best_objective >= best_bound or step_scale < 1e-4:
+                    break
+
+                # Subgradients of the Lagrangian function with respect to each multiplier (zero for constraints the user did not set)
+                time_gradient = (self.max_time - float((self.values * counts).sum())) if max_time else 0.0
+                repeat_gradients = (self.max_ride_repeats - totals) if max_ride_repeats else np.zeros(num_rides)
+                required_gradients = np.where(self.required, totals - 1, 0)
+                distinct_gradients = (totals - chosen) if min_distinct_rides else np.zeros(num_rides)
+                distinct_gradient = (float(chosen.sum()) - self.min_distinct_rides) if min_distinct_rides else 0.0
+                norm = time_gradient ** 2 + (repeat_gradients ** 2).sum() + (required_gradients ** 2).sum() + (distinct_gradients ** 2).sum() + distinct_gradient ** 2
+                if norm == 0:
+                    break
+
+                # Polyak step towards the best plan found so far
+                step = step_scale * (bound - max(best_objective, 0)) / norm
+                time_price = max(0.0, time_price - step * time_gradient)
+                repeat_prices = np.maximum(0.0, repeat_prices - step * repeat_gradients)
+                required_prices = np.maximum(0.0, required_prices - step * required_gradients)
+                distinct_prices = np.maximum(0.0, distinct_prices - step * distinct_gradients)
+                distinct_price = max(0.0, distinct_price - step * distinct_gradient)
+        finally:
+            if owned:
+                executor.shutdown()
+
+        if best_counts is None:
+            return None
+        solution = {(ride, time_step): float(best_counts[i, time_step-1]) for i, ride in enumerate(self.weights.rides) for time_step in range(1, time_steps+1)}
+        return DecompositionResult(solution, float(best_objective), float(max(best_bound, best_objective)), iteration)
@@ -1,9 +1,22 @@
-import pulp
+from __future__ import annotations
+import typing
 import sys
 import os
 path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.append(path)
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
 from optimization import user_preferences as up
+from optimization import persistent_model as pm
+from optimization import solvers as sv
+from optimization import presolve as ps
+from optimization import preflight as pf
+from optimization import instrumentation as it
+from optimization import weight_matrix as wm
+from optimization import decomposition as dc
+from optimization import anytime as an
+pulp = li.lazy_import("pulp")
+np = li.lazy_import("numpy")
 
 ''' 
 This file considers the optimization problems assuming dynamic wait and ride times.
@@ -11,12 +24,24 @@ Also assumes that these changing times are known beforehand
 '''
 
 class OptimizeDynamic():
-    def __init__(self, all_rides: list, time_steps: int, frequency: int, wait_times: dict, user_preferences: up.UserPreferences) -> None:
+    def __init__(self, all_rides: list, time_steps: int, frequency: int, wait_times: dict, user_preferences: up.UserPreferences, model: typing.Optional[pm.PersistentModel] = None, solver_config: typing.Optional[sv.SolverConfig] = None, presolve: bool = True) -> None:
         self.all_rides = all_rides
         self.time_steps = time_steps
         self.frequency = frequency
         self.wait_times = wait_times
         # self.ride_times = ride_times
+        self.user_preferences = user_preferences
+        # A persistent model to reuse between solves, if given
+        self.model = model
+        # The solver backend, threads, time limit and gap of every solve (PuLP's default CBC configuration if None)
+        self.solver_config = solver_config
+        # The SolveReport (status, wall time and gap) of the most recent solve, or None if no solver was called
+        self.last_report = None
+        # Whether to decide the trivial rides before building a PuLP model, and the upper bounds of the rides merged by the presolve
+        self.presolve = presolve
+        self.ride_bounds = {}
+        # The Conflicts found by the most recent preflight analysis, which say which preferences contradict each other
+        self.conflicts = []
         self.required_rides = user_preferences.required_rides
         self.avoid_rides = user_preferences.avoid_rides
         self.require_and_avoid = user_preferences.require_and_avoid_rides()
@@ -29,146 +54,242 @@ class OptimizeDynamic():
     # Setter Methods
     # --------------
 
-    # Returns a dict where the keys are ride names, and the values are a list of total time (where each index represents the total time at each time step)
+    # Returns a rides x time steps matrix of total times, which also behaves like a dict where the keys are ride names, and the values are a list of total time (where each index represents the total time at each time step)
     #   - Example: {a: [10, 15], b: [12, 13]} implies that the total times of rides a, b at the first time step are 10, 12, respectively, and the total times of rides of a, b at the second time step are 15, 13, respectively  
-    def set_ride_weights(self) -> dict:
-        return {self.all_rides[i]: [self.wait_times.get(j)[i] for j in range(1, self.time_steps+1)] for i in range(len(self.all_rides)) for j in range(1, self.time_steps)}
+    def set_ride_weights(self) -> wm.WeightMatrix:
+        return wm.WeightMatrix.from_wait_times(self.all_rides, self.wait_times, self.time_steps)
+
+    # Returns a dict where the keys are (ride, time step) tuples, and the values are the ride variables of a problem
+    def set_ride_variables(self, weights: wm.WeightMatrix) -> dict:
+        rides = pulp.LpVariable.dicts("ride_time_step", [(ride, time_period) for ride in weights.rides for time_period in range(1, self.time_steps+1)], lowBound=0, upBound=self.max_ride_repeats,  cat=pulp.LpInteger)
+        for ride, bound in self.ride_bounds.items():
+            for time_period in range(1, self.time_steps+1):
+                rides[ride, time_period].upBound = bound
+        return rides
+
+    # Returns the max number of times a ride can be rode over all time steps (the max ride repeats, unless the ride stands for several rides merged by the presolve)
+    def set_ride_bound(self, ride):
+        return self.ride_bounds.get(ride, self.max_ride_repeats)
+
+    # Returns an optimizer for the rides left after a presolve, which solves the reduced problem as usual
+    def set_reduced_optimizer(self, presolve: ps.Presolve):
+        weights = presolve.set_ride_weights()
+        wait_times = {time_step: weights.column(time_step).tolist() for time_step in range(1, self.time_steps+1)}
+        optimizer = OptimizeDynamic(weights.rides, self.time_steps, self.frequency, wait_times, presolve.set_user_preferences(), solver_config=self.solver_config, presolve=False)
+        optimizer.ride_bounds = presolve.set_ride_bounds()
+        return optimizer
     
-    # Returns a bool as to whether the a combination of user preferences leads to a contradiction 
-    def set_contradiction_value(self) -> bool:
-        valid = False
-        # If the min total rides is greater than the product of the size of all distinct rides and the max ride repeats, then contradiction as no feasible solution exists
-        if self.max_ride_repeats != None and self.min_total_rides != None:
-            if (len(self.all_rides) * int(self.max_ride_repeats) < self.min_total_rides):
-                valid = True
-
-        if self.min_distinct_rides != None and self.avoid_rides != None:
-            if len(self.all_rides) < int(self.min_distinct_rides) + len(self.avoid_rides):
-                valid = True
-        return valid
+    # Returns a bool as to whether a combination of user preferences leads to a contradiction, keeping the conflicting preferences in self.conflicts
+    #   - objective ("maximize" or "minimize") adds the time bounds of that optimization problem to the checks shared by both
+    @it.instrumented("preflight")
+    def set_contradiction_value(self, ride_weights: typing.Optional[dict] = None, objective: typing.Optional[str] = None) -> bool:
+        self.conflicts = pf.analyze(self, ride_weights if ride_weights != None else self.set_ride_weights(), objective)
+        it.annotate(conflicts=len(self.conflicts))
+        return len(self.conflicts) > 0
 
     # --------------------
     # Maximization Methods
     # --------------------
 
     # Maximizes the total number of rides to go on over all time steps
+    @it.instrumented()
     def maximize_rides(self, ride_weights: dict):
 
         # Deal with the possibility of a preference contradiction before moving forward
-        if self.set_contradiction_value():
+        if self.set_contradiction_value(ride_weights, "maximize"):
+            return None
+
+        # Reuse the persistent model if one was given, which only updates the parts of the model tied to changed preferences
+        if self.model != None:
+            if self.require_and_avoid:
+                return None
+            solution = self.model.solve(ride_weights, self.user_preferences, self.frequency)
+            self.last_report = self.model.last_report
+            return solution
+
+        # User cannot require to go on a ride while also avoiding it
+        if self.require_and_avoid:
             return None
 
+        # Decide the trivial rides first, and solve the problem of the rides that are left
+        if self.presolve:
+            return ps.solve(self, "maximize_rides", ride_weights)
+
+        prob, rides = self.build_maximize_problem(ride_weights)
+        self.last_report = sv.solve(prob, self.solver_config)
+
+        if pulp.LpStatus[prob.status] == "Optimal":
+            with it.span("extract"):
+                return ({key: pulp.value(variable) for key, variable in rides.items()})
+        else:
+            return None
+
+    # Returns the PuLP problem for maximizing the total number of rides over all time steps, along with its ride variables
+    @it.instrumented("build")
+    def build_maximize_problem(self, ride_weights: dict) -> tuple:
+        weights = wm.WeightMatrix.from_dict(ride_weights)
         prob = pulp.LpProblem("Maximize the number of total rides to go on over dynamically changing time steps", pulp.LpMaximize)
 
         # Variable: ride_time_step_(i, j) will represent the number of times ride i is rode during time period j
-        rides = pulp.LpVariable.dicts("ride_time_step", [(ride, time_period) for ride in ride_weights.keys() for  time_period in range(1, self.time_steps+1)], lowBound=0, upBound=self.max_ride_repeats,  cat=pulp.LpInteger)
-
-        # Variable: ride_rode_i will be an LpBinary that is used in the minimum distinct rides constraint (set by the user)
-        rides_rode = pulp.LpVariable.dicts("ride_rode",
-                                        ride_weights.keys(), cat=pulp.LpBinary)
+        rides = self.set_ride_variables(weights)
+        # The variables as a rides x time steps array, so that rows and columns line up with the weight matrix
+        variables = np.array(list(rides.values()), dtype=object).reshape(len(weights.rides), self.time_steps)
+        it.lap("variables")
 
         # Objective function: maximize the sum of ride_i's over all time steps
-        prob += pulp.lpSum(rides[(ride, time_step)] for ride in ride_weights.keys() for time_step in range(1, self.time_steps+1))
+        prob += pulp.lpSum(variables.ravel())
 
         # Constraint: the sum of the dot product of the rides and their corresponding weights in each time step must be at most the user's max time constraint
         for time_step in range(1, self.time_steps+1):
-            prob += pulp.lpDot(list(ride_weights[ride][time_step-1] for ride in ride_weights.keys()), [rides[(ride, time_step)] for ride in ride_weights.keys()]) <= self.frequency
+            prob += pulp.LpAffineExpression(zip(variables[:, time_step-1], weights.column(time_step).tolist())) <= self.frequency
 
         if self.max_time != None:
-            prob += pulp.lpDot(list(ride_weights[ride][time_step-1] for ride in ride_weights.keys() for time_step in range(1, self.time_steps+1)), [rides[(ride, time_step)] for ride in ride_weights.keys() for time_step in range(1, self.time_steps+1)]) <= self.max_time
+            prob += pulp.LpAffineExpression(zip(variables.ravel(), weights.flatten().tolist())) <= self.max_time
 
         # Constraint: ride_(i, j) >= 1 for at least one time step j if the user wants to ride ride_i at least once
         # Constraint: ride_(i, j) = 0 for all time steps j if the user wants to avoid ride_i all together
-        # User cannot require to go on a ride while also avoiding it
-        if self.require_and_avoid:
-                return None 
-        if self.required_rides != None:
-            for i in self.all_rides:
-                if i in self.required_rides:
-                    # If the sum of rides[i, j] >= 1 for all time steps j, then the required constraint was satisfied
-                    prob += pulp.lpSum(rides[i, j] for j in range(1, self.time_steps+1)) >= 1
-        if self.avoid_rides != None:
-            for i in self.all_rides:
-                if i in self.avoid_rides:
-                    # If the sum of rides[i, j] = 0 for all time steps j, then the avoid constraint was satisfied
-                    prob += pulp.lpSum(rides[i, j] for j in range(1, self.time_steps+1)) == 0
+        self.add_required_and_avoid_constraints(prob, rides)
 
         # Constraint: The sum of a ride over all time steps must be less than the max ride repeats preference set by the user
         if self.max_ride_repeats != None:
-            for i in ride_weights.keys():
-                prob += pulp.lpSum(rides[i, time_step] for time_step in range(1, self.time_steps+1)) <= self.max_ride_repeats
+            for ride, row in zip(weights.rides, variables):
+                prob += pulp.lpSum(row) <= self.set_ride_bound(ride)
 
         # Constraint: the number of non-zero sums of ride_(i, j) for all time steps j must be at least the user's minimum distinct number of rides constraint
         if self.min_distinct_rides != None:
-            for i in ride_weights.keys():
-                # Case 1: rides[i] = 0 implies rides_rode[i] = 0
-                # Case 2: rides[i] >= 1 implies unique_ride[i] >= 1
-                    #   - Since unique_ride[i] is binary, then case 2 implies unique_ride[i] = 1
-                prob += pulp.lpSum(rides[i, time_step] for time_step in range(1, self.time_steps+1)) >= 1 * rides_rode[i]
-                # The number of distinct rides rode (counting all time steps together, not individually) must be at least the user's minimum distinct number of rides constraint
-                prob += pulp.lpSum(rides_rode) >= self.min_distinct_rides
+            self.add_min_distinct_rides_constraint(prob, rides, weights)
 
-        prob.solve()
+        it.lap("constraints")
+        it.annotate_model(prob)
+        return (prob, rides)
 
-        if pulp.LpStatus[prob.status] == "Optimal":
-            return ({(ride, time_step): pulp.value(rides[ride, time_step]) for ride in ride_weights.keys() for time_step in range(1, self.time_steps+1)})
-        else:
-            return None        
+    # Maximizes the total number of rides to go on over all time steps by solving one knapsack per time step (in parallel), coordinated by Lagrangian relaxation
+    #   - Returns a DecompositionResult with the plan, its number of rides, an upper bound on the optimal number of rides, and the optimality gap between them
+    #   - workers is the number of processes solving the time step subproblems (None uses every core, and 1, the default, solves them in the current process)
+    #   - executor is a shared executor to solve the subproblems in (e.g., a ProcessPoolExecutor reused between solves), which takes the place of workers
+    @it.instrumented()
+    def maximize_rides_decomposed(self, ride_weights: dict, workers: typing.Optional[int] = 1, max_iterations: int = 100, executor=None):
+
+        # Deal with the possibility of a preference contradiction before moving forward
+        if self.set_contradiction_value(ride_weights, "maximize") or self.require_and_avoid:
+            return None
+
+        decomposition = dc.LagrangianDecomposition(wm.WeightMatrix.from_dict(ride_weights), self.frequency, self.user_preferences)
+        if not decomposition.set_integral_value():
+            raise ValueError("The decomposition requires non-negative integer wait times and frequency")
+        return decomposition.solve(workers, max_iterations, executor=executor)
+
+    # ---------------
+    # Anytime Methods
+    # ---------------
+
+    # Yields (solution, objective, bound) tuples of ever better plans, starting with a greedy plan within milliseconds and ending with the MILP (see AnytimeSolver)
+    #   - objective is "maximize" or "minimize", and deadline is the number of seconds the whole solve may take (None runs the MILP to optimality)
+    #   - Yields nothing if the preferences contradict each other
+    def solve_anytime(self, ride_weights: dict, objective: str = "maximize", deadline: typing.Optional[float] = None):
+        if self.set_contradiction_value(ride_weights, objective) or self.require_and_avoid:
+            return
+        solver = an.AnytimeSolver(self, ride_weights, objective)
+        yield from solver.solve(deadline)
+        self.last_report = solver.last_report
 
     # --------------------
     # Minimization Methods
     # --------------------
 
     # Minimizes the amount of time spent waiting and riding rides over all time steps
+    @it.instrumented()
     def minimize_time(self, ride_weights: dict):
-        prob = pulp.LpProblem("Minimize the total amount of time waiting and riding rides", pulp.LpMinimize)
 
         # Deal with the possibility of a preference contradiction before moving forward
-        if self.set_contradiction_value():
+        if self.set_contradiction_value(ride_weights, "minimize"):
+            return None
+
+        # Reuse the persistent model if one was given; same implementation as maximization method
+        if self.model != None:
+            if self.min_total_rides == None or self.require_and_avoid:
+                return None
+            solution = self.model.solve(ride_weights, self.user_preferences)
+            self.last_report = self.model.last_report
+            return solution
+
+        # Constraint: the sum of all ride_(i, j) must be at least the min total rides preference set by the user
+        # Constraint: required and avoid rides; same implementation as maximization method
+        if self.min_total_rides == None or self.require_and_avoid:
+            return None
+
+        # Presolve; same implementation as maximization method
+        if self.presolve:
+            return ps.solve(self, "minimize_time", ride_weights)
+
+        prob, rides = self.build_minimize_problem(ride_weights)
+        self.last_report = sv.solve(prob, self.solver_config)
+
+        if pulp.LpStatus[prob.status] == "Optimal":
+            with it.span("extract"):
+                return ({key: pulp.value(variable) for key, variable in rides.items()})
+        else:
             return None
 
+    # Returns the PuLP problem for minimizing the total amount of time over all time steps, along with its ride variables
+    @it.instrumented("build")
+    def build_minimize_problem(self, ride_weights: dict) -> tuple:
+        weights = wm.WeightMatrix.from_dict(ride_weights)
+        prob = pulp.LpProblem("Minimize the total amount of time waiting and riding rides", pulp.LpMinimize)
+
         # Variable: defined the same as in the maximization problem
-        rides = pulp.LpVariable.dicts("ride_time_step", [(ride, time_period) for ride in ride_weights.keys() for  time_period in range(1, self.time_steps+1)], lowBound=0, upBound=self.max_ride_repeats,  cat=pulp.LpInteger)
+        rides = self.set_ride_variables(weights)
+        variables = np.array(list(rides.values()), dtype=object).reshape(len(weights.rides), self.time_steps)
+        it.lap("variables")
 
-        # Variable: ride_rode_i will be an LpBinary that is used in the minimum distinct rides constraint (set by the user)
-        rides_rode = pulp.LpVariable.dicts("ride_rode",
-                                        ride_weights.keys(), cat=pulp.LpBinary)
-        
         # Objective function: minimize the amount of time spent waiting in line and riding on rides
-        prob += pulp.lpDot(list(ride_weights[ride][time_step-1] for ride in ride_weights.keys() for time_step in range(1, self.time_steps+1)), [rides[(ride, time_step)] for ride in ride_weights.keys() for time_step in range(1, self.time_steps+1)])
+        prob += pulp.LpAffineExpression(zip(variables.ravel(), weights.flatten().tolist()))
 
         # Constraint: the sum of all ride_(i, j) must be at least the min total rides preference set by the user
-        if self.min_total_rides != None:
-            prob += pulp.lpSum(rides[i, j] for i in ride_weights.keys() for j in range(1, self.time_steps+1)) >= self.min_total_rides
-        else:
-            return None
-        
+        prob += pulp.lpSum(variables.ravel()) >= self.min_total_rides
+
         # Constraint: required and avoid rides; same implementation as maximization method
-        if self.require_and_avoid:
-                return None 
+        self.add_required_and_avoid_constraints(prob, rides)
+
+        # Constraint: max ride repeats; same implementation as maximization method
+        if self.max_ride_repeats != None:
+            for ride, row in zip(weights.rides, variables):
+                prob += pulp.lpSum(row) <= self.set_ride_bound(ride)
+
+        # Constraint: min distinct rides; same implementation as maximization method
+        if self.min_distinct_rides != None:
+            self.add_min_distinct_rides_constraint(prob, rides, weights)
+
+        it.lap("constraints")
+        it.annotate_model(prob)
+        return (prob, rides)
+
+    # -------------------
+    # Constraint Methods
+    # -------------------
+
+    # Adds the required and avoid rides constraints to a problem
+    def add_required_and_avoid_constraints(self, prob: pulp.LpProblem, rides: dict):
         if self.required_rides != None:
             for i in self.all_rides:
                 if i in self.required_rides:
+                    # If the sum of rides[i, j] >= 1 for all time steps j, then the required constraint was satisfied
                     prob += pulp.lpSum(rides[i, j] for j in range(1, self.time_steps+1)) >= 1
         if self.avoid_rides != None:
             for i in self.all_rides:
                 if i in self.avoid_rides:
+                    # If the sum of rides[i, j] = 0 for all time steps j, then the avoid constraint was satisfied
                     prob += pulp.lpSum(rides[i, j] for j in range(1, self.time_steps+1)) == 0
 
-        # Constraint: max ride repeats; same implementation as maximization method
-        if self.max_ride_repeats != None:
-            for i in ride_weights.keys():
-                prob += pulp.lpSum(rides[i, time_step] for time_step in range(1, self.time_steps+1)) <= self.max_ride_repeats
-
-        # Constraint: min distinct rides; same implementation as maximization method
-        if self.min_distinct_rides != None:
-            for i in ride_weights.keys():
-                prob += pulp.lpSum(rides[i, time_step] for time_step in range(1, self.time_steps+1)) >= 1 * rides_rode[i]
-                prob += pulp.lpSum(rides_rode) >= self.min_distinct_rides
-
-        prob.solve()
-
-        if pulp.LpStatus[prob.status] == "Optimal":
-            return ({(ride, time_step): pulp.value(rides[ride, time_step]) for ride in ride_weights.keys() for time_step in range(1, self.time_steps+1)})
-        else:
-            return None  
+    # Adds the min distinct rides constraint to a problem
+    def add_min_distinct_rides_constraint(self, prob: pulp.LpProblem, rides: dict, weights: wm.WeightMatrix):
+        # Variable: ride_rode_i will be an LpBinary that is used in the minimum distinct rides constraint (set by the user)
+        rides_rode = pulp.LpVariable.dicts("ride_rode", weights.rides, cat=pulp.LpBinary)
+        for i in weights.rides:
+            # Case 1: rides[i] = 0 implies rides_rode[i] = 0
+            # Case 2: rides[i] >= 1 implies unique_ride[i] >= 1
+                #   - Since unique_ride[i] is binary, then case 2 implies unique_ride[i] = 1
+            prob += pulp.lpSum(rides[i, time_step] for time_step in range(1, self.time_steps+1)) >= 1 * rides_rode[i]
+        # The number of distinct rides rode (counting all time steps together, not individually) must be at least the user's minimum distinct number of rides constraint
+        #   - This is a single aggregate constraint over all ride_rode_i's, added once after every ride is linked to its binary
+        prob += pulp.lpSum(rides_rode.values()) >= self.min_distinct_rides
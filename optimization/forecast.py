@@ -0,0 +1,176 @@
+from __future__ import annotations
+import collections
+import threading
+import time
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import weight_matrix as wm
+np = li.lazy_import("numpy")
+pd = li.lazy_import("pandas")
+pc = li.lazy_import("pyarrow.compute")
+
+'''
+This file considers forecasting the wait times of every time step from recorded history, so that the dynamic optimization problems no longer need the future wait times to be known beforehand.
+- Each ride has a seasonal profile: its average wait time in each hour of each weekday (falling back to the hour over every weekday, then to the ride's overall average)
+- The recent deviation of each ride from its profile is tracked with exponential smoothing, and decays back to the profile the further ahead a time step is
+- Every ride is fitted at once with NumPy (bincount over ride x hour x weekday cells), so a whole park takes milliseconds
+- Forecasts are cached per snapshot, so reruns with the same history, time steps and frequency do not refit (and forecasts from the current time are shared within a time step)
+'''
+
+SLOTS = 7 * 24
+
+
+class WaitTimeForecaster():
+    def __init__(self, alpha: float = 0.3, damping: float = 0.8, timezone: str = "UTC", samples_per_step: int = 4) -> None:
+        # Hourly smoothing factor of the deviation from the seasonal profile (a higher alpha follows the latest snapshots more closely)
+        self.alpha = alpha
+        # Fraction of the deviation that remains after each hour ahead
+        self.damping = damping
+        # The park's timezone, which defines its hours and weekdays
+        self.timezone = timezone
+        # Number of points of each time step at which the profile is evaluated and averaged
+        self.samples_per_step = samples_per_step
+        self.rides = []
+        self.last_timestamp = None
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the hour of the week (0 is Monday at midnight) of each Unix timestamp, in the park's timezone
+    #   - Every timezone offset is a multiple of 15 minutes, so only the distinct quarter hours of the range are converted, rather than every timestamp
+    def set_slots(self, timestamps: np.ndarray) -> np.ndarray:
+        quarters = np.asarray(timestamps, dtype=np.int64) // 900
+        if len(quarters) == 0:
+            return np.zeros(0, dtype=np.int64)
+        first = quarters.min()
+        times = pd.to_datetime((first + np.arange(quarters.max() - first + 1)) * 900, unit="s", utc=True).tz_convert(self.timezone)
+        slots = np.asarray(times.dayofweek, dtype=np.int64) * 24 + np.asarray(times.hour, dtype=np.int64)
+        return slots[quarters - first]
+
+    # ---------------
+    # Fitting Methods
+    # ---------------
+
+    # Fits the profiles and deviations of every ride from observations given as parallel arrays
+    #   - ride_codes are row indices into rides, and only active observations with a wait time should be given
+    def fit(self, rides: list, ride_codes, timestamps, waits):
+        ride_codes = np.asarray(ride_codes, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        waits = np.asarray(waits, dtype=float)
+        num_rides = len(rides)
+        self.rides = list(rides)
+        self.last_timestamp = int(timestamps.max()) if len(timestamps) else None
+
+        # Average wait of each (ride, hour of the week) cell, then of each (ride, hour), then of each ride
+        slots = self.set_slots(timestamps)
+        cells = ride_codes * SLOTS + slots
+        slot_sums = np.bincount(cells, weights=waits, minlength=num_rides * SLOTS).reshape(num_rides, SLOTS)
+        slot_counts = np.bincount(cells, minlength=num_rides * SLOTS).reshape(num_rides, SLOTS)
+        hour_sums = slot_sums.reshape(num_rides, 7, 24).sum(axis=1)
+        hour_counts = slot_counts.reshape(num_rides, 7, 24).sum(axis=1)
+        ride_sums = slot_sums.sum(axis=1)
+        ride_counts = slot_counts.sum(axis=1)
+        ride_means = np.divide(ride_sums, ride_counts, out=np.zeros(num_rides), where=ride_counts > 0)
+        hour_means = np.divide(hour_sums, hour_counts, out=np.repeat(ride_means[:, None], 24, axis=1), where=hour_counts > 0)
+        self.profiles = np.divide(slot_sums, slot_counts, out=np.tile(hour_means, (1, 7)), where=slot_counts > 0)
+
+        # Exponentially smoothed deviation from the profile, where an observation taken k hours before the latest snapshot weighs (1 - alpha)^k
+        #   - The weights only depend on the age of each observation, so no per-ride sort is needed
+        self.deviations = np.zeros(num_rides)
+        if len(waits):
+            residuals = waits - self.profiles[ride_codes, slots]
+            weights = (1 - self.alpha) ** ((self.last_timestamp - timestamps) / 3600)
+            totals = np.bincount(ride_codes, weights=weights, minlength=num_rides)
+            self.deviations = np.divide(np.bincount(ride_codes, weights=weights * residuals, minlength=num_rides), totals, out=np.zeros(num_rides), where=totals > 0)
+        return self
+
+    # Fits every ride of a park from the history of a WaitTimeStore between two Unix timestamps
+    def fit_store(self, store, park: str, start: float, end: float):
+        table = store.read(park, start, end)
+        table = table.filter(pc.and_(table.column("active"), pc.is_valid(table.column("wait_time"))))
+        if table.num_rows == 0:
+            return self.fit([], [], [], [])
+        ride_column = table.column("ride").chunk(0)
+        dictionary = ride_column.dictionary.to_pylist()
+        codes = ride_column.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+        # Only keep the rides that appear in the history, sorted by name
+        present = np.flatnonzero(np.bincount(codes, minlength=len(dictionary)))
+        rides = sorted(dictionary[code] for code in present)
+        rows = np.full(len(dictionary), -1, dtype=np.int64)
+        positions = {ride: i for i, ride in enumerate(rides)}
+        rows[present] = [positions[dictionary[code]] for code in present]
+        return self.fit(rides, rows[codes], table.column("timestamp").to_numpy(), table.column("wait_time").to_numpy().astype(float))
+
+    # -------------------
+    # Forecasting Methods
+    # -------------------
+
+    # Returns a rides x time steps WeightMatrix of the forecasted average wait time of each ride in each time step of frequency minutes, starting at a Unix timestamp
+    #   - rides (in any order) defaults to the fitted rides, and rides with no history are forecasted at 0
+    def predict(self, start: float, time_steps: int, frequency: int, rides: typing.Optional[list] = None) -> wm.WeightMatrix:
+        rides = list(rides) if rides != None else list(self.rides)
+        index = {ride: i for i, ride in enumerate(self.rides)}
+        rows = np.array([index.get(ride, -1) for ride in rides], dtype=np.int64)
+
+        # Sample points of each time step, and their distance in hours from the latest observation
+        step = int(frequency) * 60
+        offsets = (np.arange(self.samples_per_step) + 0.5) * step / self.samples_per_step
+        samples = (int(start) + np.arange(time_steps)[:, None] * step + offsets[None, :]).astype(np.int64)
+        slots = self.set_slots(samples.ravel()).reshape(samples.shape)
+        reference = self.last_timestamp if self.last_timestamp != None else int(start)
+        hours_ahead = np.maximum(samples - reference, 0) / 3600
+
+        if len(self.rides) == 0:
+            return wm.WeightMatrix(rides, np.zeros((len(rides), time_steps)))
+        known = np.maximum(rows, 0)
+        # profiles[row, slot] + deviation[row] * damping^(hours ahead), averaged over the samples of each time step
+        forecasts = self.profiles[known][:, slots] + self.deviations[known][:, None, None] * (self.damping ** hours_ahead)[None, :, :]
+        values = np.maximum(forecasts.mean(axis=2), 0)
+        values[rows < 0] = 0
+        return wm.WeightMatrix(rides, values)
+
+
+class ForecastCache():
+    def __init__(self, maxsize: int = 64, history_days: int = 28, forecaster_options: typing.Optional[dict] = None) -> None:
+        self.maxsize = maxsize
+        # Days of history that each forecaster is fitted on
+        self.history_days = history_days
+        self.forecaster_options = forecaster_options or {}
+        # Fitted forecasters keyed by (park, latest snapshot), and forecasts keyed by (park, latest snapshot, start, time steps, frequency, rides)
+        self.forecasters = collections.OrderedDict()
+        self.forecasts = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    # Returns the {time step: [waits]} dict of OptimizeDynamic for a park, refitting only when the store has a newer snapshot
+    def wait_times(self, store, park: str, time_steps: int, frequency: int, rides: list, start: typing.Optional[float] = None) -> dict:
+        return self.predict(store, park, time_steps, frequency, rides, start).to_wait_times()
+
+    # Returns the forecasted WeightMatrix of a park, refitting only when the store has a newer snapshot
+    #   - start defaults to the start of the current time step (the current time rounded down to a multiple of the frequency), so that requests within a time step share a forecast
+    def predict(self, store, park: str, time_steps: int, frequency: int, rides: list, start: typing.Optional[float] = None) -> wm.WeightMatrix:
+        step = int(frequency) * 60
+        start = int(time.time()) // step * step if start == None else int(start)
+        snapshot = (park, store.set_latest(park))
+        key = snapshot + (start, time_steps, frequency, tuple(rides))
+        with self.lock:
+            if key in self.forecasts:
+                self.forecasts.move_to_end(key)
+                return self.forecasts[key]
+            forecaster = self.forecasters.get(snapshot)
+        if forecaster == None:
+            end = snapshot[1] + 1 if snapshot[1] != None else start
+            forecaster = WaitTimeForecaster(**self.forecaster_options).fit_store(store, park, end - self.history_days * 86400, end)
+        weights = forecaster.predict(start, time_steps, frequency, rides)
+        with self.lock:
+            self.forecasters[snapshot] = forecaster
+            self.forecasts[key] = weights
+            for entries in (self.forecasters, self.forecasts):
+                while len(entries) > self.maxsize:
+                    entries.popitem(last=False)
+        return weights
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import copy
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import user_preferences as up
+from optimization import solvers as sv
+from optimization import preflight as pf
+from optimization import weight_matrix as wm
+from optimization import instrumentation as it
+pulp = li.lazy_import("pulp")
+np = li.lazy_import("numpy")
+
+'''
+This file considers planning for a group (e.g., a family), where every member has their own user preferences, and some rides must be ridden together.
+- A ride that must be ridden together has one shared ride count for the whole group, and every other ride has one ride count per member
+- Every member's preferences (max time, required and avoid rides, max ride repeats, min distinct and min total rides) apply to their own ride counts, shared ones included
+- Members with identical preferences have identical problems once the shared ride counts are fixed, so they share one set of ride counts, weighted by how many members they stand for
+    - A group of 10 with a few distinct preference sets is then about as large as a few separate problems, whatever the group size
+- Wait times are constant (ride_weights of {ride: weight}), or dynamic (ride_weights of {ride: [weight at each time step]} with a frequency), like OptimizeConstant and OptimizeDynamic
+- Distinct members coupled by shared rides can take long to prove optimal with dynamic times (10 members on a 60 ride park with 8 time steps run for minutes), while a plan within a fraction of a percent is found within seconds
+    - So every solve has a time limit of time_limit seconds (TIME_LIMIT by default) unless the solver config sets one, and last_report tells whether the plans were proven optimal (set_proven_value) along with their gap
+'''
+
+# The default time limit of each group solve in seconds, when the solver config sets none
+TIME_LIMIT = 10
+
+
+class GroupOptimizer():
+    def __init__(self, all_rides: list, ride_weights: dict, members: list, together="all", frequency: typing.Optional[int] = None, solver_config: typing.Optional[sv.SolverConfig] = None, time_limit: typing.Optional[float] = TIME_LIMIT) -> None:
+        self.all_rides = list(all_rides)
+        # One UserPreferences per member of the group
+        self.members = list(members)
+        # The rides that must be ridden together: "all", "none", or a list of rides
+        if together == "all":
+            self.together = set(self.all_rides)
+        elif together == "none":
+            self.together = set()
+        else:
+            self.together = set(together)
+        self.frequency = frequency
+        self.solver_config = solver_config
+        # The time limit of each solve in seconds, unless the solver config sets one (None solves to optimality)
+        self.time_limit = time_limit
+        # Dynamic times when the weights of a ride are a list of the weights at each time step
+        self.dynamic = frequency != None
+        if self.dynamic:
+            weights = wm.WeightMatrix.from_dict(ride_weights)
+            self.weights = wm.WeightMatrix(self.all_rides, weights.matrix[[weights.index[ride] for ride in self.all_rides]])
+        else:
+            self.weights = wm.WeightMatrix(self.all_rides, np.array([ride_weights[ride] for ride in self.all_rides], dtype=float).reshape(-1, 1))
+        self.time_steps = self.weights.time_steps
+        self.ride_weights = ride_weights
+        self.classes = self.set_classes()
+        # The report of the most recent solve, which tells whether the plans were proven optimal or cut short by the time limit
+        self.last_report = None
+        self.conflicts = []
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns a list of (user preferences, member indices) tuples, one for each distinct set of preferences in the group
+    #   - canonical_key only merges preferences with the same constraints (e.g., a max ride repeats of 0 stays apart from no limit)
+    def set_classes(self) -> list:
+        classes = {}
+        for index, user_preferences in enumerate(self.members):
+            classes.setdefault(user_preferences.canonical_key(), (user_preferences, []))[1].append(index)
+        return list(classes.values())
+
+    # Returns the keys of the ride counts: ride names for constant times, and (ride, time step) tuples for dynamic times
+    def set_keys(self, ride) -> list:
+        if self.dynamic:
+            return [(ride, time_step) for time_step in range(1, self.time_steps+1)]
+        return [ride]
+
+    # Returns the weight of a ride count key
+    def set_weight(self, key) -> float:
+        if self.dynamic:
+            return float(self.weights.matrix[self.weights.index[key[0]], key[1]-1])
+        return float(self.weights.matrix[self.weights.index[key], 0])
+
+    # Returns the solver config of the group solves, with the time limit of the group if the solver config sets none
+    def set_solver_config(self) -> sv.SolverConfig:
+        config = copy.copy(self.solver_config if self.solver_config != None else sv.SolverConfig())
+        if config.time_limit == None:
+            config.time_limit = self.time_limit
+        return config
+
+    # Returns a bool as to whether the preferences contradict each other, keeping the conflicts in self.conflicts
+    #   - Every distinct preference set goes through the same preflight analysis as the single user optimizers
+    #   - A ride ridden together cannot be required by one member and avoided by another, or ridden at all by a member with a max ride repeats of 0
+    def set_contradiction_value(self, objective: typing.Optional[str] = None) -> bool:
+        self.conflicts = []
+        for user_preferences, indices in self.classes:
+            names = ", ".join(str(index + 1) for index in indices)
+            if user_preferences.require_and_avoid_rides():
+                self.conflicts.append(pf.Conflict(("required_rides", "avoid_rides"), f"Member(s) {names}: a ride is both required and avoided"))
+                continue
+            for conflict in pf.Preflight(self.ride_weights, user_preferences, objective, self.time_steps if self.dynamic else None, self.frequency).run():
+                self.conflicts.append(pf.Conflict(conflict.constraints, f"Member(s) {names}: {conflict.message}", conflict.rides))
+        for ride in sorted(self.together, key=str):
+            required = [index + 1 for index, user_preferences in enumerate(self.members) if ride in (user_preferences.required_rides or [])]
+            avoided = [index + 1 for index, user_preferences in enumerate(self.members) if ride in (user_preferences.avoid_rides or [])]
+            if required and avoided:
+                self.conflicts.append(pf.Conflict(("required_rides", "avoid_rides"), f"{ride} must be ridden together, but member(s) {', '.join(map(str, required))} require it and member(s) {', '.join(map(str, avoided))} avoid it", [ride]))
+            no_repeats = [index + 1 for index, user_preferences in enumerate(self.members) if user_preferences.max_ride_repeats == 0]
+            if required and no_repeats:
+                self.conflicts.append(pf.Conflict(("required_rides", "max_ride_repeats"), f"{ride} must be ridden together, but member(s) {', '.join(map(str, required))} require it and member(s) {', '.join(map(str, no_repeats))} have a max ride repeats of 0", [ride]))
+        return len(self.conflicts) > 0
+
+    # ---------------
+    # Model Methods
+    # ---------------
+
+    # Returns the PuLP problem of the group, along with the shared ride counts ({key: variable}) and the ride counts of each preference class ([{key: variable or shared variable}])
+    @it.instrumented("build")
+    def build_problem(self, objective: str) -> tuple:
+        sense = pulp.LpMaximize if objective == "maximize" else pulp.LpMinimize
+        prob = pulp.LpProblem("Plan the rides of a group", sense)
+
+        # Variable: shared_(i, j) is the number of times the whole group rides ride i (during time step j), with the max ride repeats of the strictest member
+        repeats = [user_preferences.max_ride_repeats for user_preferences in self.members if user_preferences.max_ride_repeats != None]
+        shared_keys = [key for ride in self.all_rides if ride in self.together for key in self.set_keys(ride)]
+        shared = pulp.LpVariable.dicts("shared", shared_keys, lowBound=0, upBound=min(repeats) if repeats else None, cat=pulp.LpInteger)
+
+        # Variable: ride_(c, i, j) is the number of times each member of preference class c rides ride i (during time step j) on their own
+        counts = []
+        for c, (user_preferences, indices) in enumerate(self.classes):
+            own_keys = [key for ride in self.all_rides if ride not in self.together for key in self.set_keys(ride)]
+            own = pulp.LpVariable.dicts(f"ride_{c}", own_keys, lowBound=0, upBound=user_preferences.max_ride_repeats, cat=pulp.LpInteger)
+            counts.append({key: shared[key] if key in shared else own[key] for ride in self.all_rides for key in self.set_keys(ride)})
+        it.lap("variables")
+
+        # Objective function: the total number of rides (or total time) of every member, where each class counts once per member it stands for
+        terms = []
+        for (user_preferences, indices), class_counts in zip(self.classes, counts):
+            for key, variable in class_counts.items():
+                terms.append((variable, len(indices) * (1 if objective == "maximize" else self.set_weight(key))))
+        prob += pulp.LpAffineExpression(terms)
+
+        for c, ((user_preferences, indices), class_counts) in enumerate(zip(self.classes, counts)):
+            time_spent = pulp.LpAffineExpression((variable, self.set_weight(key)) for key, variable in class_counts.items())
+            # Constraint: each member's total time must be at most their max time (only the maximization problem is bounded by it)
+            if objective == "maximize" and user_preferences.max_time != None:
+                prob += time_spent <= user_preferences.max_time
+            # Constraint: each member's time in each time step must be at most the frequency
+            if objective == "maximize" and self.dynamic:
+                for time_step in range(1, self.time_steps+1):
+                    prob += pulp.LpAffineExpression((class_counts[ride, time_step], self.set_weight((ride, time_step))) for ride in self.all_rides) <= self.frequency
+            # Constraint: each member must go on at least their min total rides
+            if objective == "minimize":
+                prob += pulp.lpSum(class_counts.values()) >= user_preferences.min_total_rides
+
+            totals = {ride: pulp.lpSum(class_counts[key] for key in self.set_keys(ride)) for ride in self.all_rides}
+            for ride in user_preferences.required_rides or []:
+                prob += totals[ride] >= 1
+            for ride in user_preferences.avoid_rides or []:
+                prob += totals[ride] == 0
+            # Constraint: the max ride repeats of the shared rides (the bounds of the variables already cover the rides of a single time step)
+            if user_preferences.max_ride_repeats != None and (self.dynamic or len(self.together) > 0):
+                for ride in self.all_rides:
+                    if self.dynamic or ride in self.together:
+                        prob += totals[ride] <= user_preferences.max_ride_repeats
+
+            # Constraint: each member must go on at least their min distinct rides
+            if user_preferences.min_distinct_rides:
+                rides_rode = pulp.LpVariable.dicts(f"ride_rode_{c}", self.all_rides, cat=pulp.LpBinary)
+                for ride in self.all_rides:
+                    prob += totals[ride] >= rides_rode[ride]
+                prob += pulp.lpSum(rides_rode.values()) >= user_preferences.min_distinct_rides
+
+        it.lap("constraints")
+        it.annotate_model(prob)
+        return (prob, shared, counts)
+
+    # Solves the problem of the group, returning a list with the solution of each member (in the same format as OptimizeConstant or OptimizeDynamic), or None if there is no feasible solution
+    def solve(self, objective: str) -> typing.Optional[list]:
+        if self.set_contradiction_value(objective):
+            return None
+        prob, shared, counts = self.build_problem(objective)
+        self.last_report = sv.solve(prob, self.set_solver_config())
+        if pulp.LpStatus[prob.status] != "Optimal":
+            return None
+        with it.span("extract"):
+            class_solutions = [{key: float(round(pulp.value(variable) or 0)) for key, variable in class_counts.items()} for class_counts in counts]
+            solutions = [None] * len(self.members)
+            for (user_preferences, indices), solution in zip(self.classes, class_solutions):
+                for index in indices:
+                    solutions[index] = dict(solution)
+            return solutions
+
+    # --------------------
+    # Maximization Methods
+    # --------------------
+
+    # Maximizes the total number of rides of the whole group
+    #   - With constant times, every member must set a max time, or else the solution would be unbounded
+    @it.instrumented()
+    def maximize_rides(self) -> typing.Optional[list]:
+        if not self.dynamic and any(user_preferences.max_time == None for user_preferences in self.members):
+            return None
+        return self.solve("maximize")
+
+    # --------------------
+    # Minimization Methods
+    # --------------------
+
+    # Minimizes the total amount of time of the whole group, where every member goes on at least their min total rides
+    @it.instrumented()
+    def minimize_time(self) -> typing.Optional[list]:
+        if any(user_preferences.min_total_rides == None for user_preferences in self.members):
+            return None
+        return self.solve("minimize")
@@ -0,0 +1,171 @@
+import contextlib
+import functools
+import logging
+import threading
+import time
+import typing
+
+'''
+This file considers timing the phases of a solve (preflight, presolve, model build, solver call and result extraction), so that a slow solve can be traced to the phase it spent its time in.
+- Each phase is a Span with a name, a duration, attributes (e.g., model size or solver status) and a parent span, so the phases of a presolved problem nest inside the presolve
+- Finished spans are sent to every registered hook (any callable taking a Span), such as a SpanRecorder, logging_hook, or an exporter to a metrics pipeline
+- With no hook registered, every instrumented call only checks that the list of hooks is empty, so the instrumentation can stay in place in production
+'''
+
+# The callables that receive every finished span
+hooks = []
+hooks_lock = threading.Lock()
+# The stack of open spans of each thread
+local = threading.local()
+
+
+class Span():
+    def __init__(self, name: str, parent: typing.Optional["Span"] = None) -> None:
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent != None else 0
+        self.attributes = {}
+        self.start = time.perf_counter()
+        self.duration = None
+        # The time at the end of the previous lap, where laps time the parts of a phase (e.g., the variables and constraints of a build)
+        self.lap_start = self.start
+
+    # Returns the names of the span and its parents, from the outermost one (e.g., "OptimizeDynamic.maximize_rides/build")
+    def set_path(self) -> str:
+        return self.name if self.parent == None else f"{self.parent.set_path()}/{self.name}"
+
+    # Records the time since the start of the span (or the previous lap) as the attribute "{name}_seconds"
+    def lap(self, name: str):
+        now = time.perf_counter()
+        self.attributes[f"{name}_seconds"] = now - self.lap_start
+        self.lap_start = now
+
+    def __repr__(self) -> str:
+        duration = f"{self.duration:.6f}" if self.duration != None else None
+        return f"Span(name={self.set_path()!r}, duration={duration}, attributes={self.attributes})"
+
+
+# -------------
+# Hook Methods
+# -------------
+
+# Registers a hook, which is called with every finished span (from every thread)
+def add_hook(hook: typing.Callable):
+    with hooks_lock:
+        hooks.append(hook)
+
+# Unregisters a hook
+def remove_hook(hook: typing.Callable):
+    with hooks_lock:
+        if hook in hooks:
+            hooks.remove(hook)
+
+# Returns a bool as to whether any hook is registered, i.e., whether spans are recorded at all
+def set_enabled_value() -> bool:
+    return len(hooks) > 0
+
+
+class SpanRecorder():
+    def __init__(self) -> None:
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def __call__(self, span: Span):
+        with self.lock:
+            self.spans.append(span)
+
+    # Returns a dict where the keys are span names, and the values are their total durations
+    def totals(self) -> dict:
+        totals = {}
+        with self.lock:
+            for span in self.spans:
+                totals[span.name] = totals.get(span.name, 0) + span.duration
+        return totals
+
+    # Returns the recorded spans with a name
+    def find(self, name: str) -> list:
+        with self.lock:
+            return [span for span in self.spans if span.name == name]
+
+
+# Returns a hook that logs every finished span as one line (at the DEBUG level by default)
+def logging_hook(logger: typing.Optional[logging.Logger] = None, level: int = logging.DEBUG) -> typing.Callable:
+    logger = logger if logger != None else logging.getLogger("optimization")
+
+    def hook(span: Span):
+        attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+        logger.log(level, "%s took %.6fs %s", span.set_path(), span.duration, attributes)
+    return hook
+
+# Records every span finished inside the with block, yielding the SpanRecorder
+@contextlib.contextmanager
+def recording():
+    recorder = SpanRecorder()
+    add_hook(recorder)
+    try:
+        yield recorder
+    finally:
+        remove_hook(recorder)
+
+
+# -------------
+# Span Methods
+# -------------
+
+# Returns the innermost open span of the current thread, or None
+def set_current_span() -> typing.Optional[Span]:
+    stack = getattr(local, "stack", None)
+    return stack[-1] if stack else None
+
+# Times the with block as a span, yielding the Span (or None if no hook is registered)
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    if not hooks:
+        yield None
+        return
+    stack = getattr(local, "stack", None)
+    if stack == None:
+        stack = local.stack = []
+    current = Span(name, stack[-1] if stack else None)
+    current.attributes.update(attributes)
+    stack.append(current)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        stack.pop()
+        for hook in list(hooks):
+            hook(current)
+
+# Decorates a function or method so that each call is timed as a span (named after the class and method, if no name is given)
+def instrumented(name: typing.Optional[str] = None) -> typing.Callable:
+    def decorator(function: typing.Callable) -> typing.Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not hooks:
+                return function(*args, **kwargs)
+            span_name = name if name != None else (f"{type(args[0]).__name__}.{function.__name__}" if args and hasattr(args[0], function.__name__) else function.__name__)
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Adds attributes to the innermost open span (does nothing if no span is open)
+def annotate(**attributes):
+    if hooks:
+        current = set_current_span()
+        if current != None:
+            current.attributes.update(attributes)
+
+# Records a lap of the innermost open span (does nothing if no span is open)
+def lap(name: str):
+    if hooks:
+        current = set_current_span()
+        if current != None:
+            current.lap(name)
+
+# Adds the size of a PuLP problem (variables, constraints and constraint nonzeros) to the innermost open span
+#   - Counting the nonzeros goes over every constraint, so it is only done if a span is open
+def annotate_model(prob):
+    if hooks and set_current_span() != None:
+        annotate(variables=prob.numVariables(), constraints=prob.numConstraints(), nonzeros=sum(len(constraint) for constraint in prob.constraints.values()))
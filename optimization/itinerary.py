@@ -0,0 +1,402 @@
+from __future__ import annotations
+import time
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import user_preferences as up
+from optimization import solvers as sv
+from optimization import weight_matrix as wm
+pulp = li.lazy_import("pulp")
+np = li.lazy_import("numpy")
+
+'''
+This file considers the order in which the rides are taken, since walking between rides also takes time.
+- An itinerary is an ordered list of rides, which starts at the entrance; walking to a ride takes the time in a ride-to-ride travel time matrix
+- The wait time of a ride depends on the time step the user gets in line (the same ride weights as OptimizeDynamic, or constant ones), and the user walks to the next ride as soon as a ride ends
+- The maximization problem fits the most rides into the time available (walking included), and the minimization problem takes the least total time to go on the min total rides
+- The user preferences are the same as in the other optimization problems
+- The heuristic engine builds an itinerary by cheapest insertion (every position and ride evaluated at once with NumPy), then improves it with 2-opt and or-opt moves and inserts rides again
+- Small instances can be solved exactly with a MILP, where each ride has one copy per allowed repeat and the copies are linked into a path with time constraints
+'''
+
+
+class Itinerary():
+    def __init__(self, rides: list, arrivals: list, waits: list, end_time: float, walking_time: float) -> None:
+        # The rides in the order they are taken, the time the user gets in line for each of them, and their wait times
+        self.rides = rides
+        self.arrivals = arrivals
+        self.waits = waits
+        # The time the last ride ends at, and the part of it spent walking
+        self.end_time = end_time
+        self.walking_time = walking_time
+
+    # Returns a dict where the keys are ride names, and the values are the number of times each ride is taken (the same format as the solutions of OptimizeConstant)
+    def set_ride_counts(self, all_rides: list) -> dict:
+        counts = {ride: 0 for ride in all_rides}
+        for ride in self.rides:
+            counts[ride] += 1
+        return counts
+
+    def __len__(self) -> int:
+        return len(self.rides)
+
+    def __repr__(self) -> str:
+        return f"Itinerary(rides={self.rides}, end_time={self.end_time}, walking_time={self.walking_time})"
+
+
+class ItineraryOptimizer():
+    def __init__(self, all_rides: list, ride_weights: dict, travel_times, user_preferences: up.UserPreferences, frequency: typing.Optional[int] = None, start_times: typing.Optional[list] = None, repeats_cap: int = 10, window: int = 15, time_limit: typing.Optional[float] = 2.0, solver_config: typing.Optional[sv.SolverConfig] = None) -> None:
+        self.all_rides = list(all_rides)
+        # Wait times as a rides x time steps array (one column for constant times), where the time step of a ride is the one the user gets in line at
+        weights = wm.WeightMatrix.from_dict(ride_weights)
+        self.waits = np.asarray(weights.matrix[[weights.index[ride] for ride in self.all_rides]], dtype=float).reshape(len(self.all_rides), -1)
+        self.time_steps = self.waits.shape[1]
+        self.frequency = frequency
+        # Walking times between rides (rows are the ride walked from, in the order of all_rides), and from the entrance to each ride
+        #   - The diagonal is the time between two rides of the same ride, which is usually 0
+        self.travel = np.asarray(travel_times, dtype=float)
+        self.start = np.asarray(start_times, dtype=float) if start_times != None else np.zeros(len(self.all_rides))
+        if self.travel.shape != (len(self.all_rides), len(self.all_rides)) or self.start.shape != (len(self.all_rides),):
+            raise ValueError(f"Expected a {len(self.all_rides)} x {len(self.all_rides)} travel time matrix")
+        # Plain lists, which are faster than NumPy for the scalar lookups of the local search
+        self.travel_list = self.travel.tolist()
+        # Start times of the time steps after the first one
+        self.boundaries = np.arange(1, self.time_steps) * float(frequency) if frequency != None else np.zeros(0)
+        self.start_list = self.start.tolist()
+        self.wait_list = self.waits.tolist()
+        self.user_preferences = user_preferences
+        self.required_rides = [self.all_rides.index(ride) for ride in user_preferences.required_rides or [] if ride in self.all_rides]
+        self.avoid_rides = {self.all_rides.index(ride) for ride in user_preferences.avoid_rides or [] if ride in self.all_rides}
+        self.min_distinct_rides = user_preferences.min_distinct_rides or 0
+        # Without max ride repeats, a ride is taken at most repeats_cap times, so that rides with no wait cannot be repeated forever
+        self.max_ride_repeats = user_preferences.max_ride_repeats or repeats_cap
+        # Max distance between the positions of a 2-opt or or-opt move, and the seconds the heuristic engine may spend on local search (None for no limit)
+        self.window = window
+        # Number of rides an exchange move tries to replace
+        self.exchange_size = 16
+        self.time_limit = time_limit
+        # The solver of the exact MILP, and the SolveReport of its most recent solve
+        self.solver_config = solver_config
+        self.last_report = None
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the time available for the itinerary: the max time, and with dynamic times, the end of the last time step (infinity for the minimization problem)
+    def set_budget(self, objective: str) -> float:
+        if objective == "minimize":
+            return float("inf")
+        budgets = [self.user_preferences.max_time] if self.user_preferences.max_time != None else []
+        if self.frequency != None and self.time_steps > 1:
+            budgets.append(self.time_steps * self.frequency)
+        if len(budgets) == 0:
+            raise ValueError("The maximization problem requires a max time (or dynamic times with a frequency)")
+        return float(min(budgets))
+
+    # Returns the index of the time step of a time (the last time step for any time after it)
+    def set_time_step(self, t: float) -> int:
+        if self.frequency == None:
+            return 0
+        return min(int(t // self.frequency), self.time_steps - 1)
+
+    # Returns the time the last ride of a route (a list of ride indices) ends at
+    def set_end_time(self, route: list) -> float:
+        t = 0.0
+        previous = -1
+        for ride in route:
+            t += self.start_list[ride] if previous < 0 else self.travel_list[previous][ride]
+            t += self.wait_list[ride][self.set_time_step(t)]
+            previous = ride
+        return t
+
+    # Returns the Itinerary of a route
+    def set_itinerary(self, route: list) -> Itinerary:
+        t = 0.0
+        walking_time = 0.0
+        arrivals = []
+        waits = []
+        previous = -1
+        for ride in route:
+            walk = self.start_list[ride] if previous < 0 else self.travel_list[previous][ride]
+            t += walk
+            walking_time += walk
+            arrivals.append(t)
+            waits.append(self.wait_list[ride][self.set_time_step(t)])
+            t += waits[-1]
+            previous = ride
+        return Itinerary([self.all_rides[ride] for ride in route], arrivals, waits, t, walking_time)
+
+    # Returns a (positions x candidates) array of the end time of the route after inserting each candidate ride at each position
+    #   - Every candidate and position is simulated at once: row p is the route with the candidate inserted before route[p]
+    def set_insertion_end_times(self, route: list, candidates: np.ndarray) -> np.ndarray:
+        length = len(route)
+        # Time at which the first p rides of the route end, for every position p
+        finish = np.zeros(length + 1)
+        t = 0.0
+        for p, ride in enumerate(route):
+            t += self.start_list[ride] if p == 0 else self.travel_list[route[p-1]][ride]
+            t += self.wait_list[ride][self.set_time_step(t)]
+            finish[p+1] = t
+        walks = np.vstack([self.start, self.travel[route]])[:, candidates]
+        times = finish[:, None] + walks
+        times += self.waits[candidates[None, :], self.set_time_steps(times)]
+        # Then the rest of the route, where route[k] is walked to from the candidate in row k, and from route[k-1] in the rows before it
+        for k, ride in enumerate(route):
+            rows = times[:k+1]
+            walk = np.empty_like(rows)
+            walk[:k] = self.travel_list[route[k-1]][ride] if k > 0 else 0
+            walk[k] = self.travel[candidates, ride]
+            rows += walk
+            rows += self.waits[ride, self.set_time_steps(rows)]
+        return times
+
+    # Returns the indices of the time steps of an array of times
+    #   - The index is the number of time step boundaries at or before each time, which needs no division
+    def set_time_steps(self, times: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.boundaries, times, side="right")
+
+    # -----------------
+    # Heuristic Methods
+    # -----------------
+
+    # Inserts the cheapest candidate ride at its cheapest position, returning whether a ride fit in the budget
+    def insert(self, route: list, candidates: list, budget: float) -> bool:
+        if len(candidates) == 0:
+            return False
+        candidates = np.array(candidates, dtype=np.int64)
+        end_times = self.set_insertion_end_times(route, candidates)
+        position, candidate = np.unravel_index(np.argmin(end_times), end_times.shape)
+        if end_times[position, candidate] > budget:
+            return False
+        route.insert(int(position), int(candidates[candidate]))
+        return True
+
+    # Returns the rides that can still be inserted, with the rides needed by the required rides and min distinct rides preferences first
+    def set_candidates(self, route: list) -> tuple:
+        counts = np.bincount(np.array(route, dtype=np.int64), minlength=len(self.all_rides))
+        required = [ride for ride in self.required_rides if counts[ride] == 0]
+        if required:
+            return (required, True)
+        if np.count_nonzero(counts) < self.min_distinct_rides:
+            return ([ride for ride in range(len(self.all_rides)) if counts[ride] == 0 and ride not in self.avoid_rides], True)
+        return ([ride for ride in range(len(self.all_rides)) if counts[ride] < self.max_ride_repeats and ride not in self.avoid_rides], False)
+
+    # Returns the end time of each route of a (routes x rides) array, simulating every route at once
+    def set_end_times(self, routes: np.ndarray) -> np.ndarray:
+        times = self.start[routes[:, 0]]
+        times += self.waits[routes[:, 0], self.set_time_steps(times)]
+        for k in range(1, routes.shape[1]):
+            times += self.travel[routes[:, k-1], routes[:, k]]
+            times += self.waits[routes[:, k], self.set_time_steps(times)]
+        return times
+
+    # Returns a (moves x rides) array of the routes of every 2-opt move (reversing route[i:j]) and or-opt move (moving a segment of up to 3 rides elsewhere), within the window
+    def set_neighbors(self, route: list) -> np.ndarray:
+        length = len(route)
+        positions = np.arange(length)
+        # 2-opt: position q takes i + j - 1 - q inside the reversed segment
+        i, j = np.triu_indices(length + 1, k=2)
+        keep = j - i <= self.window
+        i, j = i[keep][:, None], j[keep][:, None]
+        reversals = np.where((positions >= i) & (positions < j), i + j - 1 - positions, positions)
+        # Or-opt: the segment [i, i + size) is taken out, and put back before the ride at position j of the rest of the route
+        moves = []
+        for size in (1, 2, 3):
+            if size >= length:
+                break
+            i, j = np.meshgrid(np.arange(length - size + 1), np.arange(length - size + 1), indexing="ij")
+            i, j = i.ravel()[:, None], j.ravel()[:, None]
+            keep = ((i != j) & (np.abs(i - j) <= self.window)).ravel()
+            i, j = i[keep], j[keep]
+            rest = np.where(positions - (positions >= j) * size >= i, positions - (positions >= j) * size + size, positions - (positions >= j) * size)
+            moves.append(np.where((positions >= j) & (positions < j + size), i + positions - j, rest))
+        return np.asarray(route, dtype=np.int64)[np.vstack([reversals] + moves)]
+
+    # Improves a route with the best 2-opt, or-opt and (if exchange) exchange moves until no move ends it earlier, or until a perf_counter deadline
+    def improve(self, route: list, exchange: bool = True, deadline: float = float("inf"), max_passes: int = 1000) -> list:
+        best = self.set_end_time(route)
+        for _ in range(max_passes):
+            if time.perf_counter() > deadline:
+                break
+            improved = False
+            length = len(route)
+            if length >= 2:
+                neighbors = self.set_neighbors(route)
+                end_times = self.set_end_times(neighbors)
+                move = int(np.argmin(end_times))
+                if end_times[move] < best - 1e-9:
+                    route, best, improved = neighbors[move].tolist(), float(end_times[move]), True
+            # Exchange, once no 2-opt or or-opt move helps: replace a ride with the ride and position that end the route the earliest, while keeping the preferences met
+            #   - Only the rides whose removal saves the most time are tried, which are found by simulating every removal at once
+            if exchange and not improved and length >= 2:
+                removals = np.array([route[:i] + route[i+1:] for i in range(length)], dtype=np.int64)
+                for i in np.argsort(self.set_end_times(removals))[:self.exchange_size].tolist():
+                    rest = route[:i] + route[i+1:]
+                    candidates = self.set_exchange_candidates(rest, route[i])
+                    if len(candidates) == 0:
+                        continue
+                    end_times = self.set_insertion_end_times(rest, candidates)
+                    position, candidate = np.unravel_index(np.argmin(end_times), end_times.shape)
+                    if end_times[position, candidate] < best - 1e-9:
+                        route = rest[:position] + [int(candidates[candidate])] + rest[position:]
+                        best, improved = float(end_times[position, candidate]), True
+                        break
+            if not improved:
+                break
+        return route
+
+    # Returns the rides that can replace a ride removed from a route, so that the required rides, min distinct rides and max ride repeats are still met
+    def set_exchange_candidates(self, rest: list, removed: int) -> np.ndarray:
+        counts = np.bincount(np.array(rest, dtype=np.int64), minlength=len(self.all_rides))
+        if counts[removed] == 0 and removed in self.required_rides:
+            return np.zeros(0, dtype=np.int64)
+        allowed = counts < self.max_ride_repeats
+        allowed[list(self.avoid_rides)] = False
+        allowed[removed] = False
+        # Without the removed ride, the route may need a ride it does not have yet to keep enough distinct rides
+        if np.count_nonzero(counts) < self.min_distinct_rides:
+            allowed &= counts == 0
+        return np.flatnonzero(allowed)
+
+    # Returns a route built by cheapest insertion and local search, or None if the preferences could not be met
+    def solve_heuristic(self, objective: str) -> typing.Optional[list]:
+        budget = self.set_budget(objective)
+        min_total_rides = self.user_preferences.min_total_rides or 0
+        deadline = time.perf_counter() + self.time_limit if self.time_limit != None else float("inf")
+        route = []
+        exchange = False
+        while True:
+            candidates, needed = self.set_candidates(route)
+            if objective == "minimize" and not needed and len(route) >= min_total_rides:
+                break
+            if self.insert(route, candidates, budget):
+                continue
+            # Shorten the route to make room (with exchange moves once the other moves no longer make room), and stop once nothing fits even after that
+            route = self.improve(route, exchange, deadline)
+            if self.insert(route, candidates, budget):
+                continue
+            if exchange or time.perf_counter() > deadline:
+                break
+            exchange = True
+        if objective == "minimize" and len(route) >= min_total_rides:
+            route = self.improve(route, True, deadline)
+        candidates, needed = self.set_candidates(route)
+        if needed or len(route) < min_total_rides:
+            return None
+        return route
+
+    # ---------------
+    # Exact Methods
+    # ---------------
+
+    # Returns the route of a MILP with one copy of each ride per allowed repeat, linked into a path from the entrance (None if it is infeasible)
+    def solve_exact(self, objective: str) -> typing.Optional[list]:
+        budget = self.set_budget(objective)
+        min_total_rides = self.user_preferences.min_total_rides or 0
+        repeats = self.max_ride_repeats if objective == "maximize" else min(self.max_ride_repeats, max(1, min_total_rides))
+        copies = [(ride, k) for ride in range(len(self.all_rides)) if ride not in self.avoid_rides for k in range(repeats)]
+        count = len(copies)
+        steps = range(self.time_steps)
+        # Every arc takes at least delta, which rules out cycles of rides with no wait and no walk
+        delta = 1e-3
+        big_m = (float(self.waits.max()) + float(self.travel.max()) + 2 * delta) * (count + 1) + float(self.start.max())
+        if budget < float("inf"):
+            big_m = min(big_m, budget + float(self.waits.max()) + float(self.travel.max()) + 1)
+
+        sense = pulp.LpMaximize if objective == "maximize" else pulp.LpMinimize
+        prob = pulp.LpProblem("Itinerary", sense)
+        visit = pulp.LpVariable.dicts("visit", range(count), cat=pulp.LpBinary)
+        first = pulp.LpVariable.dicts("first", range(count), cat=pulp.LpBinary)
+        last = pulp.LpVariable.dicts("last", range(count), cat=pulp.LpBinary)
+        arcs = pulp.LpVariable.dicts("arc", [(a, b) for a in range(count) for b in range(count) if a != b], cat=pulp.LpBinary)
+        arrival = pulp.LpVariable.dicts("arrival", range(count), lowBound=0)
+        step = pulp.LpVariable.dicts("step", [(c, s) for c in range(count) for s in steps], cat=pulp.LpBinary)
+        wait = {c: pulp.lpSum(self.wait_list[copies[c][0]][s] * step[c, s] for s in steps) for c in range(count)}
+
+        if objective == "maximize":
+            prob += pulp.lpSum(visit.values())
+        else:
+            prob += pulp.lpSum(wait.values()) + pulp.lpSum(self.travel_list[copies[a][0]][copies[b][0]] * arc for (a, b), arc in arcs.items()) + pulp.lpSum(self.start_list[copies[c][0]] * first[c] for c in range(count))
+            prob += pulp.lpSum(visit.values()) >= min_total_rides
+
+        # Constraint: the visited copies form one path from the entrance
+        prob += pulp.lpSum(first.values()) <= 1
+        for c in range(count):
+            prob += first[c] + pulp.lpSum(arcs[a, c] for a in range(count) if a != c) == visit[c]
+            prob += last[c] + pulp.lpSum(arcs[c, b] for b in range(count) if b != c) == visit[c]
+            # Constraint: a visited copy gets in line in exactly one time step, and its arrival time lies in that time step (the last time step has no end)
+            prob += pulp.lpSum(step[c, s] for s in steps) == visit[c]
+            if self.frequency != None:
+                prob += arrival[c] >= pulp.lpSum(s * self.frequency * step[c, s] for s in steps)
+                prob += arrival[c] <= pulp.lpSum(((s + 1) * self.frequency - delta) * step[c, s] for s in steps if s < self.time_steps - 1) + big_m * (step[c, self.time_steps - 1] + 1 - visit[c])
+            prob += arrival[c] >= self.start_list[copies[c][0]] * first[c]
+            prob += arrival[c] <= self.start_list[copies[c][0]] + big_m * (1 - first[c])
+            if budget < float("inf"):
+                prob += arrival[c] + wait[c] <= budget + delta * count
+        # Constraint: the next copy is reached right after the wait of a copy and the walk between them (there is no idle time, as in the heuristic engine)
+        for (a, b), arc in arcs.items():
+            prob += arrival[b] >= arrival[a] + wait[a] + self.travel_list[copies[a][0]][copies[b][0]] + delta - big_m * (1 - arc)
+            prob += arrival[b] <= arrival[a] + wait[a] + self.travel_list[copies[a][0]][copies[b][0]] + delta + big_m * (1 - arc)
+        # Constraint: the copies of a ride are used in order, which removes symmetric solutions
+        for c in range(count - 1):
+            if copies[c][0] == copies[c+1][0]:
+                prob += visit[c] >= visit[c+1]
+                prob += arrival[c+1] >= arrival[c] - big_m * (1 - visit[c+1])
+        # Constraint: the waits and walks of the path fit in the budget, which is implied by the time constraints but gives a much tighter relaxation
+        if budget < float("inf"):
+            prob += pulp.lpSum(wait.values()) + pulp.lpSum(self.travel_list[copies[a][0]][copies[b][0]] * arc for (a, b), arc in arcs.items()) + pulp.lpSum(self.start_list[copies[c][0]] * first[c] for c in range(count)) <= budget
+
+        # Constraint: required rides, avoid rides (no copies) and min distinct rides
+        first_copies = {ride: c for c, (ride, k) in reversed(list(enumerate(copies)))}
+        for ride in self.required_rides:
+            if ride not in first_copies:
+                return None
+            prob += visit[first_copies[ride]] >= 1
+        if self.min_distinct_rides > 0:
+            prob += pulp.lpSum(visit[c] for c in first_copies.values()) >= self.min_distinct_rides
+
+        self.last_report = sv.solve(prob, self.solver_config)
+        if pulp.LpStatus[prob.status] != "Optimal":
+            return None
+        # Follow the path from the entrance
+        successors = {a: b for (a, b), arc in arcs.items() if pulp.value(arc) > 0.5}
+        current = next((c for c in range(count) if pulp.value(first[c]) > 0.5), None)
+        route = []
+        while current != None:
+            route.append(copies[current][0])
+            current = successors.get(current)
+        return route
+
+    # --------------------
+    # Optimization Methods
+    # --------------------
+
+    # Returns the route of a method ("heuristic", "exact", or "auto", which is exact when the MILP has at most exact_limit ride copies)
+    def solve(self, objective: str, method: str, exact_limit: int) -> typing.Optional[list]:
+        if method not in ("auto", "heuristic", "exact"):
+            raise ValueError(f"Unknown method: {method}")
+        if method == "auto":
+            repeats = self.max_ride_repeats if objective == "maximize" else min(self.max_ride_repeats, max(1, self.user_preferences.min_total_rides or 0))
+            method = "exact" if (len(self.all_rides) - len(self.avoid_rides)) * repeats <= exact_limit else "heuristic"
+        if method == "exact":
+            return self.solve_exact(objective)
+        return self.solve_heuristic(objective)
+
+    # Returns the Itinerary with the most rides that fits in the time available (walking included), or None if the preferences cannot be met
+    def maximize_rides(self, method: str = "auto", exact_limit: int = 8) -> typing.Optional[Itinerary]:
+        if self.user_preferences.require_and_avoid_rides():
+            return None
+        route = self.solve("maximize", method, exact_limit)
+        return self.set_itinerary(route) if route != None else None
+
+    # Returns the Itinerary that goes on at least the min total rides in the least total time (walking included), or None if the preferences cannot be met
+    def minimize_time(self, method: str = "auto", exact_limit: int = 8) -> typing.Optional[Itinerary]:
+        if self.user_preferences.min_total_rides == None or self.user_preferences.require_and_avoid_rides():
+            return None
+        route = self.solve("minimize", method, exact_limit)
+        return self.set_itinerary(route) if route != None else None
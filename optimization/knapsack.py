@@ -0,0 +1,238 @@
+from __future__ import annotations
+from optimization import lazy_imports as li
+np = li.lazy_import("numpy")
+
+'''
+This file considers the maximization problem with constant wait times as a bounded integer knapsack, and solves it with dynamic programming instead of an external MILP solver.
+- Each ride is an item whose weight is its wait time, and the capacity is the user's max time constraint
+- The number of times a ride can be chosen is bounded by the max ride repeats constraint (or by how many copies fit in the capacity)
+- Required and avoided rides are handled by tightening the lower/upper bounds of each ride before the DP is built
+- The min distinct rides constraint is tracked as an extra DP dimension counting how many distinct rides were chosen (capped at the constraint value)
+- A single table holds the best number of rides for every capacity up to the max time, so a whole range of max times (or min total rides) is swept at once
+'''
+
+# Upper limit on the number of cells stored for reconstructing a solution (rides * distinct states * capacity)
+DP_MAX_CELLS = 4_000_000
+
+# Upper limit on the number of cells touched while filling the table (ride repeats * distinct states * capacity)
+DP_MAX_WORK = 100_000_000
+
+
+class BoundedKnapsack():
+    def __init__(self, ride_weights: dict, capacity: int, max_ride_repeats=None, required_rides=None, avoid_rides=None, min_distinct_rides=None) -> None:
+        self.rides = list(ride_weights.keys())
+        self.weights = [ride_weights[ride] for ride in self.rides]
+        self.capacity = capacity
+        self.max_ride_repeats = max_ride_repeats
+        self.required_rides = set(required_rides) if required_rides != None else set()
+        self.avoid_rides = set(avoid_rides) if avoid_rides != None else set()
+        self.min_distinct_rides = int(min_distinct_rides) if min_distinct_rides != None else 0
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns a bool as to whether the weights and capacity are non-negative integers, which the DP requires
+    def set_integral_value(self) -> bool:
+        values = self.weights + [self.capacity]
+        for value in values:
+            if value == None or value < 0 or float(value) != int(value):
+                return False
+        return True
+
+    # Returns a list of (lower bound, upper bound) pairs on the number of times each ride can be chosen
+    #   - An upper bound of None means the ride can be chosen an unlimited number of times at no cost (i.e., the problem is unbounded)
+    def set_ride_bounds(self) -> list:
+        bounds = []
+        for ride, weight in zip(self.rides, self.weights):
+            weight = int(weight)
+            lower = 1 if ride in self.required_rides else 0
+            if ride in self.avoid_rides:
+                upper = 0
+            elif self.max_ride_repeats != None:
+                upper = int(self.max_ride_repeats)
+                if weight > 0:
+                    upper = min(upper, int(self.capacity) // weight)
+            elif weight > 0:
+                upper = int(self.capacity) // weight
+            else:
+                upper = None
+            bounds.append((lower, upper))
+        return bounds
+
+    # Returns the number of cells stored by the DP table, along with the number of cells touched while filling it
+    def set_table_size(self) -> tuple:
+        states = (self.min_distinct_rides + 1) * (int(self.capacity) + 1)
+        work = 0
+        for lower, upper in self.set_ride_bounds():
+            if upper != None:
+                work += (upper - lower + 1) * states
+        return (len(self.rides) * states, work)
+
+    # Returns a bool as to whether the DP table fits within the size limits
+    def set_fits_value(self) -> bool:
+        cells, work = self.set_table_size()
+        return cells <= DP_MAX_CELLS and work <= DP_MAX_WORK
+
+    # ---------------
+    # Solving Methods
+    # ---------------
+
+    # Fills the DP table up to the capacity, returning a (table, choices) tuple, or None if no feasible solution exists or the solution is unbounded
+    #   - table[s, c] is the max number of rides using exactly c units of time while riding min(s, distinct) distinct rides (-1 if unreachable)
+    #   - choices[i, s, c] encodes (times ride i was chosen) * (distinct + 1) + (distinct state before ride i) for reconstruction
+    def fill(self):
+        bounds = self.set_ride_bounds()
+        distinct = self.min_distinct_rides
+        capacity = int(self.capacity)
+
+        for lower, upper in bounds:
+            if upper == None:
+                return None
+            if lower > upper:
+                return None
+        if distinct > sum(1 for lower, upper in bounds if upper >= 1):
+            return None
+
+        table = np.full((distinct + 1, capacity + 1), -1, dtype=np.int64)
+        table[0, 0] = 0
+        choices = np.zeros((len(self.rides), distinct + 1, capacity + 1), dtype=np.int32)
+
+        for i, (weight, (lower, upper)) in enumerate(zip(self.weights, bounds)):
+            weight = int(weight)
+            new_table = np.full_like(table, -1)
+            for k in range(lower, upper + 1):
+                shift = k * weight
+                if shift > capacity:
+                    break
+                source = table[:, :capacity + 1 - shift]
+                previous = np.broadcast_to(np.arange(distinct + 1)[:, None], source.shape)
+                if k >= 1 and distinct > 0:
+                    # Going on ride i moves each state up one distinct ride, and the last state absorbs the overflow
+                    overflow = source[distinct] >= source[distinct - 1]
+                    source = np.vstack((source[:1] * 0 - 1, source[:distinct - 1], np.where(overflow, source[distinct], source[distinct - 1])[None, :]))
+                    previous = np.vstack((previous[:1], previous[:distinct - 1], np.where(overflow, distinct, distinct - 1)[None, :]))
+                candidate = np.where(source >= 0, source + k, -1)
+                target = new_table[:, shift:]
+                better = candidate > target
+                target[better] = candidate[better]
+                choices[i, :, shift:][better] = (k * (distinct + 1) + previous)[better]
+            table = new_table
+        return (table, choices)
+
+    # Returns the solution that uses exactly time_used units of time with the min distinct rides satisfied, as a dict where the keys are ride names and the values are the number of times to go on each ride
+    def reconstruct(self, choices: np.ndarray, time_used: int) -> dict:
+        distinct = self.min_distinct_rides
+        solution = {}
+        state = distinct
+        for i in range(len(self.rides) - 1, -1, -1):
+            code = int(choices[i, state, time_used])
+            k, state = divmod(code, distinct + 1)
+            solution[self.rides[i]] = float(k)
+            time_used -= k * int(self.weights[i])
+        return {ride: solution[ride] for ride in self.rides}
+
+    # Returns the final row of a DP table, with the best number of rides using at most c units of time at each c, and the least time reaching it
+    def set_best_rides(self, table: np.ndarray) -> tuple:
+        final_row = table[self.min_distinct_rides]
+        best = np.maximum.accumulate(final_row)
+        # A capacity improves on the smaller ones only if its own row value is a new max, so the least time of each best value is the latest improvement
+        improved = final_row > np.concatenate(([-1], best[:-1]))
+        least_time = np.maximum.accumulate(np.where(improved, np.arange(len(final_row)), 0))
+        return (best, least_time)
+
+    # Maximizes the total number of rides to go on, returning a dict where the keys are ride names and the values are the number of times to go on each ride
+    #   - Among solutions with the same number of rides, the one using the least amount of time is returned
+    #   - Returns None if no feasible solution exists, or if the solution is unbounded
+    def solve(self):
+        filled = self.fill()
+        if filled == None:
+            return None
+        table, choices = filled
+
+        # Choose the max number of rides, breaking ties by the least amount of time used
+        final_row = table[self.min_distinct_rides]
+        if final_row.max() < 0:
+            return None
+        time_used = int(np.argmax(final_row == final_row.max()))
+        return self.reconstruct(choices, time_used)
+
+    # Returns the max number of rides for every capacity (up to the capacity of the knapsack) from a single DP table, as a list of (number of rides, solution) tuples
+    #   - The number of rides and solution are None for a capacity with no feasible solution, and the solution is None if plans is False
+    def sweep_capacities(self, capacities: list, plans: bool = False) -> list:
+        filled = self.fill()
+        if filled == None:
+            return [(None, None) for _ in capacities]
+        table, choices = filled
+        best, least_time = self.set_best_rides(table)
+        results = []
+        for capacity in capacities:
+            capacity = int(capacity)
+            if capacity < 0 or best[min(capacity, len(best) - 1)] < 0:
+                results.append((None, None))
+                continue
+            capacity = min(capacity, len(best) - 1)
+            results.append((float(best[capacity]), self.reconstruct(choices, int(least_time[capacity])) if plans else None))
+        return results
+
+    # Returns the least time to go on at least each number of total rides from a single DP table (the capacity of the knapsack must be enough for the largest one), as a list of (time, solution) tuples
+    #   - The time and solution are None for a number of total rides with no feasible solution within the capacity, and the solution is None if plans is False
+    def sweep_total_rides(self, totals: list, plans: bool = False) -> list:
+        filled = self.fill()
+        if filled == None:
+            return [(None, None) for _ in totals]
+        table, choices = filled
+        best, least_time = self.set_best_rides(table)
+        results = []
+        for total in totals:
+            # best is non-decreasing, so the least time of at least total rides is where it first reaches total
+            time_used = int(np.searchsorted(best, max(int(total), 0), side="left"))
+            if time_used >= len(best):
+                results.append((None, None))
+                continue
+            results.append((float(time_used), self.reconstruct(choices, time_used) if plans else None))
+        return results
+
+
+# Maximizes the total profit of a bounded knapsack, returning an array of the number of times each item is chosen
+#   - Items with a non-positive profit are never chosen, and items with zero weight are always chosen up to their upper bound
+#   - Each item is split into pieces of 1, 2, 4, ... copies, so the table is filled with one vectorized pass per piece instead of one per copy
+def solve_profit_knapsack(profits, weights, upper_bounds, capacity: int) -> np.ndarray:
+    profits = np.asarray(profits, dtype=float)
+    weights = np.asarray(weights, dtype=np.int64)
+    upper_bounds = np.asarray(upper_bounds, dtype=np.int64)
+    capacity = int(capacity)
+    counts = np.zeros(len(profits), dtype=np.int64)
+
+    pieces = []
+    for i in range(len(profits)):
+        if profits[i] <= 0 or upper_bounds[i] <= 0:
+            continue
+        if weights[i] == 0:
+            counts[i] = upper_bounds[i]
+            continue
+        remaining = min(int(upper_bounds[i]), capacity // int(weights[i]))
+        size = 1
+        while remaining > 0:
+            take = min(size, remaining)
+            pieces.append((i, take))
+            remaining -= take
+            size *= 2
+
+    # table[c] is the max profit using at most c units of capacity
+    table = np.zeros(capacity + 1)
+    taken = np.zeros((len(pieces), capacity + 1), dtype=bool)
+    for p, (i, take) in enumerate(pieces):
+        weight = take * int(weights[i])
+        candidate = table[:capacity + 1 - weight] + take * profits[i]
+        better = candidate > table[weight:]
+        taken[p, weight:] = better
+        table[weight:] = np.where(better, candidate, table[weight:])
+
+    remaining_capacity = capacity
+    for p in range(len(pieces) - 1, -1, -1):
+        if taken[p, remaining_capacity]:
+            i, take = pieces[p]
+            counts[i] += take
+            remaining_capacity -= take * int(weights[i])
+    return counts
@@ -0,0 +1,30 @@
+import importlib
+import sys
+import types
+
+'''
+This file considers deferring the imports of the heavy dependencies (pulp, numpy, pandas, pyarrow, requests, matplotlib) until they are first used, so that the optimization package, the Streamlit app and the worker processes start quickly.
+- lazy_import returns a module object that imports the real module on its first attribute access, and then takes on all of its attributes, so later accesses cost the same as with a regular import
+- The lazy module is not put in sys.modules, so a regular import elsewhere still gets the real module, and importlib's own locks make the first access safe from several threads
+- An annotation such as np.ndarray or pulp.LpProblem would import the module when its function is defined, so every module using lazy_import starts with `from __future__ import annotations`
+'''
+
+
+class LazyModule(types.ModuleType):
+    # Imports the real module on the first access of an attribute that is not set yet
+    def __getattr__(self, attribute: str):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r}>"
+
+
+# Returns the module if it has already been imported, or else a LazyModule that imports it on first use
+#   - name is the full name of the module (e.g., "pyarrow.compute")
+def lazy_import(name: str) -> types.ModuleType:
+    module = sys.modules.get(name)
+    if module != None:
+        return module
+    return LazyModule(name)
@@ -0,0 +1,197 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+import typing
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+requests = li.lazy_import("requests")
+adapters = li.lazy_import("requests.adapters")
+retry = li.lazy_import("urllib3.util.retry")
+
+'''
+This file considers fetching the live park data (see https://www.themeparks.wiki/) outside of the Streamlit app, so that the optimizers have a data path that does not depend on Streamlit's cache.
+- One pooled HTTP session is shared by every request, with a timeout and retries with backoff on connection errors and 429/5xx responses
+- All the configured parks are fetched concurrently
+- Each park is cached for a TTL, and is refreshed in the background once it is close to expiring, while the cached data keeps being served (stale-while-revalidate)
+- Refreshes are conditional requests (If-None-Match/If-Modified-Since), so unchanged data costs a 304 response with no body
+- Every fetched snapshot can be recorded to a WaitTimeStore, which builds the wait time history of each park
+'''
+
+logger = logging.getLogger("optimization.park_service")
+
+PARKS = {
+    "Disneyland Resort Magic Kingdom": "https://api.themeparks.wiki/preview/parks/DisneylandResortMagicKingdom/waittime",
+    "Disneyland Resort California Adventure": "https://api.themeparks.wiki/preview/parks/DisneylandResortCaliforniaAdventure/waittime",
+    "Universal Studios": "https://api.themeparks.wiki/preview/parks/UniversalStudios/waittime",
+}
+
+
+class CacheEntry():
+    def __init__(self, data, fetched_at: float, etag: typing.Optional[str] = None, last_modified: typing.Optional[str] = None) -> None:
+        self.data = data
+        self.fetched_at = fetched_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class ParkDataService():
+    def __init__(self, parks: typing.Optional[dict] = None, ttl: float = 3600, refresh_ahead: float = 300, max_stale: float = 3600, timeout: float = 10, retries: int = 3, backoff_factor: float = 0.5, session: typing.Optional[requests.Session] = None, store=None) -> None:
+        self.parks = dict(parks if parks != None else PARKS)
+        self.ttl = ttl
+        # Seconds before the TTL runs out at which a background refresh starts
+        self.refresh_ahead = refresh_ahead
+        # Seconds after the TTL runs out during which the stale data is still served while it is refreshed
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.session = session if session != None else self.set_session(retries, backoff_factor)
+        self.entries = {}
+        # A WaitTimeStore that records every fetched snapshot, if given
+        self.store = store
+        # Names of the parks being refreshed in the background, so that each park has at most one refresh in flight
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.parks)), thread_name_prefix="park-data")
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns a session whose connections are pooled and reused between requests, with retries on transient errors
+    def set_session(self, retries: int, backoff_factor: float) -> requests.Session:
+        session = requests.Session()
+        policy = retry.Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+        adapter = adapters.HTTPAdapter(pool_connections=max(1, len(self.parks)), pool_maxsize=max(1, len(self.parks)), max_retries=policy)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    # Returns the age of the cached data of a park in seconds (infinity if the park was never fetched)
+    def set_age(self, name: str) -> float:
+        entry = self.entries.get(name)
+        if entry == None:
+            return float("inf")
+        return time.monotonic() - entry.fetched_at
+
+    # -------------
+    # Fetch Methods
+    # -------------
+
+    # Fetches the data of a park, sending the validators of the cached data so that unchanged data is not downloaded again
+    def fetch(self, name: str):
+        with self.lock:
+            entry = self.entries.get(name)
+        headers = {}
+        if entry != None and entry.etag != None:
+            headers["If-None-Match"] = entry.etag
+        if entry != None and entry.last_modified != None:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = self.session.get(self.parks[name], headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry != None:
+            entry = CacheEntry(entry.data, time.monotonic(), response.headers.get("ETag", entry.etag), response.headers.get("Last-Modified", entry.last_modified))
+        else:
+            response.raise_for_status()
+            entry = CacheEntry(response.json(), time.monotonic(), response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        with self.lock:
+            self.entries[name] = entry
+        # An unchanged (304) response is still an observation of the wait times at this time
+        if self.store != None:
+            self.store.record(name, entry.data)
+        return entry.data
+
+    # Fetches every park concurrently, returning a dict where the keys are park names, and the values are their data (the cached data is kept for the parks that fail)
+    #   - Any error of a park (e.g., of the network, or of recording its snapshot) is logged, so that it does not stop the other parks or the refresh thread
+    def fetch_all(self) -> dict:
+        futures = {name: self.executor.submit(self.fetch, name) for name in self.parks}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception:
+                logger.warning("Could not fetch %s", name, exc_info=True)
+                with self.lock:
+                    if name in self.entries:
+                        results[name] = self.entries[name].data
+        # Write the snapshots of the batch to disk right away, since a few hundred rows an hour would stay buffered for days
+        if self.store != None:
+            try:
+                self.store.flush()
+            except Exception:
+                logger.warning("Could not write the snapshots to the wait time store", exc_info=True)
+        return results
+
+    # Refreshes a park in the background, unless it is already being refreshed
+    def refresh(self, name: str):
+        with self.lock:
+            if name in self.refreshing:
+                return
+            self.refreshing.add(name)
+
+        def run():
+            try:
+                self.fetch(name)
+            except Exception:
+                # The stale data keeps being served, and the next get tries again
+                logger.warning("Could not refresh %s", name, exc_info=True)
+            finally:
+                with self.lock:
+                    self.refreshing.discard(name)
+
+        self.executor.submit(run)
+
+    # Returns the data of a park, only waiting on the network if there is no cached data or it is too stale to serve
+    def get(self, name: str):
+        if name not in self.parks:
+            raise KeyError(f"Unknown park: {name}")
+        age = self.set_age(name)
+        if age < self.ttl - self.refresh_ahead:
+            return self.entries[name].data
+        if age < self.ttl + self.max_stale:
+            self.refresh(name)
+            return self.entries[name].data
+        try:
+            return self.fetch(name)
+        except requests.RequestException:
+            # Serve the stale data rather than nothing if the park cannot be reached
+            if name in self.entries:
+                return self.entries[name].data
+            raise
+
+    # ----------------
+    # Lifecycle Methods
+    # ----------------
+
+    # Starts a daemon thread that refreshes every park before its TTL runs out, so that no request waits on the network
+    def start(self):
+        if self.thread != None:
+            return
+        self.fetch_all()
+
+        def run():
+            interval = max(1.0, self.ttl - self.refresh_ahead)
+            while not self.stop_event.wait(interval):
+                # An error must not end the thread, or else the data would go stale for good
+                try:
+                    self.fetch_all()
+                except Exception:
+                    logger.exception("Could not refresh the parks")
+
+        self.thread = threading.Thread(target=run, name="park-data-refresh", daemon=True)
+        self.thread.start()
+
+    # Stops the refresh thread, and closes the session and its pooled connections
+    def close(self):
+        self.stop_event.set()
+        if self.thread != None:
+            self.thread.join(timeout=self.timeout)
+            self.thread = None
+        self.executor.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import user_preferences as up
+from optimization import weight_matrix as wm
+from optimization import solvers as sv
+pulp = li.lazy_import("pulp")
+
+'''
+This file considers a persistent version of the optimization problems, where the PuLP model is built once per (ride set, time steps) and reused between solves.
+- Every user preference is tied to either a variable bound or the right hand side of a single constraint, so changing a preference only updates that bound or constraint
+- Wait times only change the coefficients of the time constraints (maximization) or the objective function (minimization)
+- The previous optimal solution is passed to the solver as a warm start
+- Rides that were already taken can be locked in (see lock), so that a rolling horizon planner only re-plans the time steps that are left
+'''
+
+class PersistentModel():
+    def __init__(self, all_rides: list, objective: str, time_steps: typing.Optional[int] = None, solver_config: typing.Optional[sv.SolverConfig] = None) -> None:
+        if objective not in ("maximize", "minimize"):
+            raise ValueError(f"Unknown objective: {objective}")
+        self.all_rides = list(all_rides)
+        self.objective = objective
+        self.time_steps = time_steps
+        # Preference values and ride weights that are currently applied to the model
+        self.applied = {}
+        self.warm_start = False
+        # Rides already taken, as {ride: count}, the time they took, the time left in each time step (a time step with no time left is closed), and the (ride, time step) keys that cannot be planned
+        self.taken = {}
+        self.time_spent = 0
+        self.capacities = {}
+        self.unavailable = set()
+        # The solver backend, threads, time limit and gap of every solve, and the SolveReport of the most recent one
+        self.solver_config = solver_config
+        self.last_report = None
+        self.build()
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the keys of the ride variables: ride names for constant times, and (ride, time step) tuples for dynamic times
+    def set_variable_keys(self) -> list:
+        if self.time_steps == None:
+            return list(self.all_rides)
+        return [(ride, time_step) for ride in self.all_rides for time_step in range(1, self.time_steps+1)]
+
+    # Returns a dict where the keys are the ride variable keys, and the values are their weights
+    def set_coefficients(self, ride_weights: dict) -> dict:
+        if self.time_steps == None:
+            return {ride: ride_weights[ride] for ride in self.all_rides}
+        weights = wm.WeightMatrix.from_dict(ride_weights)
+        return dict(zip(self.set_variable_keys(), weights.matrix[[weights.index[ride] for ride in self.all_rides]].ravel().tolist()))
+
+    # -------------
+    # Model Methods
+    # -------------
+
+    # Builds the variables and every constraint once, with each preference initially relaxed
+    def build(self):
+        if self.objective == "maximize":
+            self.prob = pulp.LpProblem("Maximize the number of total rides to go on", pulp.LpMaximize)
+        else:
+            self.prob = pulp.LpProblem("Minimize the total amount of time waiting and riding rides", pulp.LpMinimize)
+
+        keys = self.set_variable_keys()
+        if self.time_steps == None:
+            self.rides = pulp.LpVariable.dicts("ride", keys, lowBound=0, cat=pulp.LpInteger)
+            # With constant times, the total number of times a ride is rode is the ride variable itself
+            self.ride_totals = self.rides
+        else:
+            self.rides = pulp.LpVariable.dicts("ride_time_step", keys, lowBound=0, cat=pulp.LpInteger)
+            # Variable: ride_total_i is the number of times ride i is rode over all time steps, so that the required/avoid/max ride repeats preferences become bounds on ride_total_i
+            self.ride_totals = pulp.LpVariable.dicts("ride_total", self.all_rides, lowBound=0, cat=pulp.LpInteger)
+            for index, ride in enumerate(self.all_rides):
+                self.prob += self.ride_totals[ride] == pulp.lpSum(self.rides[ride, time_step] for time_step in range(1, self.time_steps+1)), f"ride_total_{index}"
+        self.rides_rode = pulp.LpVariable.dicts("ride_rode", self.all_rides, cat=pulp.LpBinary)
+
+        if self.objective == "maximize":
+            self.prob += pulp.lpSum(self.rides[key] for key in keys)
+            # Constraint: the time constraints start with zero coefficients, which are set once the ride weights are known
+            self.max_time_constraint = pulp.LpConstraint(pulp.LpAffineExpression([(self.rides[key], 0) for key in keys]), pulp.LpConstraintLE, "max_time", 0)
+            self.prob += self.max_time_constraint
+            self.frequency_constraints = {}
+            if self.time_steps != None:
+                for time_step in range(1, self.time_steps+1):
+                    constraint = pulp.LpConstraint(pulp.LpAffineExpression([(self.rides[ride, time_step], 0) for ride in self.all_rides]), pulp.LpConstraintLE, f"frequency_{time_step}", 0)
+                    self.frequency_constraints[time_step] = constraint
+                    self.prob += constraint
+        else:
+            self.prob += pulp.LpAffineExpression([(self.rides[key], 0) for key in keys])
+            self.min_total_rides_constraint = pulp.LpConstraint(pulp.lpSum(self.rides[key] for key in keys), pulp.LpConstraintGE, "min_total_rides", 0)
+            self.prob += self.min_total_rides_constraint
+
+        # Constraint: min distinct rides, where ride_total_i >= ride_rode_i links each binary to its ride, and a single aggregate constraint counts the distinct rides
+        for index, ride in enumerate(self.all_rides):
+            self.prob += self.ride_totals[ride] >= self.rides_rode[ride], f"ride_rode_{index}"
+        self.min_distinct_rides_constraint = pulp.LpConstraint(pulp.lpSum(self.rides_rode.values()), pulp.LpConstraintGE, "min_distinct_rides", 0)
+        self.prob += self.min_distinct_rides_constraint
+
+    # Locks in the rides that were already taken, which count toward every preference but are not part of the plan
+    #   - taken is a dict where the keys are ride names, and the values are the number of times each ride was taken
+    #   - time_spent is taken off the max time (maximization), and the number of rides taken off the min total rides (minimization)
+    #   - capacities is a dict where the keys are time steps, and the values are the time left in each time step (the frequency if missing)
+    #   - unavailable is a set of (ride, time step) keys that cannot be planned (e.g., rides that are currently closed)
+    def lock(self, taken: dict, time_spent: float = 0, capacities: typing.Optional[dict] = None, unavailable: typing.Optional[set] = None):
+        if self.time_steps == None:
+            raise ValueError("Only a model with time steps can lock in taken rides")
+        self.taken = dict(taken)
+        self.time_spent = time_spent
+        self.capacities = dict(capacities) if capacities != None else {}
+        self.unavailable = set(unavailable) if unavailable != None else set()
+
+    # Returns a bool as to whether a value differs from the one currently applied to the model, and records the new value
+    def changed(self, name: str, value) -> bool:
+        if name in self.applied and self.applied[name] == value:
+            return False
+        self.applied[name] = value
+        return True
+
+    # Updates only the parts of the model tied to ride weights or user preferences that changed since the last solve
+    def update(self, ride_weights: dict, user_preferences: up.UserPreferences, frequency: typing.Optional[int] = None):
+        coefficients = self.set_coefficients(ride_weights)
+        if self.changed("ride_weights", coefficients):
+            if self.objective == "maximize":
+                for key, weight in coefficients.items():
+                    self.max_time_constraint.expr[self.rides[key]] = weight
+                    if self.time_steps != None:
+                        self.frequency_constraints[key[1]].expr[self.rides[key]] = weight
+            else:
+                for key, weight in coefficients.items():
+                    self.prob.objective[self.rides[key]] = weight
+
+        if self.objective == "maximize":
+            max_time = user_preferences.max_time
+            # With dynamic times, the max time preference is optional, as the time steps already bound the total time
+            if max_time == None and self.time_steps != None:
+                max_time = self.time_steps * frequency
+            if self.changed("max_time", max_time - self.time_spent):
+                self.max_time_constraint.changeRHS(max_time - self.time_spent)
+            if self.time_steps != None:
+                capacities = {time_step: self.capacities.get(time_step, frequency) for time_step in self.frequency_constraints}
+                if self.changed("capacities", capacities):
+                    for time_step, constraint in self.frequency_constraints.items():
+                        constraint.changeRHS(capacities[time_step])
+        else:
+            min_total_rides = max(0, user_preferences.min_total_rides - sum(self.taken.values()))
+            if self.changed("min_total_rides", min_total_rides):
+                self.min_total_rides_constraint.changeRHS(min_total_rides)
+
+        if self.changed("min_distinct_rides", user_preferences.min_distinct_rides):
+            self.min_distinct_rides_constraint.changeRHS(user_preferences.min_distinct_rides if user_preferences.min_distinct_rides != None else 0)
+
+        # Constraint: required rides, avoid rides and max ride repeats are all bounds on ride_total_i
+        required_rides = set(user_preferences.required_rides) if user_preferences.required_rides != None else set()
+        avoid_rides = set(user_preferences.avoid_rides) if user_preferences.avoid_rides != None else set()
+        bounds = (frozenset(required_rides), frozenset(avoid_rides), user_preferences.max_ride_repeats)
+        if self.changed("bounds", bounds):
+            for ride in self.all_rides:
+                self.ride_totals[ride].lowBound = 1 if ride in required_rides else 0
+                self.ride_totals[ride].upBound = 0 if ride in avoid_rides else user_preferences.max_ride_repeats
+
+        # Constraint: ride_total_i = (times ride i was taken) + (times ride i is planned), and closed time steps or unavailable rides are planned zero times
+        if self.time_steps != None and self.changed("locked", (tuple(sorted(self.taken.items(), key=str)), frozenset(self.unavailable), frozenset(step for step, capacity in self.capacities.items() if capacity <= 0))):
+            for index, ride in enumerate(self.all_rides):
+                self.prob.constraints[f"ride_total_{index}"].changeRHS(self.taken.get(ride, 0))
+            for key in self.set_variable_keys():
+                self.rides[key].upBound = 0 if key in self.unavailable or self.capacities.get(key[1], 1) <= 0 else None
+            # Move the warm start onto the new bounds, so that the previous plan of the time steps that are left can still be used
+            #   - Rides taken since the previous plan are taken off the latest time steps it planned them at, so that no ride total goes over its bound
+            if self.warm_start:
+                for ride in self.all_rides:
+                    keys = [(ride, time_step) for time_step in range(1, self.time_steps+1)]
+                    values = [0 if self.rides[key].upBound == 0 else round(self.rides[key].varValue or 0) for key in keys]
+                    excess = self.taken.get(ride, 0) + sum(values) - (self.ride_totals[ride].upBound if self.ride_totals[ride].upBound != None else float("inf"))
+                    for index in reversed(range(len(values))):
+                        removed = min(values[index], max(0, excess))
+                        values[index] -= removed
+                        excess -= removed
+                    for key, value in zip(keys, values):
+                        self.rides[key].setInitialValue(value)
+                    total = self.taken.get(ride, 0) + sum(values)
+                    self.ride_totals[ride].setInitialValue(total, check=False)
+                    self.rides_rode[ride].setInitialValue(min(1, total))
+
+    # Solves the model for the given ride weights and user preferences, warm starting from the previous optimal solution
+    #   - Assumes that the user preferences were already checked for contradictions
+    def solve(self, ride_weights: dict, user_preferences: up.UserPreferences, frequency: typing.Optional[int] = None):
+        self.update(ride_weights, user_preferences, frequency)
+        # A ride whose bounds cross (e.g., required with max ride repeats 0) makes the model infeasible, which the solver would fail on rather than report
+        if any(variable.upBound != None and variable.lowBound > variable.upBound for variable in self.ride_totals.values()):
+            self.last_report = None
+            self.warm_start = False
+            return None
+        self.last_report = sv.solve(self.prob, self.solver_config, self.warm_start)
+
+        self.warm_start = pulp.LpStatus[self.prob.status] == "Optimal"
+        if self.warm_start:
+            return ({key: pulp.value(self.rides[key]) for key in self.set_variable_keys()})
+        else:
+            return None
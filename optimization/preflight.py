@@ -0,0 +1,166 @@
+from __future__ import annotations
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import user_preferences as up
+from optimization import weight_matrix as wm
+np = li.lazy_import("numpy")
+
+'''
+This file considers a preflight analysis of the user preferences, which rejects infeasible requests from cheap bounds before any model is built or solved.
+- Every check works on the rides x time steps weight matrix at once (a single column for constant times), so the analysis takes microseconds
+- Each infeasible request is described by the constraints that conflict, along with the rides involved, so that the app can tell the user what to change
+- The optimizers and the Streamlit app share the same checks
+'''
+
+class Conflict():
+    def __init__(self, constraints: tuple, message: str, rides: typing.Optional[list] = None) -> None:
+        # Names of the user preferences that conflict (e.g., ("required_rides", "max_time"))
+        self.constraints = constraints
+        self.message = message
+        self.rides = rides or []
+
+    def __repr__(self) -> str:
+        return f"Conflict(constraints={self.constraints}, message={self.message!r})"
+
+
+class Preflight():
+    def __init__(self, ride_weights: dict, user_preferences: up.UserPreferences, objective: typing.Optional[str] = None, time_steps: typing.Optional[int] = None, frequency: typing.Optional[int] = None, ride_bounds: typing.Optional[dict] = None) -> None:
+        if objective not in (None, "maximize", "minimize"):
+            raise ValueError(f"Unknown objective: {objective}")
+        # objective=None only runs the checks that apply to both optimization problems
+        self.objective = objective
+        if time_steps == None:
+            self.weights = wm.WeightMatrix(list(ride_weights.keys()), np.array([ride_weights[ride] for ride in ride_weights.keys()], dtype=float).reshape(-1, 1))
+        else:
+            self.weights = wm.WeightMatrix.from_dict(ride_weights)
+        self.frequency = frequency
+        self.user_preferences = user_preferences
+        self.required = np.array([ride in (user_preferences.required_rides or []) for ride in self.weights.rides], dtype=bool)
+        self.avoid = np.array([ride in (user_preferences.avoid_rides or []) for ride in self.weights.rides], dtype=bool)
+        # A max ride repeats of 0 is a real bound (no rides at all), so only None means no limit
+        self.max_ride_repeats = user_preferences.max_ride_repeats
+        self.min_distinct_rides = int(user_preferences.min_distinct_rides) if user_preferences.min_distinct_rides else 0
+        self.ride_bounds = ride_bounds or {}
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the most time the rides can take in total: the max time, and with dynamic times, the length of every time step together
+    def set_capacity(self) -> float:
+        capacity = np.inf if self.user_preferences.max_time == None else float(self.user_preferences.max_time)
+        if self.frequency != None:
+            capacity = min(capacity, float(self.frequency) * self.weights.time_steps)
+        return capacity
+
+    # Returns the least time each ride can take once (infinity if it does not fit in any time step, or in the max time)
+    def set_min_weights(self) -> np.ndarray:
+        values = np.asarray(self.weights.matrix, dtype=float)
+        limit = np.inf if self.user_preferences.max_time == None else float(self.user_preferences.max_time)
+        if self.frequency != None:
+            limit = min(limit, float(self.frequency))
+        return np.where(values <= limit, values, np.inf).min(axis=1)
+
+    # Returns the names of the rides where a mask is True
+    def set_ride_names(self, mask: np.ndarray) -> list:
+        return [self.weights.rides[i] for i in np.flatnonzero(mask)]
+
+    # ---------------
+    # Check Methods
+    # ---------------
+
+    # Returns a list of Conflicts, which is empty if no cheap bound proves the request infeasible
+    def run(self) -> list:
+        conflicts = []
+        conflicts += self.check_required_and_avoid()
+        conflicts += self.check_min_distinct_rides()
+        conflicts += self.check_no_repeats()
+        if self.objective in (None, "minimize"):
+            conflicts += self.check_min_total_rides()
+        if self.objective == "maximize":
+            conflicts += self.check_required_rides_time()
+            conflicts += self.check_min_distinct_rides_time()
+        return conflicts
+
+    # A ride cannot be both required and avoided
+    def check_required_and_avoid(self) -> list:
+        both = self.required & self.avoid
+        if not np.any(both):
+            return []
+        rides = self.set_ride_names(both)
+        return [Conflict(("required_rides", "avoid_rides"), f"Cannot require and avoid the same rides: {rides}", rides)]
+
+    # The min distinct rides cannot be more than the rides that are not avoided
+    def check_min_distinct_rides(self) -> list:
+        available = int(np.count_nonzero(~self.avoid))
+        if self.min_distinct_rides <= available:
+            return []
+        return [Conflict(("min_distinct_rides", "avoid_rides"), f"Cannot go on at least {self.min_distinct_rides} distinct rides while also avoiding {int(np.count_nonzero(self.avoid))} distinct rides, given that there are only {len(self.weights.rides)} unique rides in total. Contradiction: {len(self.weights.rides)} < {self.min_distinct_rides} + {int(np.count_nonzero(self.avoid))}")]
+
+    # With a max ride repeats of 0, no ride can be required, and no distinct rides can be gone on
+    def check_no_repeats(self) -> list:
+        if self.max_ride_repeats != 0:
+            return []
+        conflicts = []
+        if np.any(self.required):
+            rides = self.set_ride_names(self.required)
+            conflicts.append(Conflict(("required_rides", "max_ride_repeats"), f"Cannot go on the required rides {rides} with a max ride repeat of 0", rides))
+        if self.min_distinct_rides > 0:
+            conflicts.append(Conflict(("min_distinct_rides", "max_ride_repeats"), f"Cannot go on at least {self.min_distinct_rides} distinct rides with a max ride repeat of 0"))
+        return conflicts
+
+    # The min total rides cannot be more than every ride that is not avoided, repeated the max ride repeats
+    def check_min_total_rides(self) -> list:
+        min_total_rides = self.user_preferences.min_total_rides
+        if self.max_ride_repeats == None or min_total_rides == None:
+            return []
+        bounds = np.array([self.ride_bounds.get(ride, self.max_ride_repeats) for ride in self.weights.rides], dtype=float)
+        most_rides = int(bounds[~self.avoid].sum())
+        if min_total_rides <= most_rides:
+            return []
+        return [Conflict(("min_total_rides", "max_ride_repeats"), f"Cannot go on at least {min_total_rides} total rides given a max ride repeat of {self.max_ride_repeats} along with only {int(np.count_nonzero(~self.avoid))} rides to choose from. Contradiction: {min_total_rides} > {most_rides}")]
+
+    # Every required ride must fit at least once, and all of them together must fit in the max time (and the time steps)
+    def check_required_rides_time(self) -> list:
+        min_weights = self.set_min_weights()
+        too_long = self.required & ~np.isfinite(min_weights)
+        if np.any(too_long):
+            rides = self.set_ride_names(too_long)
+            constraints = ("required_rides", "max_time") if self.frequency == None else ("required_rides", "max_time", "frequency")
+            return [Conflict(constraints, f"Required rides {rides} take longer than the time available to go on them", rides)]
+        required_time = float(min_weights[self.required].sum())
+        capacity = self.set_capacity()
+        if required_time <= capacity:
+            return []
+        rides = self.set_ride_names(self.required)
+        return [Conflict(("required_rides", "max_time"), f"Going on every required ride once takes at least {required_time:g} units of time, which is more than the {capacity:g} units available", rides)]
+
+    # The required rides plus the cheapest other rides must reach the min distinct rides within the max time (and the time steps)
+    def check_min_distinct_rides_time(self) -> list:
+        if self.min_distinct_rides == 0:
+            return []
+        min_weights = self.set_min_weights()
+        candidates = ~self.avoid & ~self.required & np.isfinite(min_weights)
+        missing = self.min_distinct_rides - int(np.count_nonzero(self.required & np.isfinite(min_weights)))
+        if missing <= 0:
+            return []
+        if missing > int(np.count_nonzero(candidates)):
+            return [Conflict(("min_distinct_rides", "max_time"), f"Only {int(np.count_nonzero(candidates | self.required))} rides fit in the time available, which is less than the {self.min_distinct_rides} distinct rides required")]
+        cheapest = np.partition(min_weights[candidates], missing - 1)[:missing]
+        distinct_time = float(min_weights[self.required].sum() + cheapest.sum())
+        capacity = self.set_capacity()
+        if distinct_time <= capacity:
+            return []
+        return [Conflict(("min_distinct_rides", "required_rides", "max_time"), f"Going on {self.min_distinct_rides} distinct rides takes at least {distinct_time:g} units of time, which is more than the {capacity:g} units available")]
+
+
+# Returns the Conflicts of an optimizer's request, for the given objective ("maximize", "minimize", or None for the checks shared by both)
+def analyze(optimizer, ride_weights: dict, objective: typing.Optional[str] = None) -> list:
+    time_steps = getattr(optimizer, "time_steps", None)
+    frequency = getattr(optimizer, "frequency", None) if objective == "maximize" else None
+    return Preflight(ride_weights, optimizer.user_preferences, objective, time_steps, frequency, getattr(optimizer, "ride_bounds", None)).run()
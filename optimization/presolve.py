@@ -0,0 +1,215 @@
+from __future__ import annotations
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import user_preferences as up
+from optimization import weight_matrix as wm
+from optimization import instrumentation as it
+np = li.lazy_import("numpy")
+
+'''
+This file considers a presolve pass, which decides the trivial rides before any PuLP model is built, so that the model only contains the rides worth optimizing.
+- Avoided rides are fixed at 0
+- Rides that take longer than the max time (or, with dynamic times, than a time step at every time step) are fixed at 0, unless they are required
+- Rides with a weight of zero are fixed at the max ride repeats, since riding them is free and only helps every constraint
+- Without a min distinct rides constraint, rides with the same weights are interchangeable, so they are merged into one ride whose bound is the sum of their bounds
+- Without max ride repeats or min distinct rides constraints, a ride that is never cheaper than another ride is dominated by it, and is fixed at 0
+- The reduced problem is solved by the optimizer as usual, and its solution is mapped back to the full ride list
+'''
+
+class Presolve():
+    def __init__(self, ride_weights: dict, user_preferences: up.UserPreferences, objective: str, time_steps: typing.Optional[int] = None, frequency: typing.Optional[int] = None) -> None:
+        if objective not in ("maximize", "minimize"):
+            raise ValueError(f"Unknown objective: {objective}")
+        self.objective = objective
+        self.time_steps = time_steps
+        self.frequency = frequency
+        if time_steps == None:
+            self.weights = wm.WeightMatrix(list(ride_weights.keys()), np.array([ride_weights[ride] for ride in ride_weights.keys()], dtype=float).reshape(-1, 1))
+        else:
+            self.weights = wm.WeightMatrix.from_dict(ride_weights)
+        self.user_preferences = user_preferences
+        self.required_rides = set(user_preferences.required_rides or [])
+        self.avoid_rides = set(user_preferences.avoid_rides or [])
+        # A max ride repeats of 0 is a real bound (no rides at all), so only None means no limit
+        self.max_ride_repeats = user_preferences.max_ride_repeats
+        self.min_distinct_rides = user_preferences.min_distinct_rides if user_preferences.min_distinct_rides else None
+        # Rides fixed at a value, as {ride: (time step, number of times)}; the time step is None for constant times
+        self.fixed = {}
+        # Rides merged into another ride, as {kept ride: [kept ride, merged rides...]}
+        self.groups = {}
+        # Rides removed from the problem because another ride dominates them
+        self.removed = []
+        # Reasons why each ride was fixed, merged or removed, as {ride: reason}
+        self.reasons = {}
+        self.infeasible = False
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the rides that are left after the presolve
+    def set_rides(self) -> list:
+        merged = {ride for group in self.groups.values() for ride in group[1:]}
+        removed = set(self.removed)
+        return [ride for ride in self.weights.rides if ride not in self.fixed and ride not in merged and ride not in removed]
+
+    # Returns the ride weights of the rides that are left, in the same format as the ride weights given to the presolve
+    def set_ride_weights(self):
+        rides = self.set_rides()
+        if self.time_steps == None:
+            return {ride: self.weights.row(ride)[0].item() for ride in rides}
+        return wm.WeightMatrix(rides, self.weights.matrix[[self.weights.index[ride] for ride in rides]])
+
+    # Returns a dict where the keys are merged rides, and the values are their upper bounds (the sum of the bounds of the rides they stand for)
+    def set_ride_bounds(self) -> dict:
+        return {ride: len(group) * int(self.max_ride_repeats) for ride, group in self.groups.items()}
+
+    # Returns the user preferences of the rides that are left, after accounting for the fixed rides
+    def set_user_preferences(self) -> up.UserPreferences:
+        rides = set(self.set_rides())
+        fixed_rides = sum(1 for _, times in self.fixed.values() if times > 0)
+        fixed_total = sum(times for _, times in self.fixed.values())
+        fixed_time = sum(times * self.weights.row(ride)[0 if time_step == None else time_step-1] for ride, (time_step, times) in self.fixed.items())
+
+        required_rides = [ride for ride in self.weights.rides if ride in self.required_rides and ride in rides]
+        min_distinct_rides = None
+        if self.min_distinct_rides != None and int(self.min_distinct_rides) - fixed_rides > 0:
+            min_distinct_rides = int(self.min_distinct_rides) - fixed_rides
+        max_time = self.user_preferences.max_time
+        if max_time != None:
+            max_time = max_time - fixed_time
+        # The min total rides preference only applies to the minimization problem
+        min_total_rides = self.user_preferences.min_total_rides if self.objective == "minimize" else None
+        if min_total_rides != None:
+            min_total_rides = max(0, min_total_rides - fixed_total)
+        return up.UserPreferences(required_rides=required_rides or None, avoid_rides=None, min_distinct_rides=min_distinct_rides, max_ride_repeats=self.max_ride_repeats, max_time=max_time, min_total_rides=min_total_rides)
+
+    # ---------------
+    # Presolve Methods
+    # ---------------
+
+    # Fixes, merges and removes the trivial rides, and returns the presolve itself
+    #   - Sets infeasible to True if the reductions prove that no feasible solution exists
+    @it.instrumented("presolve")
+    def run(self):
+        values = self.weights.matrix
+        # The most time a single ride can take: the max time, and with dynamic times, the length of a time step
+        capacity = np.inf if self.user_preferences.max_time == None or self.objective == "minimize" else float(self.user_preferences.max_time)
+        if self.frequency != None and self.objective == "maximize":
+            capacity = min(capacity, float(self.frequency))
+
+        for i, ride in enumerate(self.weights.rides):
+            if self.max_ride_repeats == 0:
+                if ride in self.required_rides:
+                    self.infeasible = True
+                self.fix(ride, None, 0, "max ride repeats of 0")
+            elif ride in self.avoid_rides:
+                self.fix(ride, None, 0, "avoided")
+            elif np.all(values[i] > capacity):
+                if ride in self.required_rides:
+                    self.infeasible = True
+                self.fix(ride, None, 0, "longer than the max time")
+            elif self.max_ride_repeats != None and np.any(values[i] == 0):
+                # Ride all the repeats in the first time step with no wait, which costs no time in any constraint
+                self.fix(ride, int(np.argmax(values[i] == 0)) + 1 if self.time_steps != None else None, int(self.max_ride_repeats), "zero weight")
+
+        if self.min_distinct_rides == None:
+            if self.max_ride_repeats != None:
+                self.merge_duplicates()
+            else:
+                self.remove_dominated()
+        it.annotate(rides=len(self.weights.rides), fixed=len(self.fixed), merged=sum(len(group) - 1 for group in self.groups.values()), removed=len(self.removed), infeasible=self.infeasible)
+        return self
+
+    # Fixes a ride at a number of times, in a time step (None for constant times)
+    def fix(self, ride, time_step: typing.Optional[int], times: int, reason: str):
+        self.fixed[ride] = (time_step, times)
+        self.reasons[ride] = reason
+
+    # Merges the rides that are not required and have the same weights into the first of them
+    def merge_duplicates(self):
+        first = {}
+        for ride in self.set_rides():
+            if ride in self.required_rides:
+                continue
+            key = tuple(self.weights.row(ride).tolist())
+            if key in first:
+                self.groups[first[key]].append(ride)
+                self.reasons[ride] = f"merged into {first[key]}"
+            else:
+                first[key] = ride
+                self.groups[ride] = [ride]
+        self.groups = {ride: group for ride, group in self.groups.items() if len(group) > 1}
+
+    # Removes the rides that are not required and are never cheaper than another ride that is left
+    #   - Only valid when rides can be repeated any number of times, since every use of a dominated ride can then be swapped for the ride dominating it
+    def remove_dominated(self):
+        rides = self.set_rides()
+        rows = self.weights.matrix[[self.weights.index[ride] for ride in rides]]
+        for j, ride in enumerate(rides):
+            if ride in self.required_rides:
+                continue
+            # Ride i dominates ride j if it is never more expensive, and ties go to the ride that comes first
+            dominating = np.all(rows <= rows[j], axis=1) & (np.any(rows < rows[j], axis=1) | (np.arange(len(rides)) < j))
+            dominating[j] = False
+            if np.any(dominating):
+                self.removed.append(ride)
+                self.reasons[ride] = f"dominated by {rides[int(np.argmax(dominating))]}"
+
+    # -------------
+    # Restore Methods
+    # -------------
+
+    # Returns the solution of the full ride list from the solution of the reduced problem, or None if the reduced solution is None
+    #   - Constant times solutions are {ride: times}, and dynamic times solutions are {(ride, time step): times}
+    def restore(self, solution: typing.Optional[dict]):
+        if solution == None:
+            return None
+        steps = [None] if self.time_steps == None else list(range(1, self.time_steps+1))
+        full = {(ride, time_step): 0.0 for ride in self.weights.rides for time_step in steps}
+        for ride, (time_step, times) in self.fixed.items():
+            full[ride, time_step if time_step != None else steps[0]] = float(times)
+        for key, value in solution.items():
+            ride, time_step = (key, None) if self.time_steps == None else key
+            group = self.groups.get(ride)
+            if group == None:
+                full[ride, time_step] = float(value)
+                continue
+            # Split the times of a merged ride between the rides it stands for, filling each one up to the max ride repeats
+            remaining = int(round(value))
+            for member in group:
+                if remaining <= 0:
+                    break
+                totals = sum(full[member, step] for step in steps)
+                times = min(remaining, int(self.max_ride_repeats) - int(totals))
+                full[member, time_step] += float(times)
+                remaining -= times
+        if self.time_steps == None:
+            return {ride: full[ride, None] for ride in self.weights.rides}
+        return full
+
+
+# Solves a presolved version of an optimizer's problem, returning the solution of the full ride list
+#   - method is the optimizer method solving the reduced problem ("maximize_rides" or "minimize_time")
+def solve(optimizer, method: str, ride_weights: dict):
+    objective = "maximize" if method == "maximize_rides" else "minimize"
+    time_steps = getattr(optimizer, "time_steps", None)
+    presolve = Presolve(ride_weights, optimizer.user_preferences, objective, time_steps, getattr(optimizer, "frequency", None)).run()
+    if presolve.infeasible:
+        return None
+
+    reduced = optimizer.set_reduced_optimizer(presolve)
+    if len(reduced.all_rides) == 0:
+        # Every ride was decided, so the only thing left is to check the fixed rides against the constraints that are left
+        user_preferences = reduced.user_preferences
+        if user_preferences.min_distinct_rides != None or (user_preferences.min_total_rides or 0) > 0 or (user_preferences.max_time != None and user_preferences.max_time < 0):
+            return None
+        return presolve.restore({})
+    solution = getattr(reduced, method)(presolve.set_ride_weights())
+    optimizer.last_report = reduced.last_report
+    return presolve.restore(solution)
@@ -0,0 +1,432 @@
+from __future__ import annotations
+import copy
+import math
+import typing
+from collections.abc import Mapping
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import solvers as sv
+from optimization import weight_matrix as wm
+from optimization import instrumentation as it
+pulp = li.lazy_import("pulp")
+np = li.lazy_import("numpy")
+
+'''
+This file considers planning for uncertain wait times, where the time constraints must hold with a given confidence rather than for the posted wait times.
+- Wraps an OptimizeConstant or OptimizeDynamic, and keeps its user preferences, solution format and solver configuration
+- The uncertain constraints are the max time and, with dynamic times, the length of each time step (maximization), and the total time (minimization, where the objective is the total time that the plan fits in with the confidence)
+- method="cvar" (the default with scenarios) takes a scenario matrix of ride weights, and requires the mean of the worst 1 - confidence share of the scenarios to fit the uncertain constraints
+    - This sample average CVaR constraint implies the chance constraint over every scenario, and needs no binary per scenario, so its scenarios are never reduced
+    - Its dense scenario rows still make dynamic parks slow to prove optimal (a 60 ride park with 8 time steps and 200 scenarios takes minutes), while a near optimal plan is found within seconds
+- method="saa" (sample average approximation) requires the uncertain constraints to hold together in at least the confidence share of the scenarios
+    - Each scenario has a binary that relaxes its constraints with a big-M, where M is the most the constraint can be exceeded given the bounds of the ride counts
+    - Scenarios that no plan can violate are dropped, and the model is much harder than the cvar one
+- The saa scenarios are reduced to max_scenarios (None keeps them all) by fast forward selection, which keeps the scenarios closest to all others and moves the probability of every dropped scenario to its nearest kept one
+    - The reduced problem only approximates the full one, so a saa plan of the maximization problem is checked against every scenario
+    - If the plan violates the chance constraint, the violation budget of the reduced problem is tightened and it is solved again, and as a last resort the full problem is solved
+    - A minimization plan always fits some total time, so only its objective (the time it fits in) is approximate
+- method="budgeted" (Bertsimas-Sim) takes per-ride wait time intervals, and protects each uncertain constraint against gamma of its weights being at the top of their intervals at once
+    - By default, gamma is the smallest budget whose Bertsimas-Sim bound on the violation probability is at most 1 - confidence
+- Every solve has a time limit of time_limit seconds (TIME_LIMIT by default) unless the solver config of the optimizer sets one, so that the robust models stay interactive
+    - A solve cut short by the time limit returns the best plan found, and its last_report tells that it is not proven optimal (set_proven_value) along with its gap
+- Every constraint is built from the rows of the scenario (or interval) array, with only the nonzero weights of the rides that can be ridden, so 200 scenarios of a 60 ride park take a fraction of a second to build
+'''
+
+
+# The default time limit of each robust solve in seconds, when the solver config of the optimizer sets none
+TIME_LIMIT = 10
+
+# The number of times that a saa plan of the reduced scenarios is solved again with a tighter violation budget, before solving the full problem
+TIGHTENINGS = 2
+
+
+# Returns the indices and probabilities of count scenarios chosen by fast forward selection, where scenarios is a (scenarios x weights) array
+#   - Each step keeps the scenario that most reduces the probability-weighted distance of every other scenario to its nearest kept one
+def reduce_scenarios(scenarios: np.ndarray, probabilities: np.ndarray, count: int) -> tuple:
+    if count >= len(scenarios):
+        return (np.arange(len(scenarios)), probabilities)
+    squares = np.einsum("ij,ij->i", scenarios, scenarios)
+    distances = np.sqrt(np.maximum(squares[:, None] + squares[None, :] - 2 * scenarios @ scenarios.T, 0))
+    remaining = np.ones(len(scenarios), dtype=bool)
+    reduced = distances.copy()
+    selected = []
+    for _ in range(count):
+        costs = (probabilities * remaining) @ reduced
+        costs[~remaining] = np.inf
+        index = int(np.argmin(costs))
+        selected.append(index)
+        remaining[index] = False
+        reduced = np.minimum(reduced, reduced[:, [index]])
+    selected = np.array(selected)
+    nearest = selected[np.argmin(distances[:, selected], axis=1)]
+    return (selected, np.array([probabilities[nearest == index].sum() for index in selected]))
+
+
+class RobustOptimizer():
+    def __init__(self, optimizer, scenarios=None, intervals: typing.Optional[dict] = None, confidence: float = 0.9, method: typing.Optional[str] = None, gamma: typing.Optional[float] = None, max_scenarios: typing.Optional[int] = 50, probabilities=None, time_limit: typing.Optional[float] = TIME_LIMIT) -> None:
+        if scenarios is None and intervals == None:
+            raise ValueError("Either scenarios or intervals are required")
+        method = method if method != None else ("cvar" if scenarios is not None else "budgeted")
+        if method not in ("saa", "cvar", "budgeted"):
+            raise ValueError(f"Unknown method: {method}")
+        if method in ("saa", "cvar") and scenarios is None:
+            raise ValueError(f"The {method} method requires scenarios")
+        if not 0 < confidence <= 1:
+            raise ValueError("The confidence must be in (0, 1]")
+        self.optimizer = optimizer
+        self.user_preferences = optimizer.user_preferences
+        self.method = method
+        self.confidence = confidence
+        self.gamma = gamma
+        # The number of scenarios that the saa scenarios are reduced to (None keeps them all)
+        self.max_scenarios = max_scenarios
+        # The time limit of each solve in seconds, unless the solver config of the optimizer sets one (None solves to optimality)
+        self.time_limit = time_limit
+        # The share of the scenarios that the saa constraints may be violated in, and whether the scenarios are reduced (both only change while a saa plan is checked)
+        self.violation_budget = 1 - confidence
+        self.reduce = True
+        # The posted weights of the optimizer, as a rides x time steps matrix (a single column for constant times)
+        self.weights = wm.WeightMatrix.from_dict(optimizer.set_ride_weights())
+        self.dynamic = getattr(optimizer, "frequency", None) != None
+        # The (scenarios x rides x time steps) array of scenario weights, and the probability of each scenario
+        self.scenarios = None
+        self.probabilities = None
+        if scenarios is not None:
+            self.scenarios = self.set_scenarios(scenarios)
+            self.probabilities = np.full(len(self.scenarios), 1 / len(self.scenarios)) if probabilities is None else np.asarray(probabilities, dtype=float)
+        # The expected weights, and how far each weight can be above them (the budgeted method only)
+        if intervals != None:
+            self.nominal, self.deviations = self.set_intervals(intervals)
+        else:
+            self.nominal = np.tensordot(self.probabilities, self.scenarios, axes=1)
+            self.deviations = np.maximum(self.scenarios.max(axis=0) - self.nominal, 0)
+        # The report of the most recent solve, which tells whether the plan was proven optimal or cut short by the time limit
+        self.last_report = None
+        # The number of scenarios of the most recent saa or cvar model, after dropping and reducing them
+        self.model_scenarios = None
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the scenario weights as a (scenarios x rides x time steps) array, from an array in the order of the optimizer's rides, or from a list of ride weights dicts
+    def set_scenarios(self, scenarios) -> np.ndarray:
+        if len(scenarios) > 0 and isinstance(scenarios[0], Mapping):
+            matrices = [wm.WeightMatrix.from_dict(scenario) for scenario in scenarios]
+            scenarios = [matrix.matrix[[matrix.index[ride] for ride in self.weights.rides]] for matrix in matrices]
+        scenarios = np.asarray(scenarios, dtype=float)
+        if scenarios.ndim == 2:
+            scenarios = scenarios[:, :, None]
+        if scenarios.shape[1:] != self.weights.matrix.shape:
+            raise ValueError(f"Expected scenarios of shape (scenarios, {len(self.weights.rides)}, {self.weights.time_steps}), got {scenarios.shape}")
+        return scenarios
+
+    # Returns the middle and half width of the intervals, as rides x time steps arrays, from {ride: (low, high)} or {ride: [(low, high) at each time step]}
+    def set_intervals(self, intervals: dict) -> tuple:
+        bounds = np.array([intervals[ride] for ride in self.weights.rides], dtype=float).reshape(len(self.weights.rides), self.weights.time_steps, 2)
+        if np.any(bounds[:, :, 0] > bounds[:, :, 1]):
+            raise ValueError("Every interval must have its low end at most its high end")
+        return ((bounds[:, :, 0] + bounds[:, :, 1]) / 2, (bounds[:, :, 1] - bounds[:, :, 0]) / 2)
+
+    # Returns the expected weights in the format of the optimizer's ride weights
+    def set_ride_weights(self):
+        if self.dynamic:
+            return wm.WeightMatrix(self.weights.rides, self.nominal)
+        return {ride: float(weight) for ride, weight in zip(self.weights.rides, self.nominal[:, 0])}
+
+    # Returns the keys of the ride counts, in the (ride, time step) order of the weights: ride names for constant times, and (ride, time step) tuples for dynamic times
+    def set_keys(self) -> list:
+        if self.dynamic:
+            return [(ride, time_step) for ride in self.weights.rides for time_step in range(1, self.weights.time_steps+1)]
+        return list(self.weights.rides)
+
+    # Returns the uncertain constraints as a list of (weights mask, bound) tuples, where the mask picks the weights of the constraint out of the flattened weights
+    #   - bound is None for the total time of the minimization problem, which is bounded by the objective
+    def set_rows(self, objective: str) -> list:
+        cells = self.weights.matrix.size
+        if objective == "minimize":
+            return [(np.ones(cells, dtype=bool), None)]
+        rows = []
+        if self.user_preferences.max_time != None:
+            rows.append((np.ones(cells, dtype=bool), float(self.user_preferences.max_time)))
+        if self.dynamic:
+            steps = np.tile(np.arange(self.weights.time_steps), len(self.weights.rides))
+            rows.extend((steps == time_step, float(self.optimizer.frequency)) for time_step in range(self.weights.time_steps))
+        return rows
+
+    # Returns the upper bound of every ride count (flattened), from the max ride repeats, the avoided rides and the uncertain constraints
+    #   - A ride count that exceeds a bound in every scenario cannot be part of a plan, since at least one scenario must hold
+    def set_upper_bounds(self, objective: str, rows: list) -> np.ndarray:
+        repeats = self.user_preferences.max_ride_repeats
+        upper = np.full(self.weights.matrix.shape, float(repeats) if repeats != None else np.inf)
+        avoid = [self.weights.index[ride] for ride in self.user_preferences.avoid_rides or [] if ride in self.weights.index]
+        upper[avoid] = 0
+        upper = upper.ravel()
+        if objective == "minimize":
+            # No optimal plan goes on a ride more often than the min total rides
+            return np.minimum(upper, max(self.user_preferences.min_total_rides or 0, 1))
+        # The budgeted constraints imply the constraints with the expected weights
+        least = (self.scenarios.min(axis=0) if self.method != "budgeted" else self.nominal).ravel()
+        for mask, bound in rows:
+            fits = np.divide(bound, least, out=np.full(least.shape, np.inf), where=least > 0)
+            upper = np.where(mask, np.minimum(upper, np.floor(fits + 1e-9)), upper)
+        return upper
+
+    # Returns the most each uncertain constraint can exceed its bound in each scenario (a scenarios x constraints array), the big-M of the scenario constraints
+    #   - Each ride takes at most its upper bounds at every time step, and at most its max ride repeats at its longest time step
+    def set_excess(self, upper: np.ndarray, rows: list) -> np.ndarray:
+        shape = self.weights.matrix.shape
+        bounded = np.where(np.isinf(upper), 0, upper).reshape(shape)
+        repeats = self.user_preferences.max_ride_repeats
+        excess = []
+        for mask, bound in rows:
+            weights = self.scenarios * mask.reshape(shape)
+            loads = np.sum(weights * bounded, axis=2)
+            if repeats != None:
+                loads = np.minimum(loads, repeats * weights.max(axis=2))
+            excess.append(loads.sum(axis=1) - (bound if bound != None else 0))
+        return np.stack(excess, axis=1)
+
+    # Returns the Bertsimas-Sim budget of an uncertain constraint with the given number of uncertain weights
+    def set_gamma(self, uncertain: int) -> float:
+        if self.gamma != None:
+            return float(min(self.gamma, uncertain))
+        if self.confidence >= 1:
+            return float(uncertain)
+        return float(min(uncertain, math.sqrt(-2 * math.log(1 - self.confidence) * uncertain)))
+
+    # --------------
+    # Model Methods
+    # --------------
+
+    # Returns the PuLP problem of the robust plan, along with its ride variables ({key: variable})
+    @it.instrumented("build")
+    def build_problem(self, objective: str) -> tuple:
+        sense = pulp.LpMaximize if objective == "maximize" else pulp.LpMinimize
+        prob = pulp.LpProblem(f"Robust {objective} with {self.method}", sense)
+        rows = self.set_rows(objective)
+        upper = self.set_upper_bounds(objective, rows)
+
+        # Variable: ride_i (or ride_(i, j)) is the number of times ride i is rode (during time step j), bounded by upper
+        keys = self.set_keys()
+        rides = pulp.LpVariable.dicts("ride", keys, lowBound=0, cat=pulp.LpInteger)
+        variables = np.array([rides[key] for key in keys], dtype=object)
+        for variable, bound in zip(variables, upper):
+            variable.upBound = None if np.isinf(bound) else int(bound)
+        it.lap("variables")
+
+        # Objective function: the total number of rides, or the uncertain total time (added by the uncertain constraints)
+        if objective == "maximize":
+            prob += pulp.lpSum(variables[upper > 0])
+        if self.method == "saa":
+            self.add_scenario_constraints(prob, variables, upper, rows)
+        elif self.method == "cvar":
+            self.add_cvar_constraints(prob, variables, upper, rows)
+        else:
+            self.add_budgeted_constraints(prob, variables, upper, rows)
+
+        # Constraint: the preferences of the user that do not depend on the wait times
+        matrix = variables.reshape(self.weights.matrix.shape)
+        totals = {ride: pulp.lpSum(row) for ride, row in zip(self.weights.rides, matrix)}
+        if objective == "minimize":
+            prob += pulp.lpSum(variables[upper > 0]) >= self.user_preferences.min_total_rides
+        for ride in self.user_preferences.required_rides or []:
+            prob += totals[ride] >= 1
+        if self.user_preferences.max_ride_repeats != None and self.dynamic:
+            for ride in self.weights.rides:
+                prob += totals[ride] <= self.user_preferences.max_ride_repeats
+        if self.user_preferences.min_distinct_rides:
+            rides_rode = pulp.LpVariable.dicts("ride_rode", self.weights.rides, cat=pulp.LpBinary)
+            for ride in self.weights.rides:
+                prob += totals[ride] >= rides_rode[ride]
+            prob += pulp.lpSum(rides_rode.values()) >= self.user_preferences.min_distinct_rides
+
+        it.lap("constraints")
+        it.annotate_model(prob)
+        return (prob, rides)
+
+    # Adds the chance constraint over the scenarios: the uncertain constraints hold together in at least the confidence share of the scenarios
+    def add_scenario_constraints(self, prob: pulp.LpProblem, variables: np.ndarray, upper: np.ndarray, rows: list):
+        scenarios = self.scenarios.reshape(len(self.scenarios), -1)
+        probabilities = self.probabilities
+        excess = self.set_excess(upper, rows)
+        # A ride count with no upper bound (a ride with no weight in some scenario) can exceed the constraint by any amount, so it is never relaxed
+        unbounded = np.isinf(upper)[None, :] & (scenarios > 0)
+        excess[np.stack([np.any(unbounded[:, mask], axis=1) for mask, _ in rows], axis=1)] = np.inf
+
+        # Drop the scenarios that no plan can violate, and reduce the rest
+        binding = np.any(excess > 0, axis=1)
+        scenarios, probabilities, excess = scenarios[binding], probabilities[binding], excess[binding]
+        if self.reduce and self.max_scenarios != None and len(scenarios) > self.max_scenarios:
+            selected, probabilities = reduce_scenarios(scenarios, probabilities, self.max_scenarios)
+            scenarios, excess = scenarios[selected], excess[selected]
+        self.model_scenarios = len(scenarios)
+
+        # Variable: violated_s is 1 if the uncertain constraints may be violated in scenario s (only if the violation budget allows it)
+        budget = self.violation_budget + 1e-9
+        violated = pulp.LpVariable.dicts("violated", range(len(scenarios)), cat=pulp.LpBinary) if np.any(probabilities <= budget) else {}
+        # Variable: time is the total time that the plan fits in within the confidence (minimization only)
+        time = None
+        if rows[0][1] == None:
+            time = pulp.LpVariable("time", lowBound=0)
+            prob += time
+
+        usable = upper > 0
+        for s in range(len(scenarios)):
+            for r, (mask, bound) in enumerate(rows):
+                if excess[s, r] <= 0:
+                    continue
+                cells = mask & usable & (scenarios[s] != 0)
+                terms = list(zip(variables[cells], scenarios[s, cells].tolist()))
+                # Constraint: the uncertain constraint holds in scenario s, unless violated_s relaxes it by the most it can be exceeded
+                if s in violated and np.isfinite(excess[s, r]):
+                    terms.append((violated[s], -float(excess[s, r])))
+                if time != None:
+                    terms.append((time, -1))
+                prob += pulp.LpAffineExpression(terms) <= (bound if bound != None else 0)
+        if violated:
+            prob += pulp.LpAffineExpression((violated[s], float(probabilities[s])) for s in violated) <= budget
+
+    # Adds the CVaR approximation of the chance constraint over the scenarios: the mean of the worst 1 - confidence share of the largest excess over the uncertain constraints is at most 0
+    #   - Any plan that meets it also meets the chance constraint, which only holds over the scenarios of the model, so every scenario is kept
+    #   - With minimization, the objective is the CVaR of the total time (an upper bound of its confidence quantile)
+    def add_cvar_constraints(self, prob: pulp.LpProblem, variables: np.ndarray, upper: np.ndarray, rows: list):
+        if self.confidence >= 1:
+            self.add_scenario_constraints(prob, variables, upper, rows)
+            return
+        scenarios = self.scenarios.reshape(len(self.scenarios), -1)
+        probabilities = self.probabilities
+        self.model_scenarios = len(scenarios)
+
+        # Variable: threshold is the value at risk of the largest excess (or of the total time), and shortfall_s is how far scenario s is above it
+        threshold = pulp.LpVariable("threshold")
+        shortfall = pulp.LpVariable.dicts("shortfall", range(len(scenarios)), lowBound=0)
+        usable = upper > 0
+        for s in range(len(scenarios)):
+            for mask, bound in rows:
+                cells = mask & usable & (scenarios[s] != 0)
+                terms = list(zip(variables[cells], scenarios[s, cells].tolist())) + [(threshold, -1), (shortfall[s], -1)]
+                prob += pulp.LpAffineExpression(terms) <= (bound if bound != None else 0)
+        cvar = pulp.LpAffineExpression([(threshold, 1)] + [(shortfall[s], float(probabilities[s]) / (1 - self.confidence)) for s in range(len(scenarios))])
+        if rows[0][1] == None:
+            prob += cvar
+        else:
+            prob += cvar <= 0
+
+    # Adds the Bertsimas-Sim counterpart of each uncertain constraint: the constraint holds when any gamma of its weights are at the top of their intervals
+    #   - The protection gamma * p + sum(q) is the dual of the worst choice of gamma weights, where q_i >= deviation_i * ride_i - p
+    def add_budgeted_constraints(self, prob: pulp.LpProblem, variables: np.ndarray, upper: np.ndarray, rows: list):
+        nominal = self.nominal.ravel()
+        deviations = self.deviations.ravel()
+        usable = upper > 0
+        for r, (mask, bound) in enumerate(rows):
+            cells = np.flatnonzero(mask & usable & (nominal != 0))
+            uncertain = cells[deviations[cells] > 0]
+            terms = list(zip(variables[cells], nominal[cells].tolist()))
+            if len(uncertain) > 0:
+                protection = pulp.LpVariable(f"protection_{r}", lowBound=0)
+                excess = pulp.LpVariable.dicts(f"excess_{r}", uncertain.tolist(), lowBound=0)
+                for index in uncertain:
+                    prob += excess[index] + protection >= float(deviations[index]) * variables[index]
+                terms.append((protection, self.set_gamma(len(uncertain))))
+                terms.extend((excess[index], 1) for index in uncertain)
+            if bound == None:
+                prob += pulp.LpAffineExpression(terms)
+            else:
+                prob += pulp.LpAffineExpression(terms) <= bound
+
+    # Returns the solver config of the robust solves: the one of the optimizer, with the time limit of the robust optimizer if it sets none
+    def set_solver_config(self) -> sv.SolverConfig:
+        config = copy.copy(self.optimizer.solver_config if self.optimizer.solver_config != None else sv.SolverConfig())
+        if config.time_limit == None:
+            config.time_limit = self.time_limit
+        return config
+
+    # Solves the robust problem, returning the plan in the format of the optimizer, or None if there is no feasible plan
+    #   - A saa maximization plan of reduced scenarios that violates the chance constraint over every scenario is solved again (see TIGHTENINGS)
+    def solve(self, objective: str) -> typing.Optional[dict]:
+        if self.optimizer.set_contradiction_value(self.set_ride_weights(), objective):
+            return None
+        allowed = 1 - self.confidence
+        # Whether the saa scenarios are reduced, where only a maximization plan of reduced scenarios is checked against every scenario
+        self.reduce = self.method == "saa" and self.max_scenarios != None and len(self.scenarios) > self.max_scenarios
+        checked = self.reduce and objective == "maximize"
+        self.violation_budget = allowed
+        try:
+            for tightening in range(TIGHTENINGS + 2):
+                if tightening == TIGHTENINGS + 1:
+                    self.reduce = False
+                    self.violation_budget = allowed
+                prob, rides = self.build_problem(objective)
+                self.last_report = sv.solve(prob, self.set_solver_config())
+                if pulp.LpStatus[prob.status] != "Optimal":
+                    if not self.reduce:
+                        return None
+                    # A tightened reduced problem can be infeasible where the full one is not, so the full one is solved next
+                    self.reduce = False
+                    self.violation_budget = allowed
+                    continue
+                with it.span("extract"):
+                    plan = {key: float(round(pulp.value(variable) or 0)) for key, variable in rides.items()}
+                if not checked or not self.reduce:
+                    return plan
+                violation = self.set_violation_probability(plan)
+                if violation <= allowed + 1e-9:
+                    return plan
+                self.violation_budget = self.violation_budget * allowed / violation
+            return None
+        finally:
+            self.violation_budget = allowed
+            self.reduce = True
+
+    # --------------------
+    # Maximization Methods
+    # --------------------
+
+    # Maximizes the total number of rides, where the max time (and with dynamic times, the length of each time step) holds with the confidence
+    #   - With constant times, the user must set a max time, or else the solution would be unbounded
+    @it.instrumented()
+    def maximize_rides(self) -> typing.Optional[dict]:
+        if (not self.dynamic and self.user_preferences.max_time == None) or self.user_preferences.require_and_avoid_rides():
+            return None
+        return self.solve("maximize")
+
+    # --------------------
+    # Minimization Methods
+    # --------------------
+
+    # Minimizes the total time that the plan fits in with the confidence: its confidence quantile with saa, its CVaR (an upper bound of the quantile) with cvar, or its worst case within the budget of gamma with budgeted
+    @it.instrumented()
+    def minimize_time(self) -> typing.Optional[dict]:
+        if self.user_preferences.min_total_rides == None or self.user_preferences.require_and_avoid_rides():
+            return None
+        return self.solve("minimize")
+
+    # ------------------
+    # Evaluation Methods
+    # ------------------
+
+    # Returns the total time of a plan in every scenario (or None without scenarios)
+    def set_scenario_times(self, plan: dict) -> typing.Optional[np.ndarray]:
+        if self.scenarios is None:
+            return None
+        counts = np.array([plan.get(key, 0) or 0 for key in self.set_keys()], dtype=float)
+        return self.scenarios.reshape(len(self.scenarios), -1) @ counts
+
+    # Returns the probability that a plan takes longer than the max time, or than any time step with dynamic times, over every scenario (before any reduction)
+    def set_violation_probability(self, plan: dict) -> typing.Optional[float]:
+        if self.scenarios is None:
+            return None
+        counts = np.array([plan.get(key, 0) or 0 for key in self.set_keys()], dtype=float)
+        scenarios = self.scenarios.reshape(len(self.scenarios), -1)
+        violated = np.zeros(len(scenarios), dtype=bool)
+        for mask, bound in self.set_rows("maximize"):
+            violated |= scenarios[:, mask] @ counts[mask] > bound + 1e-9
+        return float(self.probabilities[violated].sum())
+
+    def __repr__(self) -> str:
+        return f"RobustOptimizer(method={self.method!r}, confidence={self.confidence}, scenarios={None if self.scenarios is None else len(self.scenarios)})"
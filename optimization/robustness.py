@@ -0,0 +1,166 @@
+from __future__ import annotations
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import weight_matrix as wm
+np = li.lazy_import("numpy")
+
+'''
+This file considers how a plan holds up when the actual wait times differ from the posted ones, by simulating many wait time scenarios at once.
+- A plan of either optimizer ({ride: count} or {(ride, time step): count}) is split into blocks, one for each ride (and time step) it goes on, in the order they are ridden
+- In each scenario, the total time of a ride in a block is its posted weight times
+    - a lognormal noise of the ride (with a mean of 1, so the posted weights stay the expected ones),
+    - and a time of day drift, which scales every wait time by a factor that grows (or shrinks) from the first to the last block at a rate drawn for the scenario
+- Each ride is down in a scenario (active=False) with the downtime probability, where its rides are skipped, and a ride is down for the whole time step of a block
+- Every scenario is simulated in one NumPy pass over a scenarios x blocks array, so 10,000 scenarios of a plan with 80 rides take a few tens of milliseconds
+'''
+
+
+class RobustnessReport():
+    def __init__(self, completion_times: np.ndarray, ride_counts: np.ndarray, planned_time: float, planned_rides: float, budget: typing.Optional[float], step_times: typing.Optional[np.ndarray] = None, frequency: typing.Optional[float] = None) -> None:
+        # The time taken by the rides that are not down, in each scenario
+        self.completion_times = completion_times
+        # The number of rides done within the budget (or every ride that is not down, if there is no budget), in each scenario
+        self.ride_counts = ride_counts
+        # The time and number of rides of the plan with the posted wait times
+        self.planned_time = planned_time
+        self.planned_rides = planned_rides
+        self.budget = budget
+        # The time taken in each time step, in each scenario (a scenarios x time steps array, dynamic plans only), and the length of a time step
+        self.step_times = step_times
+        self.frequency = frequency
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the share of scenarios where the plan takes longer than its budget (0 if there is no budget)
+    def set_overrun_probability(self) -> float:
+        if self.budget == None:
+            return 0.0
+        return float(np.mean(self.completion_times > self.budget))
+
+    # Returns the share of scenarios where the rides of each time step take longer than the time step (dynamic plans only)
+    def set_step_overrun_probabilities(self) -> typing.Optional[list]:
+        if self.step_times is None or self.frequency == None:
+            return None
+        return np.mean(self.step_times > self.frequency, axis=0).tolist()
+
+    # Returns a dict with the mean, standard deviation and percentiles of a distribution
+    def set_distribution(self, values: np.ndarray, percentiles: tuple = (5, 50, 95)) -> dict:
+        distribution = {"mean": float(np.mean(values)), "std": float(np.std(values))}
+        distribution.update({f"p{q}": float(value) for q, value in zip(percentiles, np.percentile(values, percentiles))})
+        return distribution
+
+    # Returns a JSON-serializable summary of the report
+    def summary(self) -> dict:
+        return {
+            "scenarios": len(self.completion_times),
+            "planned_time": self.planned_time,
+            "planned_rides": self.planned_rides,
+            "budget": self.budget,
+            "overrun_probability": self.set_overrun_probability(),
+            "step_overrun_probabilities": self.set_step_overrun_probabilities(),
+            "completion_time": self.set_distribution(self.completion_times),
+            "ride_count": self.set_distribution(self.ride_counts),
+        }
+
+    def __repr__(self) -> str:
+        return f"RobustnessReport(scenarios={len(self.completion_times)}, planned_time={self.planned_time}, budget={self.budget}, overrun_probability={self.set_overrun_probability():.3f})"
+
+
+class RobustnessEvaluator():
+    def __init__(self, ride_weights, noise: float = 0.25, drift: float = 0.15, downtime: float = 0.02, seed: typing.Optional[int] = None) -> None:
+        # The posted total time of each ride (at each time step), from set_ride_weights of either optimizer
+        self.weights = wm.WeightMatrix.from_dict(ride_weights)
+        # The standard deviation of the log of the noise of each ride's wait times
+        self.noise = noise
+        # The standard deviation of the log of the drift factor at the end of the day (where the drift of the first block is 0)
+        self.drift = drift
+        # The probability that a ride is down (for the whole day with constant times, or a whole time step with dynamic times)
+        self.downtime = downtime
+        self.random = np.random.default_rng(seed)
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the blocks of a plan, as arrays of the ride index, time step index, number of rides and position in the day (from 0 to 1) of each block
+    #   - The blocks are ordered by time step, and by the order of the plan within a time step
+    #   - The position of a block is the share of the planned time spent before its middle (so a constant times plan also drifts over the day)
+    def set_blocks(self, plan: dict) -> tuple:
+        blocks = []
+        for key, count in plan.items():
+            if not count:
+                continue
+            ride, time_step = key if isinstance(key, tuple) else (key, 1)
+            blocks.append((time_step, len(blocks), self.weights.index[ride], count))
+        blocks.sort()
+        rides = np.array([block[2] for block in blocks], dtype=np.int64)
+        time_steps = np.array([block[0] - 1 for block in blocks], dtype=np.int64)
+        counts = np.array([block[3] for block in blocks], dtype=float)
+        planned = counts * self.weights.matrix[rides, time_steps].astype(float)
+        total = planned.sum()
+        positions = (np.cumsum(planned) - planned / 2) / total if total > 0 else np.zeros(len(blocks))
+        return (rides, time_steps, counts, positions)
+
+    # Returns the (scenarios x blocks) arrays of the total time of one ride in each block, and whether the ride of each block is up
+    def sample(self, scenarios: int, rides: np.ndarray, time_steps: np.ndarray, positions: np.ndarray) -> tuple:
+        weights = self.weights.matrix[rides, time_steps].astype(float)
+        # One noise per ride and time step, shared by the blocks of a ride within a time step
+        cells = rides * self.weights.time_steps + time_steps
+        unique_cells, block_cells = np.unique(cells, return_inverse=True)
+        noise = self.random.standard_normal((scenarios, len(unique_cells)))[:, block_cells]
+        rates = self.random.standard_normal((scenarios, 1))
+        # Both factors are lognormal with a mean of 1, so the posted weights are the expected ones
+        exponent = self.noise * noise - self.noise ** 2 / 2 + self.drift * rates * positions - (self.drift * positions) ** 2 / 2
+        times = weights * np.exp(exponent)
+        active = (self.random.random((scenarios, len(unique_cells))) >= self.downtime)[:, block_cells]
+        return (times, active)
+
+    # Returns a (scenarios x rides x time steps) array of sampled ride weights, the scenario matrix of a robust optimizer (see robust.py)
+    #   - Each weight gets its own noise, and the drift grows over the time steps (a constant times matrix drifts to the middle of the day)
+    #   - Downtime does not apply, since a plan cannot be made for a ride that is down
+    def sample_weights(self, scenarios: int) -> np.ndarray:
+        positions = (np.arange(self.weights.time_steps) + 0.5) / self.weights.time_steps
+        noise = self.random.standard_normal((scenarios, len(self.weights.rides), self.weights.time_steps))
+        rates = self.random.standard_normal((scenarios, 1, 1))
+        exponent = self.noise * noise - self.noise ** 2 / 2 + self.drift * rates * positions - (self.drift * positions) ** 2 / 2
+        return self.weights.matrix.astype(float) * np.exp(exponent)
+
+    # ------------------
+    # Evaluation Methods
+    # ------------------
+
+    # Simulates a plan in many wait time scenarios, returning a RobustnessReport
+    #   - budget is the time the plan must fit in (e.g., the max time), where the rides after it are not done; None counts every ride that is not down
+    #   - frequency is the length of a time step, to report how often the rides of each time step overrun it (dynamic plans only)
+    def evaluate(self, plan: dict, budget: typing.Optional[float] = None, scenarios: int = 10000, frequency: typing.Optional[float] = None) -> RobustnessReport:
+        rides, time_steps, counts, positions = self.set_blocks(plan)
+        times, active = self.sample(scenarios, rides, time_steps, positions)
+        block_times = np.where(active, times * counts, 0.0)
+        completion_times = block_times.sum(axis=1)
+
+        if budget == None:
+            ride_counts = (active * counts).sum(axis=1)
+        else:
+            # The rides of a block are done one after the other, until the budget runs out
+            start_times = np.cumsum(block_times, axis=1) - block_times
+            fits = np.floor(np.divide(budget - start_times, times, out=np.full(times.shape, np.inf), where=times > 0) + 1e-9)
+            ride_counts = np.where(active, np.clip(fits, 0, counts), 0.0).sum(axis=1)
+
+        step_times = None
+        if self.weights.time_steps > 1:
+            step_times = block_times @ (time_steps[:, None] == np.arange(self.weights.time_steps)[None, :])
+        planned_time = float(np.sum(counts * self.weights.matrix[rides, time_steps]))
+        return RobustnessReport(completion_times, ride_counts, planned_time, float(counts.sum()), budget, step_times, frequency)
+
+
+# Simulates a plan of an optimizer (OptimizeConstant or OptimizeDynamic) in many wait time scenarios, against the user's max time, returning a RobustnessReport
+def evaluate_plan(optimizer, plan: dict, scenarios: int = 10000, noise: float = 0.25, drift: float = 0.15, downtime: float = 0.02, seed: typing.Optional[int] = None) -> RobustnessReport:
+    evaluator = RobustnessEvaluator(optimizer.set_ride_weights(), noise, drift, downtime, seed)
+    return evaluator.evaluate(plan, optimizer.user_preferences.max_time, scenarios, getattr(optimizer, "frequency", None))
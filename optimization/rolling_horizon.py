@@ -0,0 +1,136 @@
+from __future__ import annotations
+import time
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import user_preferences as up
+from optimization import dynamic_times as dt
+from optimization import persistent_model as pm
+from optimization import solvers as sv
+from optimization import weight_matrix as wm
+np = li.lazy_import("numpy")
+
+'''
+This file considers re-planning a day at the park as it goes, rather than solving the dynamic optimization problems once before it starts.
+- Every live snapshot gives the wait times of the current time step, and the later time steps come from a forecast (or the latest snapshot if there is none)
+- Rides already taken are locked in: they count toward every user preference, their time is taken off the max time, and the time steps that have passed are closed
+- The model is built once (see PersistentModel) and each re-plan only updates its bounds and coefficients, warm starting from the previous plan
+- Every re-plan is capped by a solver time limit, so that it stays interactive even for large parks
+'''
+
+
+class RollingHorizonPlanner():
+    def __init__(self, all_rides: list, time_steps: int, frequency: int, user_preferences: up.UserPreferences, objective: str = "maximize", forecast: typing.Optional[typing.Callable] = None, time_cap: float = 2.0, solver_config: typing.Optional[sv.SolverConfig] = None) -> None:
+        self.all_rides = list(all_rides)
+        self.time_steps = time_steps
+        self.frequency = frequency
+        self.user_preferences = user_preferences
+        self.objective = objective
+        # A function of (rides, time_steps, frequency) returning the forecasted {time step: [waits]} of the rides from now on, like the forecast of OptimizePark
+        self.forecast = forecast
+        # The solver time limit of each re-plan, in seconds (ignored if a solver_config is given)
+        self.solver_config = solver_config if solver_config != None else sv.SolverConfig(time_limit=time_cap)
+        self.model = pm.PersistentModel(self.all_rides, objective, time_steps, self.solver_config)
+        # The rides taken so far, as {ride: count}, along with the time step and wait time of each one
+        self.taken = {}
+        self.history = []
+        self.time_spent = 0
+        # Minutes since the start of the day, as of the latest snapshot
+        self.elapsed = 0
+        # The rides x time steps wait times the latest plan was made with
+        self.weights = wm.WeightMatrix(self.all_rides, np.zeros((len(self.all_rides), time_steps)))
+        self.plan = None
+        # The SolveReport of the latest re-plan, and its total latency in seconds (including the model update)
+        self.last_report = None
+        self.latency = None
+        # The Conflicts found by the preflight analysis of the latest re-plan
+        self.conflicts = []
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the time step (starting at 1) that a number of elapsed minutes falls in
+    def set_time_step(self, elapsed: float) -> int:
+        return int(elapsed // self.frequency) + 1
+
+    # Returns a dict where the keys are the rides that are currently active, and the values are their wait times
+    #   - snapshot is a ParkData, the list of ride dicts returned by the park data API, or a {ride: wait time} dict
+    def set_live_waits(self, snapshot) -> dict:
+        if hasattr(snapshot, "filter_for_active_rides"):
+            return dict(snapshot.filter_for_active_rides())
+        if isinstance(snapshot, dict):
+            return dict(snapshot)
+        return {item["name"]: item["waitTime"] if item["waitTime"] != None else 0 for item in snapshot if item["active"] != False}
+
+    # Returns the wait times of every ride and time step: the recorded ones for the time steps that passed, the live ones for the current time step, and the forecasted ones after it
+    def set_ride_weights(self, live_waits: dict, time_step: int) -> wm.WeightMatrix:
+        values = self.weights.matrix.astype(float)
+        current = np.array([live_waits.get(ride, np.nan) for ride in self.all_rides], dtype=float)
+        # A ride that is closed right now keeps its previous wait time, and is only unavailable for the current time step
+        current = np.where(np.isnan(current), values[:, time_step-1], current)
+        values[:, time_step-1:] = current[:, None]
+        if self.forecast != None and time_step < self.time_steps:
+            forecasts = self.forecast(self.all_rides, self.time_steps - time_step + 1, self.frequency)
+            for offset in range(2, self.time_steps - time_step + 2):
+                values[:, time_step + offset - 2] = forecasts[offset]
+        return wm.WeightMatrix(self.all_rides, values)
+
+    # --------------
+    # Update Methods
+    # --------------
+
+    # Records a ride that was taken at the current time step, with its wait time (the current planned wait time if None)
+    def record(self, ride, wait: typing.Optional[float] = None):
+        time_step = min(self.set_time_step(self.elapsed), self.time_steps)
+        wait = wait if wait != None else float(self.weights.row(ride)[time_step-1])
+        self.taken[ride] = self.taken.get(ride, 0) + 1
+        self.history.append((ride, time_step, wait))
+        self.time_spent += wait
+
+    # Re-plans the rest of the day from a live snapshot, returning a dict where the keys are (ride, time step) tuples, and the values are the number of times to go on each ride (None if the rest of the day has no feasible plan)
+    #   - elapsed is the number of minutes since the start of the day
+    #   - taken is a list of the rides taken since the previous re-plan, as ride names or (ride, wait time) tuples
+    #   - The plan only covers the rides that are left; the time steps that passed are planned zero times
+    def replan(self, snapshot, elapsed: float, taken: typing.Optional[list] = None) -> typing.Optional[dict]:
+        start = time.perf_counter()
+        for item in taken if taken != None else []:
+            if isinstance(item, tuple):
+                self.record(*item)
+            else:
+                self.record(item)
+        self.elapsed = elapsed
+        time_step = self.set_time_step(elapsed)
+        if time_step > self.time_steps:
+            # The day is over, so there is nothing left to plan
+            self.plan = {(ride, step): 0.0 for ride in self.all_rides for step in range(1, self.time_steps+1)}
+            return self.plan
+
+        live_waits = self.set_live_waits(snapshot)
+        self.weights = self.set_ride_weights(live_waits, time_step)
+        # The time steps that passed are closed, and the current one only has the time that is left in it
+        capacities = {step: 0 for step in range(1, time_step)}
+        capacities[time_step] = time_step * self.frequency - elapsed
+        unavailable = {(ride, time_step) for ride in self.all_rides if ride not in live_waits}
+        self.model.lock(self.taken, self.time_spent, capacities, unavailable)
+
+        optimizer = dt.OptimizeDynamic(self.all_rides, self.time_steps, self.frequency, self.weights.to_wait_times(), self.user_preferences, model=self.model, solver_config=self.solver_config)
+        if self.objective == "maximize":
+            self.plan = optimizer.maximize_rides(self.weights)
+        else:
+            self.plan = optimizer.minimize_time(self.weights)
+        self.last_report = optimizer.last_report
+        self.conflicts = optimizer.conflicts
+        self.latency = time.perf_counter() - start
+        return self.plan
+
+    # Returns the rides of the latest plan at a time step (the current one if None), as {ride: number of times}
+    def next_rides(self, time_step: typing.Optional[int] = None) -> dict:
+        time_step = time_step if time_step != None else self.set_time_step(self.elapsed)
+        if self.plan == None:
+            return {}
+        return {ride: value for (ride, step), value in self.plan.items() if step == time_step and value > 0}
@@ -0,0 +1,419 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import user_preferences as up
+from optimization import constant_times as ct
+from optimization import dynamic_times as dt
+from optimization import solvers as sv
+
+'''
+This file considers serving the optimizers as a JSON API over HTTP, apart from the Streamlit UI, so that other clients can request plans and solving can be scaled apart from rendering.
+- OptimizationService is an ASGI application, so it runs under any ASGI server (e.g., `uvicorn --factory optimization.service:create_app`), or under serve() in this file, which only needs the standard library (`python -m optimization.service`)
+- POST /v1/optimize takes a park snapshot, user preferences and an objective, and returns the plan; GET /healthz returns the counters of the service
+- Every request is validated before it reaches a solver, and gets a 422 response listing every problem with it
+- Solves run in a bounded pool of worker processes (prewarmed with solvers.prewarm), and identical problems that are in flight at the same time share one solve
+- Once every worker is busy and the queue is full, new problems get a 429 response right away, rather than waiting behind work that would miss their deadlines
+- Each request has a deadline: the solver's time limit is the time left when the solve starts, a solve still queued at the deadline is skipped, and a request past its deadline gets a 504 response
+'''
+
+# Largest park snapshot accepted, so that one request cannot tie up a worker for long
+MAX_RIDES = 500
+MAX_TIME_STEPS = 96
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+# Share of the deadline given to the solver, leaving the rest for the queue, the model build and the response
+SOLVER_SHARE = 0.8
+
+PREFERENCES = ("required_rides", "avoid_rides", "min_distinct_rides", "max_ride_repeats", "max_time", "min_total_rides")
+
+
+# ------------------
+# Validation Methods
+# ------------------
+
+# Returns a bool as to whether a value is a number (bools are not numbers here, even though they are ints in Python)
+def set_number_value(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# Returns a list of the problems with a list of wait times (one per ride)
+def validate_wait_times(wait_times, num_rides: int, name: str) -> list:
+    if not isinstance(wait_times, list) or len(wait_times) != num_rides:
+        return [f"{name} must be a list with one wait time per ride"]
+    if not all(set_number_value(value) and 0 <= value < float("inf") for value in wait_times):
+        return [f"{name} must only have finite non-negative numbers"]
+    return []
+
+# Returns a (problem, errors) tuple from the JSON body of a request, where problem only holds plain data (so that it can be sent to a worker process)
+#   - body: {"time_assumption": "constant" or "dynamic", "objective": "maximize" or "minimize", "rides": [names], "wait_times": [one per ride] (constant) or [[one per ride] for each time step] (dynamic),
+#     "frequency": minutes per time step (dynamic), "preferences": {user preferences}, "backend": "cbc" or "highs", "deadline": seconds}
+def validate_request(body, max_deadline: float) -> tuple:
+    if not isinstance(body, dict):
+        return (None, ["The body must be a JSON object"])
+    errors = []
+    time_assumption = body.get("time_assumption", "constant")
+    if time_assumption not in ("constant", "dynamic"):
+        errors.append("time_assumption must be 'constant' or 'dynamic'")
+    objective = body.get("objective")
+    if objective not in ("maximize", "minimize"):
+        errors.append("objective must be 'maximize' or 'minimize'")
+    rides = body.get("rides")
+    if not isinstance(rides, list) or not rides or not all(isinstance(ride, str) for ride in rides):
+        return (None, errors + ["rides must be a non-empty list of ride names"])
+    if len(rides) > MAX_RIDES:
+        errors.append(f"rides must have at most {MAX_RIDES} rides")
+    if len(set(rides)) != len(rides):
+        errors.append("rides must not have duplicate names")
+
+    wait_times = body.get("wait_times")
+    frequency = body.get("frequency")
+    if time_assumption == "dynamic":
+        if not isinstance(wait_times, list) or not wait_times or len(wait_times) > MAX_TIME_STEPS:
+            errors.append(f"wait_times must be a list of 1 to {MAX_TIME_STEPS} time steps")
+        else:
+            for time_step, step_wait_times in enumerate(wait_times, start=1):
+                errors.extend(validate_wait_times(step_wait_times, len(rides), f"wait_times of time step {time_step}"))
+        if not set_number_value(frequency) or frequency <= 0:
+            errors.append("frequency must be a positive number of minutes")
+    else:
+        errors.extend(validate_wait_times(wait_times, len(rides), "wait_times"))
+
+    preferences = body.get("preferences", {})
+    if not isinstance(preferences, dict):
+        return (None, errors + ["preferences must be a JSON object"])
+    ride_names = set(rides)
+    unknown = sorted(set(preferences.keys()) - set(PREFERENCES))
+    if unknown:
+        errors.append(f"Unknown preferences: {', '.join(unknown)}")
+    for name in ("required_rides", "avoid_rides"):
+        value = preferences.get(name)
+        if value != None and (not isinstance(value, list) or not all(isinstance(ride, str) and ride in ride_names for ride in value)):
+            errors.append(f"{name} must be a list of names from rides")
+    for name in ("min_distinct_rides", "max_ride_repeats", "min_total_rides"):
+        value = preferences.get(name)
+        if value != None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+            errors.append(f"{name} must be a non-negative integer")
+    max_time = preferences.get("max_time")
+    if max_time != None and (not set_number_value(max_time) or max_time < 0):
+        errors.append("max_time must be a non-negative number of minutes")
+    # The maximization problem with constant times is unbounded without a max time, and the minimization problem has nothing to minimize without min total rides
+    if objective == "maximize" and time_assumption == "constant" and max_time == None:
+        errors.append("max_time is required to maximize the rides with constant wait times")
+    if objective == "minimize" and preferences.get("min_total_rides") == None:
+        errors.append("min_total_rides is required to minimize the time")
+
+    backend = body.get("backend", "cbc")
+    if backend not in sv.BACKENDS:
+        errors.append(f"backend must be one of {', '.join(sv.BACKENDS)}")
+    deadline = body.get("deadline")
+    if deadline != None and (not set_number_value(deadline) or not 0 < deadline <= max_deadline):
+        errors.append(f"deadline must be a number of seconds in (0, {max_deadline}]")
+    if errors:
+        return (None, errors)
+    problem = {
+        "time_assumption": time_assumption,
+        "objective": objective,
+        "rides": rides,
+        "wait_times": wait_times,
+        "frequency": frequency if time_assumption == "dynamic" else None,
+        "preferences": {name: preferences.get(name) for name in PREFERENCES},
+        "backend": backend,
+    }
+    return (problem, [])
+
+# Returns the key of a problem, which is the same for any two requests that lead to the same solve (whatever their deadlines)
+def set_problem_key(problem: dict) -> str:
+    user_preferences = up.UserPreferences(**problem["preferences"])
+    payload = [problem["time_assumption"], problem["objective"], problem["rides"], problem["wait_times"], problem["frequency"], user_preferences.canonical_key(), problem["backend"]]
+    return hashlib.sha256(json.dumps(payload, default=str).encode()).hexdigest()
+
+
+# -------------
+# Solve Methods
+# -------------
+
+# Solves a problem in a worker, returning a JSON-serializable dict with the status, plan, objective value and conflicts
+#   - expires_at is the wall clock time (time.time()) of the deadline, so that it means the same in every process
+def solve_problem(problem: dict, expires_at: float) -> dict:
+    remaining = expires_at - time.time()
+    if remaining <= 0:
+        return {"status": "expired"}
+    user_preferences = up.UserPreferences(**problem["preferences"])
+    user_preferences.convert_empty_data_types()
+    solver_config = sv.SolverConfig(backend=problem["backend"], time_limit=max(remaining * SOLVER_SHARE, 0.1))
+    rides = problem["rides"]
+    if problem["time_assumption"] == "dynamic":
+        wait_times = {time_step: step_wait_times for time_step, step_wait_times in enumerate(problem["wait_times"], start=1)}
+        optimizer = dt.OptimizeDynamic(rides, len(wait_times), problem["frequency"], wait_times, user_preferences, solver_config=solver_config)
+    else:
+        optimizer = ct.OptimizeConstant(rides, problem["wait_times"], user_preferences, solver_config=solver_config)
+    ride_weights = optimizer.set_ride_weights()
+
+    start = time.perf_counter()
+    if problem["objective"] == "maximize":
+        solution = optimizer.maximize_rides(ride_weights)
+    else:
+        solution = optimizer.minimize_time(ride_weights)
+    result = {"solve_seconds": time.perf_counter() - start, "conflicts": [{"constraints": list(conflict.constraints), "message": conflict.message} for conflict in optimizer.conflicts]}
+    report = optimizer.last_report
+    if solution == None:
+        result["status"] = "infeasible" if optimizer.conflicts or report == None or report.status == "Infeasible" else "not_solved"
+        return result
+
+    # Dynamic plans have one count per ride and time step, which become a list per ride
+    if problem["time_assumption"] == "dynamic":
+        plan = {ride: [int(round(solution.get((ride, time_step)) or 0)) for time_step in range(1, len(problem["wait_times"])+1)] for ride in rides}
+        total_rides = sum(sum(counts) for counts in plan.values())
+        total_time = sum(count * problem["wait_times"][t][i] for i, ride in enumerate(rides) for t, count in enumerate(plan[ride]))
+    else:
+        plan = {ride: int(round(solution.get(ride) or 0)) for ride in rides}
+        total_rides = sum(plan.values())
+        total_time = sum(plan[ride] * problem["wait_times"][i] for i, ride in enumerate(rides))
+    result.update({
+        # A solve cut short by its time limit returns its best plan, which is not proven optimal
+        "status": "optimal" if report == None or report.set_proven_value() else "feasible",
+        "plan": plan,
+        "objective": float(total_rides if problem["objective"] == "maximize" else total_time),
+        "gap": report.gap if report != None else 0.0,
+    })
+    return result
+
+
+class OptimizationService():
+    def __init__(self, workers: int = 2, queue_size: int = 8, default_deadline: float = 30, max_deadline: float = 300, processes: bool = True) -> None:
+        self.workers = workers
+        # Number of distinct solves that may wait for a worker, beyond the ones running
+        self.queue_size = queue_size
+        self.default_deadline = default_deadline
+        self.max_deadline = max_deadline
+        # Worker processes are prewarmed, so the first solve of each one does not pay for importing PuLP and finding the solver
+        if processes:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=sv.prewarm)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        # Maps the key of every problem that is queued or being solved to the future of its solve
+        self.in_flight = {}
+        self.counters = {"requests": 0, "solves": 0, "coalesced": 0, "rejected": 0, "invalid": 0, "timeouts": 0, "errors": 0}
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the number of distinct solves that are queued or running
+    def set_pending(self) -> int:
+        return len(self.in_flight)
+
+    # Returns a dict with the counters of the service and its current load
+    def stats(self) -> dict:
+        return dict(self.counters, pending=self.set_pending(), capacity=self.workers + self.queue_size)
+
+    # --------------
+    # Solve Methods
+    # --------------
+
+    # Starts the solve of a problem in the pool, returning its future, which leaves the in-flight problems once it is done
+    def submit(self, key: str, problem: dict, expires_at: float) -> asyncio.Future:
+        future = asyncio.get_running_loop().run_in_executor(self.executor, solve_problem, problem, expires_at)
+        self.in_flight[key] = future
+        self.counters["solves"] += 1
+        future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return future
+
+    # Returns a (status code, JSON payload, headers) tuple for the JSON body of an optimization request
+    async def optimize(self, body) -> tuple:
+        self.counters["requests"] += 1
+        start = time.perf_counter()
+        problem, errors = validate_request(body, self.max_deadline)
+        if errors:
+            self.counters["invalid"] += 1
+            return (422, {"errors": errors}, [])
+        deadline = body.get("deadline") or self.default_deadline
+        key = set_problem_key(problem)
+
+        # Identical problems in flight share one solve, and only new solves count against the capacity
+        future = self.in_flight.get(key)
+        coalesced = future != None
+        if coalesced:
+            self.counters["coalesced"] += 1
+        elif self.set_pending() >= self.workers + self.queue_size:
+            self.counters["rejected"] += 1
+            return (429, {"error": "The service is at capacity, retry later"}, [(b"retry-after", b"1")])
+        else:
+            future = self.submit(key, problem, time.time() + deadline)
+
+        try:
+            # The solve is shielded, so that a request timing out does not cancel it for the requests sharing it
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=deadline)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            return (504, {"error": f"No plan within the deadline of {deadline} seconds"}, [])
+        except Exception as error:
+            self.counters["errors"] += 1
+            return (500, {"error": f"The solve failed: {type(error).__name__}"}, [])
+        if result["status"] == "expired":
+            self.counters["timeouts"] += 1
+            return (504, {"error": f"The solve did not start within the deadline of {deadline} seconds"}, [])
+        return (200, dict(result, coalesced=coalesced, seconds=time.perf_counter() - start), [])
+
+    # Shuts the worker pool down
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # -------------
+    # ASGI Methods
+    # -------------
+
+    async def __call__(self, scope: dict, receive: typing.Callable, send: typing.Callable):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    self.close()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        if scope["path"] == "/healthz" and scope["method"] == "GET":
+            status, payload, headers = (200, dict(self.stats(), status="ok"), [])
+        elif scope["path"] == "/v1/optimize" and scope["method"] == "POST":
+            body = await read_body(receive)
+            if body == None:
+                status, payload, headers = (413, {"error": f"The body must be at most {MAX_BODY} bytes"}, [])
+            else:
+                try:
+                    status, payload, headers = await self.optimize(json.loads(body))
+                except ValueError:
+                    status, payload, headers = (400, {"error": "The body must be valid JSON"}, [])
+        elif scope["path"] in ("/healthz", "/v1/optimize"):
+            status, payload, headers = (405, {"error": "Method not allowed"}, [])
+        else:
+            status, payload, headers = (404, {"error": "Not found"}, [])
+        content = json.dumps(payload).encode()
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(content)).encode())] + headers})
+        await send({"type": "http.response.body", "body": content})
+
+
+# Returns the body of an ASGI request, or None if it is larger than MAX_BODY
+async def read_body(receive: typing.Callable) -> typing.Optional[bytes]:
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+# Returns an OptimizationService configured from the environment (OPTIMIZATION_WORKERS, OPTIMIZATION_QUEUE_SIZE and OPTIMIZATION_DEADLINE), e.g., for an ASGI server's --factory option
+def create_app() -> OptimizationService:
+    return OptimizationService(
+        workers=int(os.environ.get("OPTIMIZATION_WORKERS", os.cpu_count() or 1)),
+        queue_size=int(os.environ.get("OPTIMIZATION_QUEUE_SIZE", 8)),
+        default_deadline=float(os.environ.get("OPTIMIZATION_DEADLINE", 30)),
+    )
+
+
+# ---------------
+# Server Methods
+# ---------------
+
+# Reads an HTTP/1.1 request from a connection, returning (method, target, headers, body), or None once the client closes the connection
+async def read_request(reader: asyncio.StreamReader) -> typing.Optional[tuple]:
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+    length = int(dict(headers).get(b"content-length", b"0"))
+    body = await reader.readexactly(length) if length <= MAX_BODY else b""
+    return (method, target, headers, body if length <= MAX_BODY else None)
+
+# Runs an ASGI application for one connection, with keep-alive between requests
+async def handle_connection(app: typing.Callable, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            request = await read_request(reader)
+            if request == None:
+                break
+            method, target, headers, body = request
+            path, _, query = target.partition("?")
+            scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "path": path, "query_string": query.encode(), "headers": headers}
+            messages = [{"type": "http.request", "body": body if body != None else b"x" * (MAX_BODY + 1), "more_body": False}]
+
+            async def receive():
+                return messages.pop() if messages else {"type": "http.disconnect"}
+
+            response = {"status": 500, "headers": [], "body": []}
+
+            async def send(message: dict):
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+                    response["headers"] = message.get("headers", [])
+                else:
+                    response["body"].append(message.get("body", b""))
+
+            await app(scope, receive, send)
+            close = dict(headers).get(b"connection", b"").lower() == b"close" or body == None
+            head = [f"HTTP/1.1 {response['status']} {STATUS_PHRASES.get(response['status'], '')}".encode()] + [name + b": " + value for name, value in response["headers"]]
+            head.append(b"connection: close" if close else b"connection: keep-alive")
+            writer.write(b"\r\n".join(head) + b"\r\n\r\n" + b"".join(response["body"]))
+            await writer.drain()
+            if close:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+STATUS_PHRASES = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 422: "Unprocessable Entity", 429: "Too Many Requests", 500: "Internal Server Error", 504: "Gateway Timeout"}
+
+# Serves an ASGI application over HTTP/1.1 with only the standard library (for local runs and load tests, an ASGI server such as uvicorn is a better fit in production)
+#   - ready is called with the bound port once the server listens (port 0 picks a free port)
+async def serve(app: typing.Callable, host: str = "127.0.0.1", port: int = 8000, ready: typing.Optional[typing.Callable] = None):
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(app, reader, writer), host, port)
+    if ready != None:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def main(arguments: typing.Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Serve the optimizers as a JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--queue-size", type=int, default=8, help="Number of distinct solves that may wait for a worker before requests are rejected")
+    parser.add_argument("--deadline", type=float, default=30, help="Deadline of requests that do not set one, in seconds")
+    args = parser.parse_args(arguments)
+    service = OptimizationService(args.workers, args.queue_size, args.deadline)
+    try:
+        asyncio.run(serve(service, args.host, args.port, ready=lambda port: print(f"Serving on http://{args.host}:{port}", file=sys.stderr)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import collections
+import copy
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import typing
+from optimization import lazy_imports as li
+np = li.lazy_import("numpy")
+
+'''
+This file considers caching optimal solutions, since the same inputs reach the optimizers over and over (e.g., every Streamlit rerun with the same park snapshot and slider values).
+- Solutions are keyed on a hash of the canonicalized inputs: optimizer class, method, ride weights, time steps, frequency, user preferences and solver configuration
+- Entries are evicted when the cache is full (least recently used first) or when they are older than the TTL, which defaults to the 3600 seconds between park data refreshes
+- An optional directory keeps the entries on disk, so that they survive process restarts
+'''
+
+# Returns a JSON-serializable version of a value, where numpy types become Python types and tuples/sets become lists
+def canonical(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return [[canonical(key), canonical(item)] for key, item in value.items()]
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((canonical(item) for item in value), key=str)
+    return value
+
+
+class SolutionCache():
+    def __init__(self, maxsize: int = 256, ttl: float = 3600, directory: typing.Optional[str] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = directory
+        if directory != None:
+            os.makedirs(directory, exist_ok=True)
+        # Maps keys to (time stored, solution), ordered from least to most recently used
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the cache key of an optimizer method call
+    def set_key(self, optimizer, method: str, ride_weights: dict, **kwargs) -> str:
+        weights = ride_weights.matrix if isinstance(getattr(ride_weights, "matrix", None), np.ndarray) else [ride_weights[ride] for ride in ride_weights.keys()]
+        payload = [
+            type(optimizer).__name__,
+            method,
+            list(ride_weights.keys()),
+            weights,
+            getattr(optimizer, "time_steps", None),
+            getattr(optimizer, "frequency", None),
+            optimizer.user_preferences.canonical_key(),
+            # A time limit or gap can change the solution, so solver configurations are cached separately
+            repr(getattr(optimizer, "solver_config", None)),
+            sorted(kwargs.items()),
+        ]
+        return hashlib.sha256(json.dumps(canonical(payload), default=str).encode()).hexdigest()
+
+    # Returns the path of the on-disk entry of a key
+    def set_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    # -------------
+    # Cache Methods
+    # -------------
+
+    # Returns a (found, solution) tuple, since None is a valid cached solution (i.e., no feasible solution)
+    def get(self, key: str) -> tuple:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry == None and self.directory != None and os.path.exists(self.set_path(key)):
+                try:
+                    with open(self.set_path(key), "rb") as file:
+                        entry = pickle.load(file)
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    entry = None
+                if entry != None:
+                    self.entries[key] = entry
+            if entry == None or time.time() - entry[0] > self.ttl:
+                self.discard(key)
+                self.misses += 1
+                return (False, None)
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return (True, copy.deepcopy(entry[1]))
+
+    # Stores a solution, evicting the least recently used entries once the cache is full
+    def put(self, key: str, solution):
+        entry = (time.time(), copy.deepcopy(solution))
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.discard(next(iter(self.entries)))
+            if self.directory != None:
+                # Write to a temporary file first, so that other processes never read a partial entry
+                temporary_path = f"{self.set_path(key)}.{os.getpid()}.tmp"
+                with open(temporary_path, "wb") as file:
+                    pickle.dump(entry, file)
+                os.replace(temporary_path, self.set_path(key))
+
+    # Removes an entry from memory and disk (the lock must already be held)
+    def discard(self, key: str):
+        self.entries.pop(key, None)
+        if self.directory != None and os.path.exists(self.set_path(key)):
+            os.remove(self.set_path(key))
+
+    # Removes every entry and resets the hit/miss counters
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries.keys()):
+                self.discard(key)
+            if self.directory != None:
+                for name in os.listdir(self.directory):
+                    if name.endswith(".pkl"):
+                        os.remove(os.path.join(self.directory, name))
+            self.hits = 0
+            self.misses = 0
+
+    # Returns a dict with the hit/miss counters and the number of entries in memory
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    # Returns the solution of an optimizer method (e.g., "maximize_rides" or "minimize_time"), calling the method only on a cache miss
+    def solve(self, optimizer, method: str, ride_weights: dict, **kwargs):
+        key = self.set_key(optimizer, method, ride_weights, **kwargs)
+        found, solution = self.get(key)
+        if found:
+            return solution
+        solution = getattr(optimizer, method)(ride_weights, **kwargs)
+        self.put(key, solution)
+        return solution
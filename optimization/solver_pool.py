@@ -0,0 +1,292 @@
+from __future__ import annotations
+import asyncio
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import typing
+from concurrent.futures import CancelledError, Future
+import sys
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import solvers as sv
+pulp = li.lazy_import("pulp")
+
+'''
+This file considers solving the PuLP problems in long-lived worker processes, so that no solve can block its caller for longer than its deadline.
+- Each worker receives a serialized model (LpProblem.to_dict, along with the values of a warm start), solves it, and sends back the status and the values of the variables, which are written back into the caller's problem
+- The solver's own time limit is the time left before the deadline minus a grace period, so that the solver stops by itself and returns its best incumbent (a feasible but unproven solution) whenever it has one
+- A worker still solving at the deadline (e.g., a solver that ignores its time limit) is killed along with the solver subprocess, and a new worker takes its place; the solve then ends with a "Not Solved" status
+- A solve can be cancelled while queued or running (a running one kills its worker), and can be awaited from asyncio code with solve_async
+- Set SolverConfig(pool=...) to send every solve of an optimizer (or a persistent model) through a pool
+'''
+
+# Seconds between the checks of a running solve for its deadline or cancellation
+POLL_INTERVAL = 0.05
+
+
+# Runs in each worker process: solves every model received until the connection closes
+#   - directory holds the temporary files of the solver, so that the files of a killed solve are removed along with it
+def run_worker(connection, directory: str):
+    # The worker leads its own process group, so killing the group also kills the solver subprocess (e.g., CBC)
+    if hasattr(os, "setsid"):
+        os.setsid()
+    os.environ["TMPDIR"] = os.environ["TMP"] = directory
+    try:
+        sv.prewarm()
+    except RuntimeError:
+        pass
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message == None:
+            return
+        data, fields, warm_start = message
+        try:
+            variables, prob = pulp.LpProblem.from_dict(data)
+            report = sv.solve(prob, sv.SolverConfig(**fields), warm_start)
+            connection.send(("result", {"status": prob.status, "sol_status": prob.sol_status, "values": {name: variable.varValue for name, variable in variables.items()}, "report": vars(report)}))
+        except Exception as error:
+            connection.send(("error", f"{type(error).__name__}: {error}"))
+
+
+class SolveTask():
+    def __init__(self, prob: pulp.LpProblem, fields: dict, warm_start: bool, expires_at: float) -> None:
+        self.prob = prob
+        # The keyword arguments of the SolverConfig of the worker (without the time limit, which is only known once the solve starts)
+        self.fields = fields
+        self.warm_start = warm_start
+        # The time.monotonic() of the deadline
+        self.expires_at = expires_at
+        self.future = Future()
+        self.cancelled = False
+
+
+class PoolWorker():
+    def __init__(self, context) -> None:
+        self.context = context
+        self.process = None
+        self.connection = None
+        self.directory = None
+        self.start()
+
+    # Starts a new worker process
+    def start(self):
+        parent_connection, child_connection = self.context.Pipe()
+        self.directory = tempfile.mkdtemp(prefix="solver-pool-")
+        self.process = self.context.Process(target=run_worker, args=(child_connection, self.directory), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.connection = parent_connection
+
+    # Kills the worker process and its solver subprocess
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            # The worker has no process group of its own yet (or the platform has none)
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # Kills the worker process and starts a new one
+    def restart(self):
+        self.kill()
+        self.start()
+
+    # Asks the worker process to exit once it is idle
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.connection.close()
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SolverPool():
+    def __init__(self, workers: int = 2, default_deadline: float = 60, grace: float = 1.0, start_method: typing.Optional[str] = None) -> None:
+        self.default_deadline = default_deadline
+        # Seconds between the solver's time limit and the deadline, for the solver to stop and send back its incumbent
+        self.grace = grace
+        context = multiprocessing.get_context(start_method)
+        self.workers = [PoolWorker(context) for _ in range(workers)]
+        self.tasks = queue.Queue()
+        # Maps the future of every queued or running solve to its task
+        self.running = {}
+        self.lock = threading.Lock()
+        self.counters = {"solves": 0, "expired": 0, "killed": 0, "cancelled": 0, "errors": 0}
+        self.closed = False
+        self.threads = [threading.Thread(target=self.dispatch, args=(worker,), daemon=True) for worker in self.workers]
+        for thread in self.threads:
+            thread.start()
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the solver time limit of a solve with the given seconds left before its deadline
+    def set_time_limit(self, remaining: float, time_limit: typing.Optional[float]) -> float:
+        limit = remaining - self.grace if remaining - self.grace >= remaining / 2 else remaining / 2
+        return min(limit, time_limit) if time_limit != None else limit
+
+    # Returns a dict with the counters of the pool
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counters, pending=len(self.running))
+
+    # --------------
+    # Solve Methods
+    # --------------
+
+    # Queues the solve of a PuLP problem, returning a concurrent.futures.Future of its SolveReport
+    #   - deadline is in seconds from now, and counts the time spent in the queue (if None, it is the time limit of the config plus the grace period, or else the pool's default deadline)
+    #   - Once the solve is done, the problem's status and variable values are set as if it had been solved in this process
+    def submit(self, prob: pulp.LpProblem, config: typing.Optional[sv.SolverConfig] = None, warm_start: bool = False, deadline: typing.Optional[float] = None) -> Future:
+        if self.closed:
+            raise RuntimeError("The solver pool is closed")
+        config = config if config != None else sv.SolverConfig()
+        fields = {"backend": config.backend, "threads": config.threads, "time_limit": config.time_limit, "gap_rel": config.gap_rel, "msg": config.msg}
+        if deadline == None:
+            deadline = config.time_limit + self.grace if config.time_limit != None else self.default_deadline
+        task = SolveTask(prob, fields, warm_start, time.monotonic() + deadline)
+        with self.lock:
+            self.running[task.future] = task
+        task.future.add_done_callback(self.discard)
+        self.tasks.put(task)
+        return task.future
+
+    # Solves a PuLP problem in the pool, returning its SolveReport
+    def solve(self, prob: pulp.LpProblem, config: typing.Optional[sv.SolverConfig] = None, warm_start: bool = False, deadline: typing.Optional[float] = None) -> sv.SolveReport:
+        return self.submit(prob, config, warm_start, deadline).result()
+
+    # Solves a PuLP problem in the pool from asyncio code, where cancelling the awaitable also cancels the solve
+    async def solve_async(self, prob: pulp.LpProblem, config: typing.Optional[sv.SolverConfig] = None, warm_start: bool = False, deadline: typing.Optional[float] = None) -> sv.SolveReport:
+        future = self.submit(prob, config, warm_start, deadline)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self.cancel(future)
+            raise
+
+    # Cancels a solve, killing its worker if it is already running
+    def cancel(self, future: Future):
+        with self.lock:
+            task = self.running.get(future)
+        if task != None and not future.cancel():
+            task.cancelled = True
+
+    # Removes a finished solve from the running solves
+    def discard(self, future: Future):
+        with self.lock:
+            self.running.pop(future, None)
+
+    # ----------------
+    # Worker Methods
+    # ----------------
+
+    # Sends the queued solves to a worker, one at a time, until the pool is closed
+    def dispatch(self, worker: PoolWorker):
+        while True:
+            task = self.tasks.get()
+            if task == None:
+                return
+            if not task.future.set_running_or_notify_cancel():
+                with self.lock:
+                    self.counters["cancelled"] += 1
+                continue
+            try:
+                self.run_task(worker, task)
+            except Exception as error:
+                # A worker that cannot be reached is replaced, so that the next solve gets a working one
+                worker.restart()
+                self.finish(task, error=error)
+
+    # Runs a solve on a worker, returning once it is done, cancelled or past its deadline
+    def run_task(self, worker: PoolWorker, task: SolveTask):
+        start = time.monotonic()
+        remaining = task.expires_at - start
+        if remaining <= 0:
+            self.finish(task, report=self.set_unsolved(task, 0.0), counter="expired")
+            return
+        fields = dict(task.fields, time_limit=self.set_time_limit(remaining, task.fields["time_limit"]))
+        worker.connection.send((task.prob.to_dict(), fields, task.warm_start))
+        while True:
+            if task.cancelled:
+                worker.restart()
+                self.finish(task, error=CancelledError(), counter="cancelled")
+                return
+            wait = min(task.expires_at - time.monotonic(), POLL_INTERVAL)
+            if wait <= 0:
+                worker.restart()
+                self.finish(task, report=self.set_unsolved(task, time.monotonic() - start), counter="killed")
+                return
+            if worker.connection.poll(wait):
+                kind, payload = worker.connection.recv()
+                if kind == "error":
+                    self.finish(task, error=RuntimeError(payload), counter="errors")
+                    return
+                self.finish(task, report=self.set_solved(task, payload))
+                return
+
+    # Writes the result of a worker into the caller's problem, returning its SolveReport
+    def set_solved(self, task: SolveTask, result: dict) -> sv.SolveReport:
+        task.prob.status = result["status"]
+        task.prob.sol_status = result["sol_status"]
+        for variable in task.prob.variables():
+            variable.varValue = result["values"].get(variable.name)
+        return sv.SolveReport(**result["report"])
+
+    # Marks the caller's problem as not solved, returning its SolveReport
+    def set_unsolved(self, task: SolveTask, wall_time: float) -> sv.SolveReport:
+        task.prob.status = pulp.LpStatusNotSolved
+        task.prob.sol_status = pulp.LpSolutionNoSolutionFound
+        return sv.SolveReport(task.fields["backend"], pulp.LpStatus[task.prob.status], pulp.LpSolution[task.prob.sol_status], wall_time, None)
+
+    # Completes the future of a solve with its report or error, counting it
+    def finish(self, task: SolveTask, report: typing.Optional[sv.SolveReport] = None, error: typing.Optional[BaseException] = None, counter: str = "solves"):
+        with self.lock:
+            self.counters[counter] += 1
+        if error != None:
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(report)
+
+    # Stops the dispatching threads and the worker processes (a running solve is killed)
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        with self.lock:
+            tasks = list(self.running.values())
+        for task in tasks:
+            task.cancelled = True
+            task.future.cancel()
+        for _ in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+        for worker in self.workers:
+            worker.stop()
+
+    def __enter__(self) -> "SolverPool":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"SolverPool(workers={len(self.workers)}, default_deadline={self.default_deadline}, grace={self.grace})"
@@ -0,0 +1,175 @@
+from __future__ import annotations
+import threading
+import time
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import instrumentation as it
+pulp = li.lazy_import("pulp")
+
+'''
+This file considers which solver the PuLP problems are sent to, and how long the solver may take.
+- "cbc" is PuLP's bundled CBC executable, which runs as a subprocess and exchanges the model through temporary files
+- "highs" is HiGHS through highspy, which runs in the current process with no subprocess or temporary file I/O
+- Both backends accept a thread count, a time limit (in seconds) and a relative MIP gap, so large dynamic models can trade proven optimality for bounded latency
+- Every solve returns a SolveReport with the solver status, wall time and optimality gap (and, for HiGHS, the simplex iterations and branch and bound nodes)
+    - CBC only reports its final bound in its log, so the log of a CBC solve is written to a temporary file and read back (with msg=True the log goes to the console, and the gap is only known for a proven optimal solution)
+- A config with a SolverPool (see solver_pool.py) sends the solve to a worker process, which bounds its wall clock time
+'''
+
+BACKENDS = ("cbc", "highs")
+
+
+class SolverConfig():
+    def __init__(self, backend: str = "cbc", threads: typing.Optional[int] = None, time_limit: typing.Optional[float] = None, gap_rel: typing.Optional[float] = None, msg: bool = False, pool=None) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown solver backend: {backend}")
+        self.backend = backend
+        self.threads = threads
+        self.time_limit = time_limit
+        self.gap_rel = gap_rel
+        self.msg = msg
+        # A SolverPool to send the solves to, which enforces a wall clock deadline on each of them (solves run in the current process if None)
+        self.pool = pool
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns a bool as to whether the backend can be used in the current environment (HiGHS requires highspy to be installed)
+    def set_available_value(self) -> bool:
+        if self.backend == "highs":
+            return pulp.HiGHS(msg=False).available()
+        return pulp.PULP_CBC_CMD(msg=False).available()
+
+    # Returns the PuLP solver of the backend
+    #   - warm_start passes the current variable values to CBC as an initial solution (HiGHS through PuLP does not accept one, so it is ignored)
+    def set_solver(self, warm_start: bool = False):
+        if self.backend == "highs":
+            if not self.set_available_value():
+                raise RuntimeError("The highs backend requires highspy (pip install highspy)")
+            return pulp.HiGHS(msg=self.msg, threads=self.threads, timeLimit=self.time_limit, gapRel=self.gap_rel)
+        return pulp.PULP_CBC_CMD(msg=self.msg, threads=self.threads, timeLimit=self.time_limit, gapRel=self.gap_rel, warmStart=warm_start)
+
+    def __repr__(self) -> str:
+        return f"SolverConfig(backend={self.backend!r}, threads={self.threads}, time_limit={self.time_limit}, gap_rel={self.gap_rel})"
+
+
+class SolveReport():
+    def __init__(self, backend: str, status: str, sol_status: str, wall_time: float, gap: typing.Optional[float], iterations: typing.Optional[int] = None, nodes: typing.Optional[int] = None) -> None:
+        self.backend = backend
+        # PuLP status of the problem (e.g., "Optimal", "Infeasible"); a solver stopped by its time limit with a solution also reports "Optimal"
+        self.status = status
+        # PuLP status of the solution, which tells a proven optimal solution ("Optimal Solution Found") apart from a feasible one ("Solution Found")
+        self.sol_status = sol_status
+        self.wall_time = wall_time
+        # Relative optimality gap of the solution, or None if the backend does not report one
+        self.gap = gap
+        # Simplex iterations and branch and bound nodes of the solve, or None if the backend does not report them (CBC through PuLP does not)
+        self.iterations = iterations
+        self.nodes = nodes
+
+    # Returns a bool as to whether the solution was proven optimal (i.e., not cut short by a time limit)
+    def set_proven_value(self) -> bool:
+        return self.sol_status == pulp.LpSolution[pulp.LpSolutionOptimal]
+
+    def __repr__(self) -> str:
+        return f"SolveReport(backend={self.backend!r}, status={self.status!r}, sol_status={self.sol_status!r}, wall_time={self.wall_time:.4f}, gap={self.gap})"
+
+
+# Returns the relative optimality gap of a CBC solve from its log, or None if the log has no solution or no bound
+#   - A proven optimal solution has no gap, and a solution found within the gap tolerance or cut short by the time limit has its final bound in the log
+#   - The gap is taken with respect to the objective of the solution, like the MIP gap of HiGHS
+def read_cbc_gap(log: str) -> typing.Optional[float]:
+    values = {}
+    for line in log.splitlines():
+        label, _, value = line.partition(":")
+        if label in ("Objective value", "Upper bound", "Lower bound"):
+            try:
+                values[label] = float(value)
+            except ValueError:
+                continue
+    objective = values.get("Objective value")
+    bound = values.get("Upper bound", values.get("Lower bound"))
+    if objective == None:
+        return None
+    if bound == None:
+        return 0.0 if "Result - Optimal solution found" in log else None
+    if objective == 0:
+        return 0.0 if bound == 0 else None
+    return abs(bound - objective) / abs(objective)
+
+
+# Solves a PuLP problem with the given configuration (the default CBC configuration if None), returning a SolveReport
+@it.instrumented("solve")
+def solve(prob: pulp.LpProblem, config: typing.Optional[SolverConfig] = None, warm_start: bool = False) -> SolveReport:
+    config = config if config != None else SolverConfig()
+    if config.pool != None:
+        report = config.pool.solve(prob, config, warm_start)
+        it.annotate(backend=report.backend, status=report.status, sol_status=report.sol_status, gap=report.gap, iterations=report.iterations, nodes=report.nodes, pool=True)
+        return report
+    solver = config.set_solver(warm_start)
+    log_path = None
+    if config.backend == "cbc" and not config.msg:
+        log_path = next(solver.create_tmp_files(prob.name, "log"))
+        solver.optionsDict["logPath"] = log_path
+    start = time.perf_counter()
+    try:
+        prob.solve(solver)
+        wall_time = time.perf_counter() - start
+        log = None
+        if log_path != None and os.path.exists(log_path):
+            with open(log_path) as file:
+                log = file.read()
+    finally:
+        if log_path != None:
+            solver.delete_tmp_files(log_path)
+
+    gap = None
+    iterations = None
+    nodes = None
+    if config.backend == "highs" and getattr(prob, "solverModel", None) != None:
+        info = prob.solverModel.getInfo()
+        iterations = int(info.simplex_iteration_count)
+        nodes = int(info.mip_node_count)
+    if config.backend == "highs" and prob.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+        gap = float(prob.solverModel.getInfo().mip_gap)
+        # A pure LP (or a MIP solved at the root) has no MIP gap to report
+        if not gap < float("inf"):
+            gap = 0.0
+    elif config.backend == "cbc" and prob.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+        if log != None:
+            gap = read_cbc_gap(log)
+        elif prob.sol_status == pulp.LpSolutionOptimal and config.gap_rel == None:
+            # Without the log, only a solution proven optimal with no gap tolerance is known to have no gap
+            gap = 0.0
+    report = SolveReport(config.backend, pulp.LpStatus[prob.status], pulp.LpSolution[prob.sol_status], wall_time, gap, iterations, nodes)
+    it.annotate(backend=report.backend, status=report.status, sol_status=report.sol_status, gap=gap, iterations=iterations, nodes=nodes)
+    return report
+
+# Backends already prewarmed in the current process
+prewarmed = set()
+prewarm_lock = threading.Lock()
+
+# Imports PuLP, finds the solver of the backend and runs a trivial solve, returning the seconds it took (0 if the backend was already prewarmed in this process)
+#   - Meant to be called once at startup (e.g., in a background thread of the app, or in a worker's initializer), so that the first real solve does not pay for any of it
+#   - Raises a RuntimeError if the solver of the backend cannot be found
+def prewarm(config: typing.Optional[SolverConfig] = None) -> float:
+    config = config if config != None else SolverConfig()
+    with prewarm_lock:
+        if config.backend in prewarmed:
+            return 0.0
+        start = time.perf_counter()
+        if not config.set_available_value():
+            raise RuntimeError(f"The solver of the {config.backend} backend was not found")
+        prob = pulp.LpProblem("prewarm", pulp.LpMaximize)
+        x = pulp.LpVariable("x", lowBound=0, upBound=1, cat=pulp.LpInteger)
+        prob += x
+        prob += x <= 1
+        solve(prob, SolverConfig(backend=config.backend))
+        prewarmed.add(config.backend)
+        return time.perf_counter() - start
@@ -0,0 +1,86 @@
+from __future__ import annotations
+import copy
+import typing
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import user_preferences as up
+from optimization import persistent_model as pm
+np = li.lazy_import("numpy")
+
+'''
+This file considers solving the constant times optimization problems for a whole range of max times (or min total rides) at once, e.g., for "what if I had another hour?".
+- With integer wait times, a single knapsack DP table gives the optimal value of every max time up to the largest one (see BoundedKnapsack.sweep_capacities)
+- Otherwise, a persistent model is solved once per value, where each solve only changes the right hand side of one constraint and warm starts from the previous solution
+    - Max times are solved from the smallest to the largest, and min total rides from the largest to the smallest, so that the previous solution stays feasible
+'''
+
+
+class SweepResult():
+    def __init__(self, parameter: str, values: list, objectives: list, plans: typing.Optional[list], method: str) -> None:
+        # The swept preference ("max_time" or "min_total_rides") and its values, in the order they were given
+        self.parameter = parameter
+        self.values = values
+        # The optimal number of rides (max time sweep) or total time (min total rides sweep) at each value, None where no feasible solution exists
+        self.objectives = objectives
+        # The optimal solution at each value, or None if the plans were not asked for
+        self.plans = plans
+        # How the sweep was computed ("dp" or "pulp")
+        self.method = method
+
+    # Returns a dict where the keys are the swept values, and the values are the optimal objective values (i.e., the trade-off curve)
+    def to_dict(self) -> dict:
+        return dict(zip(self.values, self.objectives))
+
+    def __repr__(self) -> str:
+        return f"SweepResult(parameter={self.parameter!r}, points={len(self.values)}, method={self.method!r})"
+
+
+# Returns the total time of a feasible solution with at least total rides: each required ride once, the shortest rides until the min distinct rides are reached, then the shortest rides up to their max ride repeats
+#   - Returns None if no such solution exists
+def set_time_bound(ride_weights: dict, user_preferences: up.UserPreferences, total: int) -> typing.Optional[float]:
+    rides = sorted((ride for ride in ride_weights.keys() if ride not in (user_preferences.avoid_rides or [])), key=lambda ride: ride_weights[ride])
+    limit = user_preferences.max_ride_repeats if user_preferences.max_ride_repeats != None else max(total, 1)
+    counts = {ride: 0 for ride in rides}
+    for ride in user_preferences.required_rides or []:
+        if ride not in counts:
+            return None
+        counts[ride] = 1
+    for ride in rides:
+        if sum(1 for count in counts.values() if count > 0) >= (user_preferences.min_distinct_rides or 0):
+            break
+        counts[ride] = max(counts[ride], 1)
+    if sum(1 for count in counts.values() if count > 0) < (user_preferences.min_distinct_rides or 0):
+        return None
+    for ride in rides:
+        missing = total - sum(counts.values())
+        if missing <= 0:
+            break
+        counts[ride] += min(missing, limit - counts[ride])
+    if sum(counts.values()) < total or any(count > limit for count in counts.values()):
+        return None
+    return float(sum(count * ride_weights[ride] for ride, count in counts.items()))
+
+# Solves a persistent model once per value of a preference, warm starting each solve from the previous solution, and returns a SweepResult
+#   - optimizer is an OptimizeConstant, whose user preferences give every other preference
+def sweep_persistent(optimizer, parameter: str, values: list, ride_weights: dict, plans: bool = False) -> SweepResult:
+    objective = "maximize" if parameter == "max_time" else "minimize"
+    model = pm.PersistentModel(optimizer.all_rides, objective, solver_config=optimizer.solver_config)
+    # The previous solution is only a valid warm start if it stays feasible, so the max times go up and the min total rides go down
+    order = sorted(range(len(values)), key=lambda index: values[index], reverse=objective == "minimize")
+    objectives = [None] * len(values)
+    solutions = [None] * len(values)
+    for index in order:
+        user_preferences = copy.copy(optimizer.user_preferences)
+        setattr(user_preferences, parameter, values[index])
+        solution = model.solve(ride_weights, user_preferences)
+        if solution != None:
+            solutions[index] = solution
+            if objective == "maximize":
+                objectives[index] = float(np.round(sum(solution.values())))
+            else:
+                objectives[index] = float(sum(value * ride_weights[ride] for ride, value in solution.items()))
+    return SweepResult(parameter, list(values), objectives, solutions if plans else None, "pulp")
@@ -40,3 +40,12 @@ class UserPreferences():
                 return True
             else:
                 return False
+
+    # Returns a hashable key that is the same for any two user preferences that lead to the same constraints
+    #   - Empty required/avoid rides and a min distinct rides of 0 are treated as None, and the order (and duplicates) of the required/avoid rides do not matter
+    #   - A max ride repeats of 0 allows no rides at all, so unlike convert_empty_data_types, it is kept apart from None (no limit)
+    def canonical_key(self) -> tuple:
+        required_rides = tuple(sorted(set(self.required_rides), key=str)) if self.required_rides else None
+        avoid_rides = tuple(sorted(set(self.avoid_rides), key=str)) if self.avoid_rides else None
+        min_distinct_rides = self.min_distinct_rides if self.min_distinct_rides else None
+        return (required_rides, avoid_rides, min_distinct_rides, self.max_ride_repeats, self.max_time, self.min_total_rides)
@@ -0,0 +1,247 @@
+from __future__ import annotations
+import atexit
+import datetime
+import functools
+import os
+import threading
+import time
+import typing
+import urllib.parse
+import uuid
+import weakref
+import sys
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if __package__ != "optimization":
+    sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import weight_matrix as wm
+np = li.lazy_import("numpy")
+pa = li.lazy_import("pyarrow")
+pc = li.lazy_import("pyarrow.compute")
+ds = li.lazy_import("pyarrow.dataset")
+pq = li.lazy_import("pyarrow.parquet")
+
+'''
+This file considers recording every fetched park snapshot, so that the dynamic optimization problems can use real wait times for each time step.
+- Each snapshot becomes (timestamp, ride, active, wait time) rows, which are buffered and appended to Parquet files partitioned by park and date
+    - A park's buffer is written once it has flush_rows rows or its oldest row is flush_interval seconds old, and every store still open flushes when the interpreter exits
+    - The app records about 60 rows per park every hour, far from flush_rows, so its park data service also flushes after each batch of fetches, and compact merges the small files this leaves
+- Ride names are dictionary-encoded, timestamps are delta-encoded and every file is compressed, so months of minute-level history take megabytes
+- Range queries only read the partitions of the requested park and dates, and return a rides x time steps WeightMatrix ready for OptimizeDynamic
+'''
+
+# Returns the schema of the stored rows, which is built on first use so that importing this file does not import pyarrow
+@functools.lru_cache(maxsize=None)
+def schema() -> pa.Schema:
+    return pa.schema([
+        ("timestamp", pa.int64()),
+        ("ride", pa.dictionary(pa.int32(), pa.string())),
+        ("active", pa.bool_()),
+        ("wait_time", pa.int16()),
+    ])
+
+
+# The stores still open, which are flushed when the interpreter exits, and whether that exit handler is registered
+open_stores = weakref.WeakSet()
+exit_flush = {"registered": False}
+exit_flush_lock = threading.Lock()
+
+# Flushes every store still open, so that a restart does not lose the buffered rows
+def flush_open_stores():
+    for store in list(open_stores):
+        try:
+            store.flush()
+        except OSError:
+            continue
+
+# Registers flush_open_stores once the first rows are buffered
+#   - Nothing can be imported at exit, so an empty table goes through the steps of a flush first (pyarrow also imports pandas on its first table)
+#   - atexit runs the latest handlers first, so the flush also runs before the exit handlers of pyarrow
+def register_exit_flush():
+    with exit_flush_lock:
+        if exit_flush["registered"]:
+            return
+        table = schema().empty_table()
+        pc.unique(pc.strftime(pc.cast(table.column("timestamp"), pa.timestamp("s", tz="UTC")), format="%Y-%m-%d"))
+        pq.write_table(table, pa.BufferOutputStream(), compression="zstd")
+        atexit.register(flush_open_stores)
+        exit_flush["registered"] = True
+
+
+class WaitTimeStore():
+    def __init__(self, directory: str, flush_rows: int = 5_000, flush_interval: typing.Optional[float] = 600, flush_at_exit: bool = True) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Rows are written once this many are buffered for a park, or once the oldest buffered row of the park is flush_interval seconds old (None only flushes on size), or on flush
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        # Buffered rows of each park, as {park: {column: list}}, and the time.monotonic() at which each buffer was started
+        self.buffers = {}
+        self.buffered_at = {}
+        # Unix timestamp of the latest snapshot of each park, which identifies the history a forecast was fitted on
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.flush_at_exit = flush_at_exit
+        if flush_at_exit:
+            open_stores.add(self)
+
+    # --------------
+    # Setter Methods
+    # --------------
+
+    # Returns the directory of the partition of a park and date
+    def set_partition(self, park: str, date: str) -> str:
+        return os.path.join(self.directory, f"park={urllib.parse.quote(park, safe='')}", f"date={date}")
+
+    # Returns the Unix timestamp of the latest snapshot of a park (None if it has no history), reading the newest date partition once if the park was not recorded by this process
+    def set_latest(self, park: str) -> typing.Optional[int]:
+        if park not in self.latest:
+            park_directory = os.path.dirname(self.set_partition(park, ""))
+            dates = sorted(os.listdir(park_directory)) if os.path.isdir(park_directory) else []
+            if dates:
+                files = [os.path.join(park_directory, dates[-1], name) for name in os.listdir(os.path.join(park_directory, dates[-1])) if name.endswith(".parquet")]
+                timestamps = ds.dataset(files, schema=schema(), format="parquet").to_table(columns=["timestamp"]).column("timestamp")
+                if len(timestamps) > 0:
+                    with self.lock:
+                        self.latest.setdefault(park, pc.max(timestamps).as_py())
+        return self.latest.get(park)
+
+    # Returns a table of the buffered rows of a park
+    def set_buffer_table(self, park: str) -> pa.Table:
+        buffer = self.buffers.get(park)
+        if buffer == None:
+            return schema().empty_table()
+        return pa.table({
+            "timestamp": pa.array(buffer["timestamp"], pa.int64()),
+            "ride": pa.array(buffer["ride"], pa.string()).dictionary_encode(),
+            "active": pa.array(buffer["active"], pa.bool_()),
+            "wait_time": pa.array(buffer["wait_time"], pa.int16()),
+        }, schema=schema())
+
+    # ---------------
+    # Writing Methods
+    # ---------------
+
+    # Appends a snapshot of a park (a list of {"name", "active", "waitTime"} dicts, as returned by the park data API), taken at a Unix timestamp (now if None)
+    def record(self, park: str, snapshot: list, timestamp: typing.Optional[float] = None):
+        timestamp = int(time.time() if timestamp == None else timestamp)
+        if self.flush_at_exit and not exit_flush["registered"]:
+            register_exit_flush()
+        with self.lock:
+            if park not in self.buffers:
+                self.buffers[park] = {"timestamp": [], "ride": [], "active": [], "wait_time": []}
+                self.buffered_at[park] = time.monotonic()
+            buffer = self.buffers[park]
+            for item in snapshot:
+                buffer["timestamp"].append(timestamp)
+                buffer["ride"].append(item["name"])
+                buffer["active"].append(bool(item["active"]))
+                buffer["wait_time"].append(item["waitTime"])
+            full = len(buffer["timestamp"]) >= self.flush_rows
+            if self.flush_interval != None and time.monotonic() - self.buffered_at[park] >= self.flush_interval:
+                full = True
+            self.latest[park] = max(timestamp, self.latest.get(park, timestamp))
+        if full:
+            self.flush(park)
+
+    # Writes the buffered rows of a park (or of every park if None) to one new file per date
+    def flush(self, park: typing.Optional[str] = None):
+        with self.lock:
+            parks = [park] if park != None else list(self.buffers.keys())
+            tables = {name: self.set_buffer_table(name) for name in parks if name in self.buffers}
+            for name in tables:
+                del self.buffers[name]
+                self.buffered_at.pop(name, None)
+        for name, table in tables.items():
+            dates = pc.strftime(pc.cast(table.column("timestamp"), pa.timestamp("s", tz="UTC")), format="%Y-%m-%d")
+            for date in pc.unique(dates).to_pylist():
+                self.write(self.set_partition(name, date), table.filter(pc.equal(dates, date)))
+
+    # Writes a table to a new file in a partition, through a temporary file so that readers never see a partial file
+    def write(self, partition: str, table: pa.Table):
+        os.makedirs(partition, exist_ok=True)
+        table = table.sort_by([("timestamp", "ascending")])
+        file_path = os.path.join(partition, f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet")
+        temporary_path = f"{file_path}.{os.getpid()}.tmp"
+        pq.write_table(table, temporary_path, compression="zstd", use_dictionary=["ride"], column_encoding={"timestamp": "DELTA_BINARY_PACKED", "wait_time": "DELTA_BINARY_PACKED", "active": "RLE"})
+        os.replace(temporary_path, file_path)
+
+    # Merges the files of every partition of a park into one file per date, which keeps range queries fast as the history grows
+    def compact(self, park: str):
+        self.flush(park)
+        park_directory = os.path.dirname(self.set_partition(park, ""))
+        if not os.path.isdir(park_directory):
+            return
+        for date_directory in sorted(os.listdir(park_directory)):
+            partition = os.path.join(park_directory, date_directory)
+            files = sorted(name for name in os.listdir(partition) if name.endswith(".parquet"))
+            if len(files) <= 1:
+                continue
+            table = pa.concat_tables([pq.read_table(os.path.join(partition, name), schema=schema()) for name in files]).unify_dictionaries()
+            self.write(partition, table)
+            for name in files:
+                os.remove(os.path.join(partition, name))
+
+    # ---------------
+    # Reading Methods
+    # ---------------
+
+    # Returns every row of a park between two Unix timestamps (start included, end excluded), including the rows that are still buffered
+    def read(self, park: str, start: float, end: float) -> pa.Table:
+        tables = []
+        park_directory = os.path.dirname(self.set_partition(park, ""))
+        if os.path.isdir(park_directory):
+            # Only the date partitions that overlap the range are opened
+            first = datetime.datetime.fromtimestamp(start, datetime.timezone.utc).strftime("%Y-%m-%d")
+            last = datetime.datetime.fromtimestamp(end, datetime.timezone.utc).strftime("%Y-%m-%d")
+            files = [os.path.join(park_directory, date_directory, name) for date_directory in sorted(os.listdir(park_directory)) if first <= date_directory[len("date="):] <= last for name in os.listdir(os.path.join(park_directory, date_directory)) if name.endswith(".parquet")]
+            if files:
+                dataset = ds.dataset(files, schema=schema(), format="parquet")
+                tables.append(dataset.to_table(filter=(ds.field("timestamp") >= int(start)) & (ds.field("timestamp") < int(end))))
+        with self.lock:
+            buffer = self.set_buffer_table(park)
+        tables.append(buffer.filter(pc.and_(pc.greater_equal(buffer.column("timestamp"), int(start)), pc.less(buffer.column("timestamp"), int(end)))))
+        return pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+
+    # Returns a rides x time steps WeightMatrix of the average wait time of every ride in each time step of frequency minutes, starting at a Unix timestamp
+    #   - Only the rides that were active at some point of the range are included (or the given rides, in the given order)
+    #   - A time step with no active observation of a ride takes the wait time of the closest earlier time step (or the closest later one, or 0 if there is none)
+    def query(self, park: str, start: float, time_steps: int, frequency: int, rides: typing.Optional[list] = None) -> wm.WeightMatrix:
+        step = int(frequency) * 60
+        table = self.read(park, start, start + time_steps * step)
+        table = table.filter(pc.and_(table.column("active"), pc.is_valid(table.column("wait_time"))))
+
+        ride_column = table.column("ride")
+        dictionary = ride_column.chunk(0).dictionary.to_pylist() if ride_column.num_chunks > 0 else []
+        codes = ride_column.chunk(0).indices.to_numpy(zero_copy_only=False) if ride_column.num_chunks > 0 else np.zeros(0, dtype=np.int32)
+        if rides == None:
+            present = np.flatnonzero(np.bincount(codes, minlength=len(dictionary)))
+            rides = sorted(dictionary[code] for code in present)
+        index = {ride: i for i, ride in enumerate(rides)}
+        # Map the dictionary codes of the file to the rows of the matrix (-1 for rides that were not asked for)
+        rows_of_codes = np.array([index.get(name, -1) for name in dictionary], dtype=np.int64)
+        rows = rows_of_codes[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+        columns = (table.column("timestamp").to_numpy() - int(start)) // step
+        waits = table.column("wait_time").to_numpy().astype(float)
+        keep = rows >= 0
+
+        # Sum and count the observations of each (ride, time step) cell in one pass over the flattened matrix
+        cells = rows[keep] * time_steps + columns[keep]
+        sums = np.bincount(cells, weights=waits[keep], minlength=len(rides) * time_steps).reshape(len(rides), time_steps)
+        counts = np.bincount(cells, minlength=len(rides) * time_steps).reshape(len(rides), time_steps)
+        values = np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts > 0)
+        return wm.WeightMatrix(rides, fill_missing(values))
+
+
+# Fills the missing (NaN) time steps of each row with the closest earlier value, then the closest later value, then 0
+def fill_missing(values: np.ndarray) -> np.ndarray:
+    values = values.copy()
+    time_steps = values.shape[1]
+    columns = np.arange(time_steps)
+    # Forward fill: the index of the last observed column at or before each column
+    last = np.maximum.accumulate(np.where(np.isnan(values), -1, columns), axis=1)
+    values = np.where(last >= 0, np.take_along_axis(values, np.maximum(last, 0), axis=1), np.nan)
+    # Backward fill: the index of the first observed column at or after each column
+    following = np.minimum.accumulate(np.where(np.isnan(values), time_steps, columns)[:, ::-1], axis=1)[:, ::-1]
+    values = np.where(following < time_steps, np.take_along_axis(values, np.minimum(following, time_steps - 1), axis=1), np.nan)
+    return np.nan_to_num(values, nan=0.0)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from optimization import lazy_imports as li
+np = li.lazy_import("numpy")
+
+'''
+This file considers the ride weights of the dynamic optimization problems as a single rides x time steps matrix.
+- Rows are indexed by ride name, and columns by time step (starting at 1, like the time steps of the optimization problems)
+- It also behaves like the {ride: [weight at each time step]} dict it replaces, so existing callers keep working
+'''
+
+class WeightMatrix(Mapping):
+    axes = ("rides", "time_steps")
+
+    def __init__(self, rides: list, values) -> None:
+        self.rides = list(rides)
+        self.matrix = np.asarray(values)
+        if self.matrix.ndim != 2 or self.matrix.shape[0] != len(self.rides):
+            raise ValueError(f"Expected a matrix with {len(self.rides)} rows, got shape {self.matrix.shape}")
+        self.time_steps = self.matrix.shape[1]
+        self.index = {ride: i for i, ride in enumerate(self.rides)}
+
+    # Returns a WeightMatrix from a dict where the keys are time steps, and the values are lists of the wait times of every ride at that time step
+    @classmethod
+    def from_wait_times(cls, all_rides: list, wait_times: dict, time_steps: int):
+        return cls(all_rides, np.array([wait_times.get(j) for j in range(1, time_steps+1)]).reshape(time_steps, len(all_rides)).T)
+
+    # Returns a WeightMatrix from a dict where the keys are ride names, and the values are lists of the weight of the ride at each time step
+    @classmethod
+    def from_dict(cls, ride_weights: dict):
+        if isinstance(ride_weights, WeightMatrix):
+            return ride_weights
+        rides = list(ride_weights.keys())
+        return cls(rides, np.array([ride_weights[ride] for ride in rides]).reshape(len(rides), -1))
+
+    # --------------
+    # Slice Methods
+    # --------------
+
+    # Returns the weights of a ride at every time step
+    def row(self, ride) -> np.ndarray:
+        return self.matrix[self.index[ride]]
+
+    # Returns the weights of every ride at a time step (starting at 1)
+    def column(self, time_step: int) -> np.ndarray:
+        return self.matrix[:, time_step-1]
+
+    # Returns a dict where the keys are time steps, and the values are lists of the weights of every ride at that time step (the wait_times of OptimizeDynamic)
+    def to_wait_times(self) -> dict:
+        return {time_step: self.column(time_step).tolist() for time_step in range(1, self.time_steps+1)}
+
+    # Returns the weights in the same (ride, time step) order as the variables of the dynamic optimization problems
+    def flatten(self) -> np.ndarray:
+        return self.matrix.ravel()
+
+    # ---------------
+    # Mapping Methods
+    # ---------------
+
+    def __getitem__(self, ride) -> list:
+        return self.row(ride).tolist()
+
+    def __iter__(self):
+        return iter(self.rides)
+
+    def __len__(self) -> int:
+        return len(self.rides)
+
+    def __repr__(self) -> str:
+        return f"WeightMatrix(rides={len(self.rides)}, time_steps={self.time_steps})"
@@ -1,17 +1,50 @@
 import streamlit as st
-import requests
+import threading
+import sys
+import os
 
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(path)
+from optimization import park_service as ps
+from optimization import wait_time_store as ws
+from optimization import forecast as fc
+from optimization import solvers as sv
 import demo_constant
 import demo_dynamic
 import park_data
 import parks
 import instructions
 
-# Caching the data for 3600 seconds to avoid spamming api requests
-@st.cache_data(ttl=3600)
-def api_request(url):
-    url_request = requests.get(url)
-    return url_request.json()
+# One wait time history shared by every session, which records every fetched snapshot
+@st.cache_resource
+def wait_time_store():
+    return ws.WaitTimeStore(os.environ.get("WAIT_TIME_DIRECTORY", os.path.join(path, "wait_times")))
+
+# One park data service shared by every session, which fetches all the parks concurrently and refreshes them in the background every 3600 seconds
+@st.cache_resource
+def park_service():
+    service = ps.ParkDataService(ttl=3600, store=wait_time_store())
+    service.start()
+    return service
+
+# Forecasters shared by every session, which are only refitted once a park has a new snapshot
+@st.cache_resource
+def forecast_cache():
+    return fc.ForecastCache()
+
+# Imports PuLP and runs a trivial solve once per server process, in the background so that the first page is not held up by it
+@st.cache_resource
+def prewarm_solver():
+    thread = threading.Thread(target=sv.prewarm, daemon=True)
+    thread.start()
+    return thread
+
+def api_request(park):
+    return park_service().get(park)
+
+# Returns the function that forecasts the future wait times of a park from its recorded history
+def park_forecast(park):
+    return lambda rides, time_steps, frequency: forecast_cache().wait_times(wait_time_store(), park, time_steps, frequency, rides)
 
 def define_park():
     park = st.sidebar.selectbox(label="Park", options=("Demo", "Disneyland Resort Magic Kingdom", "Disneyland Resort California Adventure", "Universal Studios"), help="Select which data to use")
@@ -30,26 +63,27 @@ def define_park():
 #     return 'Constant'
 
 def main():
+    prewarm_solver()
     instructions.guide()
     park = define_park()
     time_assumption = 'Constant'
     if park == "Demo":
             demo_constant.main()
     elif park == "Disneyland Resort Magic Kingdom":
-        rides = api_request("https://api.themeparks.wiki/preview/parks/DisneylandResortMagicKingdom/waittime")
+        rides = api_request("Disneyland Resort Magic Kingdom")
         disney_kingdom = park_data.ParkData(rides)
-        p = parks.OptimizePark(park, disney_kingdom.filter_for_active_rides(), time_assumption)
+        p = parks.OptimizePark(park, disney_kingdom.filter_for_active_rides(), time_assumption, park_forecast(park))
         p.main()
     elif park == "Disneyland Resort California Adventure":
-        rides = api_request("https://api.themeparks.wiki/preview/parks/DisneylandResortCaliforniaAdventure/waittime")
+        rides = api_request("Disneyland Resort California Adventure")
         california_adventure = park_data.ParkData(rides)
-        p = parks.OptimizePark(park, california_adventure.filter_for_active_rides(), time_assumption)
+        p = parks.OptimizePark(park, california_adventure.filter_for_active_rides(), time_assumption, park_forecast(park))
         p.main()
 
     elif park == "Universal Studios":
-        rides = api_request("https://api.themeparks.wiki/preview/parks/UniversalStudios/waittime")
+        rides = api_request("Universal Studios")
         universal_studios = park_data.ParkData(rides)
-        p = parks.OptimizePark(park, universal_studios.filter_for_active_rides(), time_assumption)
+        p = parks.OptimizePark(park, universal_studios.filter_for_active_rides(), time_assumption, park_forecast(park))
         p.main()
 
 main()
@@ -1,16 +1,17 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 import random
 
 import sys
 import os
 path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(path)
+from optimization import lazy_imports as li
 from optimization import user_preferences as up
 from optimization import constant_times as ct
 import helper
+np = li.lazy_import("numpy")
+pd = li.lazy_import("pandas")
+plt = li.lazy_import("matplotlib.pyplot")
 
 
 def main():
@@ -86,9 +87,6 @@ def random_optional_constraints_data(rides, required_constraints):
         st.session_state.rand_avoid_rides = rand_avoid_rides
     avoid_rides = st.sidebar.multiselect("Avoid Rides",  options=[i for i in rides.Rides], default=st.session_state.rand_avoid_rides, help="Which rides would you like to avoid entirely?")
 
-    # Prevent user from requiring and avoiding the same ride(s)
-    helper.require_avoid_contradiction(required_rides, avoid_rides)
-
     # The rand_min_distinct_rides should not be larger than either (# of rides - # of avoided rides) or the min total rides (in the case of a minimization problem)
     if required_constraints[1] != None:
         rand_min_distinct_rides = random.randint(0, min(len(rides.Rides) - len(avoid_rides), required_constraints[1]))
@@ -98,22 +96,17 @@ def random_optional_constraints_data(rides, required_constraints):
         st.session_state.rand_min_distinct_rides = rand_min_distinct_rides
     min_distinct_rides_slider = st.sidebar.slider("Minimum Distinct Rides", min_value=1, max_value=len(rides.Rides), value=st.session_state.rand_min_distinct_rides, help="What is the minimum number of distinct rides you'd like to go on?")
 
-    helper.min_distinct_rides_contradiction(min_distinct_rides_slider, len(rides.Rides), len(avoid_rides))
-
     rand_max_ride_repeats = random.randint(1, len(rides.Rides))
     if "rand_max_ride_repeats" not in st.session_state:
         st.session_state.rand_max_ride_repeats = rand_max_ride_repeats
     max_ride_repeats_slider = st.sidebar.slider("Maximum Ride Repeats", min_value=1, value=st.session_state.rand_max_ride_repeats, help="What is the maximum number of times you'd like to ride any single ride?")
 
-    if st.session_state.optimization_problem == "Minimize the total amount of time a user spends waiting in line to go on rides":
-        helper.max_ride_repeats_contradiction(required_constraints[1], max_ride_repeats_slider, len(rides.Rides))
-
     user_preferences=up.UserPreferences(
         required_rides,
         avoid_rides,
         min_distinct_rides_slider,
         max_ride_repeats_slider,
-        {1: required_constraints[0]},
+        required_constraints[0],
         required_constraints[1]
         )
 
@@ -129,6 +122,11 @@ def optimize(rides, user_preferences, result_col2):
 
     ride_weights = optimize_data.set_ride_weights()
 
+    # Explain which preferences conflict instead of solving a request that has no feasible solution
+    objective = "maximize" if st.session_state.optimization_problem == "Maximize the total number of rides a user goes on within a given time frame" else "minimize"
+    if helper.preflight_errors(optimize_data, ride_weights, objective):
+        return
+
     result_col2.markdown("<h2 style='text-align: center;'>Results</h2", unsafe_allow_html=True, help="Watch how changing the inputs to the optimization problem affects the results. If you get an error, try and spot where certain constraints contradict each other")
     if st.session_state.optimization_problem == "Maximize the total number of rides a user goes on within a given time frame":
         results = optimize_data.maximize_rides(ride_weights)
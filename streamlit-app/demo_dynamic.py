@@ -1,7 +1,4 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 from math import floor
 import random
 
@@ -9,9 +6,13 @@ import sys
 import os
 path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(path)
+from optimization import lazy_imports as li
 from optimization import user_preferences as up
 from optimization import dynamic_times as dt
 import helper
+np = li.lazy_import("numpy")
+pd = li.lazy_import("pandas")
+plt = li.lazy_import("matplotlib.pyplot")
 
 def main():
     optimization_problem = st.selectbox("Please choose which optimization problem you'd like to solve", ("Maximize Rides", "Minimize Time"), help="Do you want to maximize the total number of rides to go on, or minimize the total amount of time spent waiting in line?")
@@ -109,9 +110,6 @@ def random_optional_constraints_data(rides_dynamic, required_constraints, granul
         st.session_state.rand_avoid_rides_dynamic = rand_avoid_rides_dynamic
     avoid_rides = st.sidebar.multiselect("Avoid Rides",  options=[i for i in rides_dynamic.Rides], default=st.session_state.rand_avoid_rides_dynamic, help="Which rides would you like to avoid entirely?")
 
-    # Prevent user from requiring and avoiding the same ride(s)
-    helper.require_avoid_contradiction(required_rides, avoid_rides)
-
     # The rand_min_distinct_rides should not be larger than either (# of rides - # of avoided rides) or the min total rides (in the case of a minimization problem)
     if required_constraints[1] != None:
         rand_min_distinct_rides_dynamic = random.randint(0, min(len(rides_dynamic.Rides) - len(avoid_rides), required_constraints[1]))
@@ -121,16 +119,11 @@ def random_optional_constraints_data(rides_dynamic, required_constraints, granul
         st.session_state.rand_min_distinct_rides_dynamic = rand_min_distinct_rides_dynamic
     min_distinct_rides_slider = st.sidebar.slider("Minimum Distinct Rides", min_value=1, max_value=len(rides_dynamic.Rides), value=st.session_state.rand_min_distinct_rides_dynamic, help="What is the minimum number of distinct rides you'd like to go on?")
 
-    helper.min_distinct_rides_contradiction(min_distinct_rides_slider, len(rides_dynamic.Rides), len(avoid_rides))
-
     rand_max_ride_repeats_dynamic = random.randint(1, len(rides_dynamic.Rides))
     if "rand_max_ride_repeats_dynamic" not in st.session_state:
         st.session_state.rand_max_ride_repeats_dynamic = rand_max_ride_repeats_dynamic
     max_ride_repeats_slider = st.sidebar.slider("Maximum Ride Repeats", min_value=1, value=st.session_state.rand_max_ride_repeats_dynamic, help="What is the maximum number of times you'd like to ride any single ride?")
 
-    if st.session_state.optimization_problem == "Minimize Time":
-        helper.max_ride_repeats_contradiction(required_constraints[1], max_ride_repeats_slider, len(rides_dynamic.Rides))
-
     user_preferences=up.UserPreferences(
         required_rides,
         avoid_rides,
@@ -157,11 +150,17 @@ def optimize(granularity, rides_dynamic, user_preferences, result_col2):
         time_steps=granularity[0],
         frequency=granularity[1],
         wait_times=wait_times,
-        user_preferences=user_preferences
+        user_preferences=user_preferences,
+        solver_config=helper.solver_config()
         )
 
     ride_weights = optimize_data.set_ride_weights()
 
+    # Explain which preferences conflict instead of solving a request that has no feasible solution
+    objective = "maximize" if st.session_state.optimization_problem == "Maximize Rides" else "minimize"
+    if helper.preflight_errors(optimize_data, ride_weights, objective):
+        return
+
     result_col2.markdown("<h2 style='text-align: center;'>Results</h2", unsafe_allow_html=True, help="Watch how changing the inputs to the optimization problem affects the results. If you get an error, try and spot where certain constraints contradict each other")
     if st.session_state.optimization_problem == "Maximize Rides":
         results = optimize_data.maximize_rides(ride_weights)
@@ -1,21 +1,127 @@
 import streamlit as st
+import sys
+import os
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(path)
+from optimization import lazy_imports as li
+from optimization import persistent_model as pm
+from optimization import solution_cache as sc
+from optimization import solvers as sv
+from optimization import solver_pool as sp
+from optimization import robustness as rb
+from optimization import robust as rs
+pd = li.lazy_import("pandas")
 
-# -----------------------
-# Contradiction functions
-# -----------------------
-
-def require_avoid_contradiction(required_rides: list, avoid_rides: list):
-    # Prevent user from requiring and avoiding the same ride(s)
-    rides_intersection = list(set(required_rides).intersection(set(avoid_rides)))
-    if rides_intersection != []:
-        st.error(f"Cannot require and avoid the same rides: {rides_intersection}")
-
-def min_distinct_rides_contradiction(num_min_distinct_rides: int, num_all_rides: int, num_avoid_rides: int):
-    # Prevent user from requiring to go on X > (N - A) distinct rides, where N is the total number of distinct rides, and A is the size of the avoid rides list
-    if num_all_rides < num_min_distinct_rides + num_avoid_rides:
-        st.error(f"Cannot go on at least {num_min_distinct_rides} distinct rides while also avoiding {num_avoid_rides} distinct rides, given that there are only {num_all_rides} unique rides in total. Contradiction: {num_all_rides} < {num_min_distinct_rides} + {num_avoid_rides}")
-
-def max_ride_repeats_contradiction(num_min_total_rides, num_max_ride_repeats, num_all_rides):
-    # Prevent user from requiring to go on more total rides than available, given the max ride repeats constraint along with the total number of unique rides to choose from
-    if num_min_total_rides > num_max_ride_repeats * num_all_rides:
-        st.error(f"Cannot go on the at least {num_min_total_rides} total rides given a max ride repeat of {num_max_ride_repeats} along with only {num_all_rides} unique rides to choose from. Contradiction: {num_min_total_rides} * {num_max_ride_repeats} > {num_all_rides}")
+# -------------------
+# Preflight functions
+# -------------------
+
+def preflight_errors(optimizer, ride_weights, objective: str) -> bool:
+    # Show every conflict between the user preferences (found by the same preflight analysis as the optimizers), and return whether any was found
+    if not optimizer.set_contradiction_value(ride_weights, objective):
+        return False
+    for conflict in optimizer.conflicts:
+        st.error(f"{conflict.message}. Conflicting constraints: {', '.join(conflict.constraints)}")
+    return True
+
+
+# ------------------------
+# Persistent model helpers
+# ------------------------
+
+def persistent_model(all_rides: list, objective: str, time_steps=None):
+    # Reuse the same model across reruns of a session, and only rebuild it when the rides or time steps change
+    key = (tuple(all_rides), objective, time_steps)
+    if st.session_state.get("persistent_model_key") != key:
+        st.session_state.persistent_model_key = key
+        st.session_state.persistent_model = pm.PersistentModel(all_rides, objective, time_steps, solver_config=solver_config())
+    return st.session_state.persistent_model
+
+@st.cache_resource
+def solution_cache():
+    # One cache shared by every session, with the same TTL as the cached park data
+    return sc.SolutionCache(ttl=3600)
+
+@st.cache_resource
+def solver_pool():
+    # One pool of solver processes shared by every session, so that a pathological model cannot hold up a session past its deadline
+    return sp.SolverPool(workers=2, default_deadline=60)
+
+def solver_config():
+    # The solves of the app go through the solver pool
+    return sv.SolverConfig(pool=solver_pool())
+
+
+# ---------------
+# Anytime helpers
+# ---------------
+
+def anytime_solve(optimizer, method: str, ride_weights, container, deadline: float = 10):
+    # Show the best plan so far while the anytime solve improves it, and only cache the plan once it is proven optimal
+    #   - method is "maximize_rides" or "minimize_time", and the cached solutions are shared with the usual solves of the method
+    key = solution_cache().set_key(optimizer, method, ride_weights)
+    found, solution = solution_cache().get(key)
+    if found:
+        return solution
+    objective = "maximize" if method == "maximize_rides" else "minimize"
+    unit, relation = ("rides", "at most") if objective == "maximize" else ("minutes", "at least")
+    placeholder = container.empty()
+    result = None
+    for result in optimizer.solve_anytime(ride_weights, objective, deadline):
+        solution, value, bound = result
+        placeholder.info(f"Best plan so far: {value:g} {unit} ({relation} {bound:g} {unit} possible)")
+    placeholder.empty()
+    if result == None:
+        return None
+    if result[1] == result[2]:
+        solution_cache().put(key, result[0])
+    return result[0]
+
+
+# --------------
+# Robust helpers
+# --------------
+
+def robust_solve(optimizer, method: str, confidence: float, container, scenarios: int = 200):
+    # Plan for wait times sampled around the posted ones, where the plan must fit the time in the confidence share of the scenarios (with the cvar method)
+    #   - The solve stops at the default time limit of the robust optimizer, and a plan cut short by it is flagged as not proven optimal
+    weights = rb.RobustnessEvaluator(optimizer.set_ride_weights(), seed=0).sample_weights(scenarios)
+    robust = rs.RobustOptimizer(optimizer, weights, confidence=confidence)
+    solution = getattr(robust, method)()
+    if solution != None and robust.last_report != None and not robust.last_report.set_proven_value():
+        gap = f" (within {robust.last_report.gap:.0%} of the best possible plan)" if robust.last_report.gap != None else ""
+        container.info(f"The solver stopped at its time limit, so this plan is the best found but not proven optimal{gap}.")
+    return solution
+
+
+# -------------
+# Sweep helpers
+# -------------
+
+@st.cache_data(max_entries=64)
+def trade_off_curve(key: str, _optimizer, objective: str, _ride_weights):
+    # Sweep the optimal value over the range of the required constraint slider, cached on the key of the optimizer, weights and preferences (so reruns do not sweep again)
+    #   - The min total rides range is sampled to at most 50 values, since it falls back to one PuLP solve per value when the DP does not apply (e.g., with min distinct rides)
+    if objective == "maximize":
+        sweep = _optimizer.sweep_max_time(range(0, 301, 5), _ride_weights)
+        label = "Optimal number of rides"
+    else:
+        top = 5*len(_optimizer.all_rides)
+        sweep = _optimizer.sweep_min_total_rides(range(0, top+1, max(1, (top + 49) // 50)), _ride_weights)
+        label = "Least total time"
+    return pd.DataFrame({sweep.parameter: sweep.values, label: sweep.objectives}).dropna().set_index(sweep.parameter)
+
+def trade_off_chart(optimizer, objective: str, ride_weights, container):
+    # Chart the optimal value over the whole range of the required constraint slider, which is one sweep instead of one solve per value
+    key = solution_cache().set_key(optimizer, f"sweep_{objective}", ride_weights)
+    container.line_chart(trade_off_curve(key, optimizer, objective, ride_weights))
+
+def robustness_summary(optimizer, solution: dict, container):
+    # Simulate the plan with noisy wait times, time of day drift and ride downtime, and show how often it overruns the max time
+    report = rb.evaluate_plan(optimizer, solution, scenarios=10000)
+    summary = report.summary()
+    rides = summary["ride_count"]
+    text = f"In {summary['scenarios']:,} simulated days, you would go on {rides['p5']:.0f} to {rides['p95']:.0f} rides (90% of days)"
+    if report.budget != None:
+        text += f", and the plan would take longer than the max time on {summary['overrun_probability']:.0%} of days"
+    container.caption(text + ".")
@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import random
 import sys
 import os
@@ -8,17 +7,21 @@ import typing
 path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(path)
 import park_data
+from optimization import lazy_imports as li
 from optimization import user_preferences as up
 from optimization import constant_times as ct
 from optimization import dynamic_times as dt
 import helper
+pd = li.lazy_import("pandas")
 
 
 class OptimizePark():
-    def __init__(self, name: str, active_rides: dict, time_assumption: str) -> None:
+    def __init__(self, name: str, active_rides: dict, time_assumption: str, forecast: typing.Optional[typing.Callable] = None) -> None:
         self.name = name
         self.active_rides = active_rides
         self.time_assumption = time_assumption
+        # A function of (rides, time_steps, frequency) returning the forecasted {time step: [waits]} of the rides, which fills the time periods after the current one
+        self.forecast = forecast
 
     def main(self):
         global time_periods
@@ -33,10 +36,11 @@ class OptimizePark():
             rides = self.park_rides(col1, time_periods)
         required_constraints = self.required_constraints(rides)
         optional_constraints = self.optional_constraints(rides, required_constraints)
+        confidence = self.uncertainty()
         if self.time_assumption == "Constant":
-            self.optimize(col2, rides, optional_constraints, None)
+            self.optimize(col2, rides, optional_constraints, None, confidence)
         elif self.time_assumption == "Dynamic":
-            self.optimize(col2, rides, optional_constraints, time_periods)
+            self.optimize(col2, rides, optional_constraints, time_periods, confidence)
 
     def granularity(self):
         st.sidebar.markdown("<h2 style='text-align: center;'>Time Updates</h2", unsafe_allow_html=True, help="Control the time changes")
@@ -68,8 +72,9 @@ class OptimizePark():
                 park_rides = pd.DataFrame({"Rides": list(non_zero_rides.keys()), "Wait Times Period 1": list(non_zero_rides.values())})
             else:
                 park_rides = pd.DataFrame({"Rides": list(self.active_rides.keys()), "Wait Times Period 1": list(self.active_rides.values())})
+            forecasts = self.forecast(park_rides.Rides.tolist(), granularity[0], granularity[1]) if self.forecast != None else None
             for i in range(1, granularity[0]):
-                park_rides[f'Wait Times Period {i+1}'] = 0
+                park_rides[f'Wait Times Period {i+1}'] = [round(wait) for wait in forecasts[i+1]] if forecasts != None else 0
 
         experimental_rides_df = col1.data_editor(park_rides, num_rows="fixed")
 
@@ -91,15 +96,10 @@ class OptimizePark():
 
         avoid_rides = st.sidebar.multiselect("Avoid Rides", options=[i for i in rides.Rides], help="Which rides would you like to avoid entirely?")
 
-        helper.require_avoid_contradiction(required_rides, avoid_rides)
-
         min_distinct_rides_slider = st.sidebar.slider("Minimum Distinct Rides", min_value=1, max_value=len(rides.Rides), help="What is the minimum number of distinct rides you'd like to go on?")
 
         max_ride_repeats_slider = st.sidebar.slider("Maximum Ride Repeats", min_value=1, max_value=50, value=5, help="What is the maximum number of times you'd like to ride any single ride?")
 
-        if st.session_state.optimization_problem == "Minimize Time":
-            helper.max_ride_repeats_contradiction(required_constraints[1], max_ride_repeats_slider, len(rides.Rides))
-
         user_preferences=up.UserPreferences(
             required_rides,
             avoid_rides,
@@ -112,13 +112,23 @@ class OptimizePark():
         user_preferences.convert_empty_data_types()
         return user_preferences
 
-    def optimize(self, col2, rides, user_preferences, granularity):
+    def uncertainty(self) -> typing.Optional[float]:
+        st.sidebar.markdown("<h2 style='text-align: center;'>Wait Time Uncertainty</h2", unsafe_allow_html=True, help="Posted wait times are only estimates")
+        if not st.sidebar.checkbox("Plan for uncertain wait times", help="Find a plan that still fits your time if the wait times turn out longer than posted"):
+            return None
+        confidence = st.sidebar.slider("Confidence (%)", min_value=50, max_value=99, value=90, help="How often should the plan fit your time, over many simulated days?")
+        return confidence / 100
+
+    def optimize(self, col2, rides, user_preferences, granularity, confidence: typing.Optional[float] = None):
         global optimize_data
+        objective = "maximize" if st.session_state.optimization_problem == "Maximize Rides" else "minimize"
         if self.time_assumption == "Constant":
             optimize_data = ct.OptimizeConstant(
                 all_rides=rides.iloc[:, 0].tolist(),
                 wait_times=rides.iloc[:, 1].tolist(),
-                user_preferences=user_preferences
+                user_preferences=user_preferences,
+                model=helper.persistent_model(rides.iloc[:, 0].tolist(), objective),
+                solver_config=helper.solver_config()
                 )
         elif self.time_assumption == "Dynamic":
             wait_times_lists = []
@@ -134,16 +144,26 @@ class OptimizePark():
                 time_steps=granularity[0],
                 frequency=granularity[1],
                 wait_times=wait_times,
-                user_preferences=user_preferences
+                user_preferences=user_preferences,
+                model=helper.persistent_model(rides.iloc[:, 0].tolist(), objective, granularity[0]),
+                solver_config=helper.solver_config()
                 )
 
         ride_weights = optimize_data.set_ride_weights()
 
+        # Explain which preferences conflict instead of solving a request that has no feasible solution
+        if helper.preflight_errors(optimize_data, ride_weights, objective):
+            return
+
         col2.markdown("<h2 style='text-align: center;'>Optimal Results</h2", unsafe_allow_html=True, help="The 'Values' represent the number of times to go on a given ride")
-        if st.session_state.optimization_problem == "Maximize Rides":
-            results = optimize_data.maximize_rides(ride_weights)
-        elif st.session_state.optimization_problem == "Minimize Time":
-            results = optimize_data.minimize_time(ride_weights)
+        method = "maximize_rides" if st.session_state.optimization_problem == "Maximize Rides" else "minimize_time"
+        if confidence != None:
+            results = helper.robust_solve(optimize_data, method, confidence, col2)
+        elif self.time_assumption == "Constant":
+            results = helper.solution_cache().solve(optimize_data, method, ride_weights)
+        elif self.time_assumption == "Dynamic":
+            # Large dynamic models can take seconds to solve, so the best plan so far is shown while it improves
+            results = helper.anytime_solve(optimize_data, method, ride_weights, col2)
 
         if self.time_assumption == "Constant":
             try:
@@ -151,6 +171,10 @@ class OptimizePark():
                 col2.dataframe(ride_values)
             except:
                 st.error(body="No feasible solution. If this is a stand-alone error message, consider increasing the max time constraint")
+            # Outside of the try, so that an error of the simulation or the sweep is not shown as an infeasible problem
+            if results != None:
+                helper.robustness_summary(optimize_data, results, col2)
+                helper.trade_off_chart(optimize_data, objective, ride_weights, col2)
 
         elif self.time_assumption == "Dynamic":
             ride_values = pd.DataFrame({"Rides": list(rides.Rides)})
@@ -172,3 +196,4 @@ class OptimizePark():
             for i in range(len(time_period_results)):
                 ride_values[f'Results at Time Period {i+1}'] = list(time_period_results[i].values())
             col2.dataframe(ride_values)
+            helper.robustness_summary(optimize_data, results, col2)
@@ -0,0 +1,69 @@
+import time
+import numpy as np
+import optimization.anytime as an
+import optimization.dynamic_times as dt
+import optimization.user_preferences as up
+
+# Returns a bool as to whether a solution keeps the frequency, required, avoid, max ride repeats and min distinct rides preferences
+def feasible(solution: dict, park: dt.OptimizeDynamic, weights) -> bool:
+    totals = {ride: sum(solution[ride, t] for t in range(1, park.time_steps+1)) for ride in park.all_rides}
+    periods = all(sum(solution[ride, t] * weights[ride][t-1] for ride in park.all_rides) <= park.frequency for t in range(1, park.time_steps+1))
+    required = all(totals[ride] >= 1 for ride in park.required_rides or [])
+    avoid = all(totals[ride] == 0 for ride in park.avoid_rides or [])
+    repeats = park.max_ride_repeats == None or max(totals.values()) <= park.max_ride_repeats
+    distinct = park.min_distinct_rides == None or sum(1 for total in totals.values() if total > 0) >= park.min_distinct_rides
+    return periods and required and avoid and repeats and distinct
+
+# Test that every plan keeps the preferences, improves on the previous one, and ends at the optimal number of rides
+def test_maximize_improves_to_optimal():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=['d'], min_distinct_rides=2, max_ride_repeats=3, max_time=None, min_total_rides=None)
+    park = dt.OptimizeDynamic(['a', 'b', 'c', 'd'], 3, 60, {1: [10, 20, 30, 5], 2: [25, 15, 30, 5], 3: [20, 20, 20, 5]}, user_preferences)
+    weights = park.set_ride_weights()
+    results = list(park.solve_anytime(weights))
+    objectives = [objective for _, objective, _ in results]
+    assert objectives == sorted(objectives)
+    assert all(feasible(solution, park, weights) and objective <= bound for solution, objective, bound in results)
+    # The last plan is proven optimal
+    solution, objective, bound = results[-1]
+    assert objective == bound == sum(park.maximize_rides(weights).values())
+
+# Test that the greedy plan goes on the rides with the shortest total times, and that the local search frees their repeats for the time steps that need them
+def test_greedy_and_local_search():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=1, max_time=None, min_total_rides=None)
+    # 'a' is short in both time steps, but 'b' only fits in the first one
+    park = dt.OptimizeDynamic(['a', 'b'], 2, 20, {1: [10, 11], 2: [10, 50]}, user_preferences)
+    solver = an.AnytimeSolver(park, park.set_ride_weights())
+    greedy = solver.greedy()
+    assert greedy.tolist() == [[1, 0], [0, 0]]
+    improved = list(solver.local_search(greedy))[-1]
+    assert improved.tolist() == [[0, 1], [1, 0]]
+    assert solver.set_bound() == 2
+
+# Test that the minimization problem starts from the min total rides with the shortest total times
+def test_minimize_time():
+    user_preferences = up.UserPreferences(required_rides=['b'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=2, max_time=None, min_total_rides=4)
+    park = dt.OptimizeDynamic(['a', 'b', 'c'], 2, 60, {1: [10, 30, 12], 2: [8, 25, 40]}, user_preferences)
+    weights = park.set_ride_weights()
+    solution, objective, bound = list(park.solve_anytime(weights, "minimize"))[-1]
+    assert objective == bound == 8 + 8 + 12 + 25
+    assert solution == park.minimize_time(weights)
+
+# Test that a large park gets a plan within milliseconds, and that the whole solve stops at its deadline
+def test_deadline_on_large_park():
+    random = np.random.RandomState(1)
+    rides = [f"ride {i}" for i in range(80)]
+    wait_times = {t: random.randint(5, 90, 80).tolist() for t in range(1, 17)}
+    user_preferences = up.UserPreferences(required_rides=rides[:10], avoid_rides=rides[10:12], min_distinct_rides=40, max_ride_repeats=1, max_time=None, min_total_rides=None)
+    park = dt.OptimizeDynamic(rides, 16, 60, wait_times, user_preferences)
+    weights = park.set_ride_weights()
+    start = time.perf_counter()
+    solution, objective, bound = next(park.solve_anytime(weights, deadline=2))
+    assert time.perf_counter() - start < 0.5
+    assert feasible(solution, park, weights) and objective <= bound
+    # The callback sees every improvement, and the last one is returned
+    seen = []
+    start = time.perf_counter()
+    result = an.AnytimeSolver(park, weights).run(deadline=2, callback=lambda *result: seen.append(result))
+    assert time.perf_counter() - start < 3
+    assert result == seen[-1] and feasible(result[0], park, weights)
+    assert [objective for _, objective, _ in seen] == sorted(objective for _, objective, _ in seen)
@@ -0,0 +1,39 @@
+import optimization.batch as bt
+import optimization.constant_times as ct
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c']
+wait_times = [2, 4, 6]
+
+# Test that equivalent preferences have the same canonical key
+def test_canonical_key():
+    first = up.UserPreferences(required_rides=['b', 'a'], avoid_rides=[], min_distinct_rides=0, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    second = up.UserPreferences(required_rides=['a', 'b'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    third = up.UserPreferences(required_rides=['a', 'b'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=20, min_total_rides=None)
+    assert first.canonical_key() == second.canonical_key()
+    assert first.canonical_key() != third.canonical_key()
+    # A max ride repeats of 0 allows no rides, unlike no limit at all
+    no_repeats = up.UserPreferences(required_rides=['a', 'b'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=0, max_time=30, min_total_rides=None)
+    assert no_repeats.canonical_key() != second.canonical_key()
+
+# Test that a batch returns the same results as solving each user separately, in the same order
+def test_solve_batch_maximize():
+    preferences = [
+        up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=20, min_total_rides=None),
+        up.UserPreferences(required_rides=['b'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None),
+        up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=20, min_total_rides=None),
+        up.UserPreferences(required_rides=['a'], avoid_rides=['a'], min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None),
+    ]
+    expected = []
+    for user_preferences in preferences:
+        park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+        expected.append(park.maximize_rides(park.set_ride_weights()))
+    assert bt.solve_batch(rides, wait_times, preferences, workers=1) == expected
+    assert bt.solve_batch(rides, wait_times, preferences, workers=2) == expected
+
+# Test that identical preferences get separate copies of the same result
+def test_solve_batch_minimize_duplicates():
+    user_preferences = up.UserPreferences(required_rides=['a', 'c'], avoid_rides=['b'], min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=10)
+    results = bt.solve_batch(rides, wait_times, [user_preferences, user_preferences], objective="minimize", workers=1)
+    assert results == [{'a': 9.0, 'b': 0.0, 'c': 1.0}, {'a': 9.0, 'b': 0.0, 'c': 1.0}]
+    assert results[0] is not results[1]
@@ -0,0 +1,50 @@
+import json
+import numpy as np
+import benchmarks.parks as bp
+import benchmarks.run as br
+import optimization.solvers as sv
+
+# Test that a synthetic park is the same for the same arguments, and that its preferences have no contradiction
+def test_synthetic_parks_are_reproducible():
+    park = bp.SyntheticPark(100, 12, "dense", seed=3)
+    assert np.array_equal(park.values, bp.SyntheticPark(100, 12, "dense", seed=3).values)
+    assert not np.array_equal(park.values, bp.SyntheticPark(100, 12, "dense", seed=4).values)
+    assert park.frequency == 60 and park.values.shape == (100, 12)
+    preferences = park.user_preferences
+    assert len(preferences.required_rides) > 0 and len(preferences.avoid_rides) == 10
+    assert not set(preferences.required_rides).intersection(preferences.avoid_rides)
+    for name in ("OptimizeConstant", "OptimizeDynamic"):
+        optimizer = br.set_optimizer(name, park, sv.SolverConfig())
+        assert not optimizer.set_contradiction_value(optimizer.set_ride_weights(), "maximize")
+        assert not optimizer.set_contradiction_value(optimizer.set_ride_weights(), "minimize")
+
+# Test that every method is timed phase by phase, and that the MILP and the public method agree
+def test_time_method():
+    park = bp.SyntheticPark(20, 4, "sparse")
+    for name, method, kwargs, objective in br.METHODS:
+        record = br.time_method(name, method, kwargs, objective, park, sv.SolverConfig(time_limit=10))
+        assert record["total"] > 0 and record["objective"] != None
+        if objective != None:
+            assert all(record[phase] >= 0 for phase in ("build", "solve", "extract"))
+            assert record["status"] == "Optimal" and record["proven"]
+            assert np.isclose(record["milp_objective"], record["objective"])
+    # The results can be written as JSON
+    json.dumps(record)
+
+# Test that only the phases that got slower than the threshold are reported
+def test_compare():
+    record = {"optimizer": "OptimizeDynamic", "method": "maximize_rides", "options": {}, "rides": 10, "time_steps": 4, "density": "sparse", "seed": 0, "build": 0.1, "solve": 0.5, "extract": 0.001, "total": 0.6}
+    slower = dict(record, build=0.2, extract=0.002, total=0.7)
+    regressions = br.compare({"results": [record]}, {"results": [slower]})
+    # The extraction doubled too, but by less than the min seconds
+    assert [regression["phase"] for regression in regressions] == ["build"]
+    assert br.compare({"results": [record]}, {"results": [dict(slower, rides=20)]}) == []
+
+# Test that imports are timed in a fresh interpreter, and that a slower import is reported
+def test_time_import():
+    record = br.time_import("optimization.constant_times")
+    assert record["total"] > 0 and record["loaded"] == []
+    assert "pulp" in br.time_import("optimization.solvers.prewarm")["loaded"]
+    slower = dict(record, total=record["total"] * 2 + 0.1)
+    regressions = br.compare({"imports": [record], "results": []}, {"imports": [slower], "results": []})
+    assert [regression["phase"] for regression in regressions] == ["import"]
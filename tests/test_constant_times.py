@@ -127,4 +127,75 @@ def test_minimize_time_contradiction():
     park = ct.OptimizeConstant(rides, wait_times,  user_preferences)
     ride_weights = park.set_ride_weights()
     # Setting the min total rides to be larger than the product of the size of all distinct rides and the max ride repeats leads to a contradiction
-    assert park.minimize_time(ride_weights) == None
\ No newline at end of file
+    assert park.minimize_time(ride_weights) == None
+
+# -----------------------
+# DP solver method tests
+# -----------------------
+
+# Test that the DP solver agrees with PuLP when maximizing the number of rides with all applicable constraints
+def test_maximize_rides_dp_with_all_constraints():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=['a'], min_distinct_rides=2, max_ride_repeats=5, max_time=30, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times,  user_preferences)
+    ride_weights = park.set_ride_weights()
+    # Avoiding 'a' and requiring 'c' leaves 24 units of time, and 'b' can only be repeated 5 times
+    assert park.maximize_rides(ride_weights, solver="dp") == {'a': 0.0, 'b': 5.0, 'c': 1.0}
+    assert sum(park.maximize_rides(ride_weights, solver="dp").values()) == sum(park.maximize_rides(ride_weights, solver="pulp").values())
+
+# Test that the DP solver breaks ties by using the least amount of time
+def test_maximize_rides_dp_tie_break():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=['a'], min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times,  user_preferences)
+    ride_weights = park.set_ride_weights()
+    # Both {'b': 7} and {'b': 6, 'c': 1} go on 7 rides, but riding 'b' 7 times only takes 28 units of time
+    assert park.maximize_rides(ride_weights, solver="dp") == {'a': 0.0, 'b': 7.0, 'c': 0.0}
+
+# Test that the DP solver returns None when no feasible solution exists
+def test_maximize_rides_dp_infeasible():
+    user_preferences = up.UserPreferences(required_rides=['b', 'c'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=8, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times,  user_preferences)
+    ride_weights = park.set_ride_weights()
+    # Going on both 'b' and 'c' takes 10 units of time, which is more than the max time of 8
+    assert park.maximize_rides(ride_weights, solver="dp") == None
+
+# Test that the auto solver falls back to PuLP when the wait times are not integers
+def test_maximize_rides_auto_non_integer_wait_times():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=10, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, [2.5, 4, 6],  user_preferences)
+    ride_weights = park.set_ride_weights()
+    assert park.maximize_rides(ride_weights, solver="auto") == {'a': 4.0, 'b': 0.0, 'c': 0.0}
+
+# ------------------
+# Sweep method tests
+# ------------------
+
+# Test that one sweep gives the same max number of rides as one solve per max time, along with a plan that fits in each max time
+def test_sweep_max_time():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=3, max_time=None, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    sweep = park.sweep_max_time([0, 6, 10, 20, 30], plans=True)
+    # A max time of 0 cannot fit the required ride 'c'
+    assert sweep.method == "dp" and sweep.to_dict() == {0: None, 6: 1.0, 10: 3.0, 20: 6.0, 30: 8.0}
+    assert sweep.plans[3] == {'a': 3.0, 'b': 2.0, 'c': 1.0}
+    for max_time, number_of_rides in sweep.to_dict().items():
+        solution = ct.OptimizeConstant(rides, wait_times, up.UserPreferences(required_rides=['c'], max_ride_repeats=3, max_time=max_time)).maximize_rides(park.set_ride_weights())
+        assert (sum(solution.values()) if solution != None else None) == number_of_rides
+    # The persistent model fallback gives the same trade-off curve
+    assert park.sweep_max_time([0, 6, 10, 20, 30], solver="pulp").to_dict() == sweep.to_dict()
+
+# Test that one sweep gives the least time for every min total rides value, and that the max total rides that can be reached ends the curve
+def test_sweep_min_total_rides():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=2, max_ride_repeats=2, max_time=None, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    sweep = park.sweep_min_total_rides(range(0, 8), plans=True)
+    # 'c' and 'a' are always gone on, and no more than 6 rides can be gone on with 2 ride repeats
+    assert sweep.to_dict() == {0: 8.0, 1: 8.0, 2: 8.0, 3: 10.0, 4: 14.0, 5: 18.0, 6: 24.0, 7: None}
+    assert sweep.plans[3] == {'a': 2.0, 'b': 0.0, 'c': 1.0}
+    assert park.sweep_min_total_rides(range(0, 8), solver="pulp").to_dict() == sweep.to_dict()
+
+# Test that the sweep falls back to the persistent model when the max times are not integers
+def test_sweep_non_integer_max_times():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=3, max_time=None, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    sweep = park.sweep_max_time([6.5, 10])
+    assert sweep.method == "pulp" and sweep.to_dict() == {6.5: 1.0, 10: 3.0}
@@ -0,0 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+import optimization.dynamic_times as dt
+import optimization.user_preferences as up
+import optimization.knapsack as ks
+
+rides = ['a', 'b', 'c']
+time_steps = 2
+frequency = 100
+wait_times = {1: [2, 4, 6], 2: [5, 3, 7]}
+
+# Test the knapsack solved for each time step
+def test_solve_profit_knapsack():
+    # With a capacity of 10, two copies of the first item (profit 3 each) beat one copy of the second item (profit 5)
+    assert ks.solve_profit_knapsack([3, 5, -1], [5, 10, 1], [4, 4, 4], 10).tolist() == [2, 0, 0]
+    # Items with zero weight are always taken up to their upper bound
+    assert ks.solve_profit_knapsack([1, 1], [0, 3], [2, 5], 7).tolist() == [2, 2]
+
+# Test that the decomposition finds the optimal plan when only the time step frequencies bind
+def test_maximize_decomposed_no_preferences():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=200, min_total_rides=None)
+    park = dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=frequency, wait_times=wait_times, user_preferences=user_preferences)
+    result = park.maximize_rides_decomposed(park.set_ride_weights(), workers=1)
+    # Same as the MILP: 'a' 50 times in the first time step, and 'b' 33 times in the second time step
+    assert result.solution == {('a', 1): 50.0, ('a', 2): 0.0, ('b', 1): 0.0, ('b', 2): 33.0, ('c', 1): 0.0, ('c', 2): 0.0}
+    assert result.objective == result.bound == 83
+    assert result.gap == 0
+
+# Test that the plan is feasible and that the bounds contain the optimal number of rides when every coupling constraint is set
+def test_maximize_decomposed_with_coupling_constraints():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=['a'], min_distinct_rides=2, max_ride_repeats=10, max_time=90, min_total_rides=None)
+    park = dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=frequency, wait_times=wait_times, user_preferences=user_preferences)
+    ride_weights = park.set_ride_weights()
+    optimal = sum(park.maximize_rides(ride_weights).values())
+    result = park.maximize_rides_decomposed(ride_weights, workers=1)
+    assert result.objective <= optimal <= result.bound
+    assert 0 <= result.gap <= 1
+    solution = result.solution
+    assert solution[('a', 1)] + solution[('a', 2)] == 0
+    assert 1 <= solution[('c', 1)] + solution[('c', 2)] <= 10
+    assert solution[('b', 1)] + solution[('b', 2)] <= 10
+    assert sum(ride_weights[ride][time_step-1] * value for (ride, time_step), value in solution.items()) <= 90
+
+# Test that the time step subproblems give the same result when solved in worker processes
+def test_maximize_decomposed_with_workers():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=3, max_ride_repeats=20, max_time=150, min_total_rides=None)
+    park = dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=frequency, wait_times=wait_times, user_preferences=user_preferences)
+    ride_weights = park.set_ride_weights()
+    serial = park.maximize_rides_decomposed(ride_weights, workers=1)
+    parallel = park.maximize_rides_decomposed(ride_weights, workers=2)
+    assert serial.solution == parallel.solution
+    assert serial.bound == parallel.bound
+    # A shared executor is reused between solves, and the default solves in the current process
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        for _ in range(2):
+            assert park.maximize_rides_decomposed(ride_weights, executor=executor).solution == serial.solution
+    assert park.maximize_rides_decomposed(ride_weights).solution == serial.solution
+
+# Test that a ride with no wait time and no max ride repeats makes the problem unbounded
+def test_maximize_decomposed_unbounded():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=200, min_total_rides=None)
+    park = dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=frequency, wait_times={1: [0, 4, 6], 2: [5, 3, 7]}, user_preferences=user_preferences)
+    assert park.maximize_rides_decomposed(park.set_ride_weights(), workers=1) == None
@@ -1,5 +1,6 @@
 import optimization.dynamic_times as dt
 import optimization.user_preferences as up
+import optimization.weight_matrix as wm
 
 rides = ['a', 'b', 'c']
 time_steps = 2
@@ -12,6 +13,26 @@ def test_set_ride_weights():
     park = dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=frequency, wait_times=wait_times, user_preferences=user_preferences)
     assert park.set_ride_weights() == {'a': [2, 5], 'b': [4, 3], 'c': [6, 7]}
 
+def test_set_ride_weights_matrix():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=None)
+    park = dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=frequency, wait_times=wait_times, user_preferences=user_preferences)
+    ride_weights = park.set_ride_weights()
+    # Rows are rides and columns are time steps, so the column of a time step holds the wait times of that time step
+    assert ride_weights.matrix.shape == (3, 2)
+    assert ride_weights.row('b').tolist() == [4, 3]
+    assert ride_weights.column(2).tolist() == wait_times[2]
+    assert wm.WeightMatrix.from_dict({'a': [2, 5], 'b': [4, 3], 'c': [6, 7]}).matrix.tolist() == ride_weights.matrix.tolist()
+    # The matrix still behaves like the {ride: [weight at each time step]} dict, with every Mapping method
+    assert list(ride_weights.keys()) == rides
+    assert list(ride_weights.values()) == [[2, 5], [4, 3], [6, 7]]
+    assert dict(ride_weights.items()) == {'a': [2, 5], 'b': [4, 3], 'c': [6, 7]}
+
+def test_maximize_with_ride_weights_dict():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=10, max_time=200, min_total_rides=None)
+    park = dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=frequency, wait_times=wait_times, user_preferences=user_preferences)
+    # Plain dicts of ride weights are still accepted, and are converted to a weight matrix when the problem is built
+    assert park.maximize_rides({'a': [2, 5], 'b': [4, 3], 'c': [6, 7]}) == park.maximize_rides(park.set_ride_weights())
+
 def test_maximize_no_preferences():
     user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=200, min_total_rides=None)
     park = dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=frequency, wait_times=wait_times, user_preferences=user_preferences)
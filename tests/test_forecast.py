@@ -0,0 +1,92 @@
+import numpy as np
+import optimization.dynamic_times as dt
+import optimization.forecast as fc
+import optimization.user_preferences as up
+import optimization.wait_time_store as ws
+
+# Monday 2023-11-13 at midnight UTC
+start = 1_699_833_600
+
+def snapshot(waits: dict) -> list:
+    return [{"name": ride, "active": True, "waitTime": wait} for ride, wait in waits.items()]
+
+# Records two weeks of hourly snapshots where 'a' waits 10 + the hour, and 'b' waits 30 on weekends and 5 on weekdays
+def record_history(store, days: int = 14):
+    for hour in range(days * 24):
+        weekday = (hour // 24) % 7
+        store.record("Park", snapshot({"a": 10 + hour % 24, "b": 30 if weekday >= 5 else 5}), start + hour * 3600)
+
+# Test that the hour and weekday profile of each ride is recovered
+def test_seasonal_profile(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path))
+    record_history(store)
+    forecaster = fc.WaitTimeForecaster(damping=0).fit_store(store, "Park", start, start + 14 * 86400)
+    assert forecaster.rides == ['a', 'b']
+    # Forecast the third Saturday from 9 to 12, one hour per time step
+    saturday = start + 19 * 86400 + 9 * 3600
+    weights = forecaster.predict(saturday, 3, 60)
+    assert np.allclose(weights.matrix, [[19, 20, 21], [30, 30, 30]])
+    # A weekday only differs for 'b', and unknown rides are forecasted at 0
+    weights = forecaster.predict(saturday + 2 * 86400, 1, 60, rides=['b', 'c', 'a'])
+    assert np.allclose(weights.matrix, [[5], [0], [19]])
+
+# Test that a recent deviation from the profile is followed, and decays back to the profile further ahead
+def test_deviation_decays(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path))
+    record_history(store)
+    # The latest snapshots show 'a' 20 minutes above its profile
+    now = start + 14 * 86400
+    for hour in range(3):
+        store.record("Park", snapshot({"a": 30 + hour, "b": 5}), now + hour * 3600)
+    forecaster = fc.WaitTimeForecaster(alpha=0.5, damping=0.5, samples_per_step=1).fit_store(store, "Park", start, now + 3 * 3600)
+    # Older snapshots followed the profile, so the deviation is mostly the recent one
+    assert forecaster.deviations[0] > 10 and forecaster.deviations[1] == 0
+    # Time steps from 3:00, sampled at their middle, are 1.5, 2.5... hours after the latest snapshot
+    values = forecaster.predict(now + 3 * 3600, 4, 60, rides=['a']).matrix[0]
+    assert np.allclose(values - np.array([13, 14, 15, 16]), forecaster.deviations[0] * 0.5 ** np.array([1.5, 2.5, 3.5, 4.5]))
+
+# Test that a forecaster is only refitted once the store has a new snapshot
+def test_cache_per_snapshot(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path))
+    record_history(store, days=7)
+    cache = fc.ForecastCache()
+    now = start + 7 * 86400
+    first = cache.predict(store, "Park", 4, 30, ['a', 'b'], now)
+    # The same request is served from the cache, and another request reuses the fitted forecaster
+    assert cache.predict(store, "Park", 4, 30, ['a', 'b'], now) is first
+    cache.predict(store, "Park", 8, 15, ['b'], now)
+    assert len(cache.forecasters) == 1 and len(cache.forecasts) == 2
+    # A new snapshot invalidates the forecast
+    store.record("Park", snapshot({"a": 50, "b": 5}), now)
+    assert cache.predict(store, "Park", 4, 30, ['a', 'b'], now) is not first
+    assert len(cache.forecasters) == 2
+    # The latest snapshot is also found from the files alone
+    store.flush()
+    assert ws.WaitTimeStore(str(tmp_path)).set_latest("Park") == now
+    assert ws.WaitTimeStore(str(tmp_path)).set_latest("Other Park") == None
+
+# Test that forecasts from the current time are cached within a time step
+def test_cache_from_now(tmp_path, monkeypatch):
+    store = ws.WaitTimeStore(str(tmp_path))
+    record_history(store, days=7)
+    cache = fc.ForecastCache()
+    now = start + 7 * 86400 + 10 * 60
+    monkeypatch.setattr(fc.time, "time", lambda: now)
+    first = cache.predict(store, "Park", 4, 30, ['a', 'b'])
+    assert first.matrix.tolist() == cache.predict(store, "Park", 4, 30, ['a', 'b'], start + 7 * 86400).matrix.tolist()
+    monkeypatch.setattr(fc.time, "time", lambda: now + 15 * 60)
+    assert cache.predict(store, "Park", 4, 30, ['a', 'b']) is first
+    monkeypatch.setattr(fc.time, "time", lambda: now + 25 * 60)
+    assert cache.predict(store, "Park", 4, 30, ['a', 'b']) is not first
+
+# Test that the forecasted wait times can be given to OptimizeDynamic
+def test_forecast_for_optimize_dynamic(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path))
+    record_history(store, days=7)
+    wait_times = fc.ForecastCache().wait_times(store, "Park", 3, 60, ['a', 'b'], start + 7 * 86400 + 9 * 3600)
+    assert sorted(wait_times.keys()) == [1, 2, 3]
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=None)
+    park = dt.OptimizeDynamic(['a', 'b'], 3, 60, wait_times, user_preferences)
+    solution = park.maximize_rides(park.set_ride_weights())
+    # 'b' is only 5 minutes on a Monday morning, so every time step goes to it
+    assert (solution['b', 1], solution['b', 2], solution['b', 3]) == (12.0, 12.0, 12.0)
@@ -0,0 +1,77 @@
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.group as gp
+import optimization.solvers as sv
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c', 'd']
+ride_weights = {'a': 5, 'b': 10, 'c': 20, 'd': 30}
+adult = up.UserPreferences(required_rides=['d'], avoid_rides=None, min_distinct_rides=2, max_ride_repeats=3, max_time=60, min_total_rides=4)
+child = up.UserPreferences(required_rides=None, avoid_rides=['d'], min_distinct_rides=None, max_ride_repeats=4, max_time=40, min_total_rides=3)
+
+# Test that a group with no rides together plans every member as if they were alone
+def test_nothing_together():
+    group = gp.GroupOptimizer(rides, ride_weights, [adult, child], together="none")
+    solutions = group.maximize_rides()
+    for user_preferences, solution in zip([adult, child], solutions):
+        park = ct.OptimizeConstant(rides, list(ride_weights.values()), user_preferences)
+        assert sum(solution.values()) == sum(park.maximize_rides(ride_weights).values())
+
+# Test that the rides ridden together have the same count for every member, within every member's preferences
+def test_rides_together():
+    group = gp.GroupOptimizer(rides, ride_weights, [adult, child], together=['a', 'b'])
+    adult_solution, child_solution = group.maximize_rides()
+    assert (adult_solution['a'], adult_solution['b']) == (child_solution['a'], child_solution['b'])
+    assert adult_solution['d'] >= 1 and child_solution['d'] == 0
+    assert sum(child_solution[ride] * ride_weights[ride] for ride in rides) <= 40
+    # The child can ride 'a' 4 times, but the adult only 3 times, so together they ride it at most 3 times
+    assert adult_solution['a'] <= 3
+    # 'd' cannot be ridden together, since the adult requires it and the child avoids it
+    group = gp.GroupOptimizer(rides, ride_weights, [adult, child], together="all")
+    assert group.maximize_rides() == None
+    assert group.conflicts[0].rides == ['d']
+
+# Test that members with identical preferences share one set of ride counts, so the model does not grow with them
+def test_identical_members():
+    small = gp.GroupOptimizer(rides, ride_weights, [adult, child], together=['a'])
+    large = gp.GroupOptimizer(rides, ride_weights, [adult, child] * 5, together=['a'])
+    assert len(large.classes) == 2 and large.classes[1][1] == [1, 3, 5, 7, 9]
+    assert small.build_problem("maximize")[0].numVariables() == large.build_problem("maximize")[0].numVariables()
+    small_solutions, large_solutions = small.minimize_time(), large.minimize_time()
+    assert large_solutions == small_solutions * 5
+
+# Test that the dynamic group problem plans each time step within the frequency
+def test_dynamic_group():
+    wait_times = {1: [5, 10, 20, 30], 2: [20, 5, 10, 30]}
+    weights = dt.OptimizeDynamic(rides, 2, 30, wait_times, adult).set_ride_weights()
+    group = gp.GroupOptimizer(rides, dict(weights), [adult, child], together=['b'], frequency=30)
+    adult_solution, child_solution = group.maximize_rides()
+    for solution in (adult_solution, child_solution):
+        for time_step in (1, 2):
+            assert sum(solution[ride, time_step] * weights[ride][time_step-1] for ride in rides) <= 30
+    assert all(adult_solution['b', time_step] == child_solution['b', time_step] for time_step in (1, 2))
+    assert adult_solution['d', 1] + adult_solution['d', 2] >= 1
+
+# Test that a member with a max ride repeats of 0 goes on no rides, and is not merged with a member with no limit
+def test_no_repeats():
+    no_repeats = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=0, max_time=30, min_total_rides=None)
+    no_limit = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    group = gp.GroupOptimizer(rides, ride_weights, [no_repeats, no_limit], together="none")
+    assert len(group.classes) == 2
+    first, second = group.maximize_rides()
+    assert sum(first.values()) == 0 and second['a'] == 6
+    # A ride ridden together cannot be required by another member
+    required = up.UserPreferences(required_rides=['a'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    group = gp.GroupOptimizer(rides, ride_weights, [no_repeats, required], together=['a'])
+    assert group.maximize_rides() == None
+    assert [conflict.constraints for conflict in group.conflicts] == [("required_rides", "max_ride_repeats")]
+
+# Test that the group solves get the default time limit unless the solver config sets one
+def test_time_limit():
+    member = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    assert gp.GroupOptimizer(rides, ride_weights, [member]).set_solver_config().time_limit == gp.TIME_LIMIT
+    assert gp.GroupOptimizer(rides, ride_weights, [member], time_limit=None).set_solver_config().time_limit == None
+    group = gp.GroupOptimizer(rides, ride_weights, [member], solver_config=sv.SolverConfig(time_limit=3))
+    assert group.set_solver_config().time_limit == 3
+    group.maximize_rides()
+    assert group.last_report.set_proven_value()
@@ -0,0 +1,66 @@
+import logging
+import time
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.instrumentation as it
+import optimization.solvers as sv
+import optimization.user_preferences as up
+
+user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=2, max_ride_repeats=3, max_time=60, min_total_rides=None)
+
+# Test that every phase of a solve is timed, and nested in the span of the method
+def test_spans_of_a_solve():
+    park = dt.OptimizeDynamic(['a', 'b', 'c'], 2, 60, {1: [10, 20, 30], 2: [15, 20, 5]}, user_preferences, presolve=False)
+    with it.recording() as recorder:
+        park.maximize_rides(park.set_ride_weights())
+    assert [span.set_path() for span in recorder.spans] == [
+        "OptimizeDynamic.maximize_rides/preflight",
+        "OptimizeDynamic.maximize_rides/build",
+        "OptimizeDynamic.maximize_rides/solve",
+        "OptimizeDynamic.maximize_rides/extract",
+        "OptimizeDynamic.maximize_rides",
+    ]
+    build = recorder.find("build")[0]
+    # 6 ride variables and 3 binaries; 2 frequency + max time + required + 3 max ride repeats + 3 linkage + 1 aggregate constraints
+    assert (build.attributes["variables"], build.attributes["constraints"]) == (9, 11)
+    assert build.attributes["nonzeros"] == 6 + 6 + 2 + 6 + 9 + 3
+    assert build.attributes["variables_seconds"] + build.attributes["constraints_seconds"] <= build.duration
+    assert recorder.find("solve")[0].attributes["status"] == "Optimal"
+    totals = recorder.totals()
+    assert totals["OptimizeDynamic.maximize_rides"] >= totals["build"] + totals["solve"] + totals["extract"]
+    # Once the recording is over, nothing is recorded
+    park.maximize_rides(park.set_ride_weights())
+    assert len(recorder.spans) == 5 and not it.set_enabled_value()
+
+# Test that the presolve and the HiGHS iterations are recorded, and that any callable can be a hook
+def test_presolve_and_hooks(caplog):
+    minimize_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=['d'], min_distinct_rides=None, max_ride_repeats=3, max_time=None, min_total_rides=4)
+    park = ct.OptimizeConstant(['a', 'b', 'c', 'd'], [10, 20, 30, 30], minimize_preferences, solver_config=sv.SolverConfig("highs"))
+    spans = []
+    it.add_hook(spans.append)
+    it.add_hook(it.logging_hook(level=logging.INFO))
+    try:
+        with caplog.at_level(logging.INFO, logger="optimization"):
+            park.minimize_time(park.set_ride_weights())
+    finally:
+        it.hooks.clear()
+    paths = [span.set_path() for span in spans]
+    assert "OptimizeConstant.minimize_time/presolve" in paths
+    # The reduced problem is solved by another optimizer, inside the method of the full one
+    assert "OptimizeConstant.minimize_time/OptimizeConstant.minimize_time/solve" in paths
+    solve = next(span for span in spans if span.name == "solve")
+    assert solve.attributes["backend"] == "highs" and solve.attributes["iterations"] >= 0
+    assert "OptimizeConstant.minimize_time took" in caplog.text
+
+# Test that disabled instrumentation costs almost nothing compared to a build
+def test_disabled_overhead():
+    assert not it.set_enabled_value()
+    @it.instrumented()
+    def instrumented():
+        it.lap("part")
+        it.annotate(value=1)
+    start = time.perf_counter()
+    for _ in range(10000):
+        instrumented()
+    # Less than 5 microseconds per instrumented call with no hook
+    assert (time.perf_counter() - start) / 10000 < 5e-6
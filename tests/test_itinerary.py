@@ -0,0 +1,63 @@
+import numpy as np
+import optimization.dynamic_times as dt
+import optimization.itinerary as it
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c', 'd']
+# 'a' and 'b' are next to each other, and so are 'c' and 'd', but the two pairs are across the park from each other
+travel_times = [[0, 1, 20, 21], [1, 0, 20, 21], [20, 20, 0, 1], [21, 21, 1, 0]]
+
+# Test that the itinerary only walks across the park once, and that the heuristic engine matches the exact MILP
+def test_maximize_walks_across_once():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=2, max_time=60, min_total_rides=None)
+    optimizer = it.ItineraryOptimizer(rides, {'a': 5, 'b': 5, 'c': 5, 'd': 5}, travel_times, user_preferences)
+    heuristic = optimizer.maximize_rides("heuristic")
+    exact = optimizer.maximize_rides("exact")
+    assert len(heuristic) == len(exact) == 7
+    for itinerary in (heuristic, exact):
+        assert itinerary.end_time <= 60
+        # Walking across the park takes 20 minutes, and it is only done once
+        assert 20 <= itinerary.walking_time <= 23
+    assert optimizer.last_report.status == "Optimal"
+
+# Test that the wait times of each ride come from the time step the user gets in line at, using the ride weights of OptimizeDynamic
+def test_time_dependent_waits():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=2, max_time=None, min_total_rides=None)
+    park = dt.OptimizeDynamic(rides, 2, 30, {1: [5, 5, 20, 20], 2: [15, 15, 2, 2]}, user_preferences)
+    optimizer = it.ItineraryOptimizer(rides, park.set_ride_weights(), travel_times, user_preferences, frequency=30)
+    itinerary = optimizer.maximize_rides("heuristic")
+    # 'a' and 'b' while their lines are short, then 'c' and 'd' once theirs are
+    assert sorted(itinerary.rides[:4]) == ['a', 'a', 'b', 'b']
+    assert sorted(itinerary.rides[4:]) == ['c', 'c', 'd', 'd']
+    assert itinerary.waits == [5.0] * 4 + [2.0] * 4
+    assert itinerary.set_ride_counts(rides) == {'a': 2, 'b': 2, 'c': 2, 'd': 2}
+    assert len(optimizer.maximize_rides("exact")) == 8
+
+# Test that the minimization problem goes on the min total rides in the least time
+def test_minimize_time():
+    user_preferences = up.UserPreferences(required_rides=['d'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=3)
+    optimizer = it.ItineraryOptimizer(rides, {'a': 2, 'b': 9, 'c': 4, 'd': 6}, travel_times, user_preferences, start_times=[0, 0, 10, 10])
+    heuristic = optimizer.minimize_time("heuristic")
+    exact = optimizer.minimize_time("exact")
+    # Staying by 'd' beats walking over to the shorter lines of 'a'
+    assert sorted(heuristic.rides) == sorted(exact.rides) == ['c', 'c', 'd']
+    assert heuristic.end_time == exact.end_time == 25
+
+# Test that the heuristic engine keeps every user preference on a larger park, within its time limit
+def test_preferences_on_large_park():
+    random = np.random.RandomState(0)
+    all_rides = [f"ride {i}" for i in range(40)]
+    points = random.rand(40, 2) * 15
+    travel = np.round(np.linalg.norm(points[:, None] - points[None], axis=2))
+    ride_weights = {ride: random.randint(5, 60, 8).tolist() for ride in all_rides}
+    user_preferences = up.UserPreferences(required_rides=all_rides[:3], avoid_rides=all_rides[3:6], min_distinct_rides=12, max_ride_repeats=2, max_time=400, min_total_rides=None)
+    optimizer = it.ItineraryOptimizer(all_rides, ride_weights, travel, user_preferences, frequency=60, time_limit=2)
+    itinerary = optimizer.maximize_rides()
+    counts = itinerary.set_ride_counts(all_rides)
+    assert itinerary.end_time <= 400
+    assert all(counts[ride] >= 1 for ride in all_rides[:3])
+    assert all(counts[ride] == 0 for ride in all_rides[3:6])
+    assert sum(1 for count in counts.values() if count > 0) >= 12
+    assert max(counts.values()) <= 2
+    # The reported times are the ones of walking and waiting in this order
+    assert np.isclose(itinerary.end_time, optimizer.set_end_time([all_rides.index(ride) for ride in itinerary.rides]))
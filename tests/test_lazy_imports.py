@@ -0,0 +1,39 @@
+import subprocess
+import sys
+import os
+import optimization.lazy_imports as li
+
+path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Test that a lazy module only imports the real module on its first attribute access
+def test_lazy_import():
+    module = li.lazy_import("optimization.lazy_imports")
+    assert module is li
+    lazy = li.LazyModule("json")
+    assert "dumps" not in vars(lazy)
+    assert lazy.dumps([1]) == "[1]"
+    assert "dumps" in vars(lazy) and lazy.loads is sys.modules["json"].loads
+
+# Test that importing the optimizers does not import their heavy dependencies until a problem is solved
+def test_optimizers_import_lazily():
+    code = "; ".join([
+        "import sys",
+        "import optimization",
+        "from optimization import constant_times as ct, dynamic_times as dt, user_preferences as up",
+        "loaded = [name for name in ('numpy', 'pulp', 'pandas', 'pyarrow') if name in sys.modules]",
+        "park = ct.OptimizeConstant(['a', 'b'], [10, 20], up.UserPreferences(None, None, None, None, 30, None))",
+        "print(loaded, park.maximize_rides(park.set_ride_weights()), 'pulp' in sys.modules, sys.path.count(optimization.constant_times.path))",
+    ])
+    output = subprocess.run([sys.executable, "-c", code], cwd=path, capture_output=True, text=True, check=True).stdout.strip()
+    # The modules only add the repository root to the path when they are not imported from the optimization package
+    assert output == "[] {'a': 3.0, 'b': 0.0} True 0"
+
+# Test that importing the data modules does not import pyarrow, numpy or requests until they are used
+def test_data_modules_import_lazily():
+    code = "; ".join([
+        "import sys",
+        "from optimization import park_service as ps, wait_time_store as ws",
+        "print([name for name in ('numpy', 'pyarrow', 'requests') if name in sys.modules])",
+    ])
+    output = subprocess.run([sys.executable, "-c", code], cwd=path, capture_output=True, text=True, check=True).stdout.strip()
+    assert output == "[]"
@@ -0,0 +1,62 @@
+import time
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.user_preferences as up
+
+# Model-size regression benchmark: the number of constraints and the build time should grow linearly with the number of rides
+sizes = [50, 100, 200, 400]
+
+def constant_park(num_rides: int):
+    rides = [f'Ride_{i}' for i in range(num_rides)]
+    wait_times = [5 + i % 40 for i in range(num_rides)]
+    user_preferences = up.UserPreferences(required_rides=rides[:2], avoid_rides=rides[2:4], min_distinct_rides=10, max_ride_repeats=3, max_time=300, min_total_rides=20)
+    return ct.OptimizeConstant(rides, wait_times, user_preferences)
+
+def dynamic_park(num_rides: int, time_steps: int = 4):
+    rides = [f'Ride_{i}' for i in range(num_rides)]
+    wait_times = {j: [5 + (i * j) % 40 for i in range(num_rides)] for j in range(1, time_steps+1)}
+    user_preferences = up.UserPreferences(required_rides=rides[:2], avoid_rides=rides[2:4], min_distinct_rides=10, max_ride_repeats=3, max_time=300, min_total_rides=20)
+    return dt.OptimizeDynamic(all_rides=rides, time_steps=time_steps, frequency=100, wait_times=wait_times, user_preferences=user_preferences)
+
+# Returns the smallest build time over a few repetitions, to reduce noise
+def build_time(build, ride_weights) -> float:
+    times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        build(ride_weights)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# Test that the constant times models have one min distinct linkage constraint per ride, plus a single aggregate constraint
+def test_constant_constraint_count_is_linear():
+    for num_rides in sizes:
+        park = constant_park(num_rides)
+        ride_weights = park.set_ride_weights()
+        prob, rides = park.build_maximize_problem(ride_weights)
+        # max time + 2 required + 2 avoid + num_rides linkage + 1 aggregate
+        assert prob.numConstraints() == 1 + 2 + 2 + num_rides + 1
+        prob, rides = park.build_minimize_problem(ride_weights)
+        # min total rides + 2 required + 2 avoid + num_rides linkage + 1 aggregate
+        assert prob.numConstraints() == 1 + 2 + 2 + num_rides + 1
+
+# Test that the dynamic times models have a constant number of constraints per ride and per time step
+def test_dynamic_constraint_count_is_linear():
+    for num_rides in sizes:
+        park = dynamic_park(num_rides)
+        ride_weights = park.set_ride_weights()
+        prob, rides = park.build_maximize_problem(ride_weights)
+        # 4 frequency + max time + 2 required + 2 avoid + num_rides max ride repeats + num_rides linkage + 1 aggregate
+        assert prob.numConstraints() == 4 + 1 + 2 + 2 + 2 * num_rides + 1
+        prob, rides = park.build_minimize_problem(ride_weights)
+        # min total rides + 2 required + 2 avoid + num_rides max ride repeats + num_rides linkage + 1 aggregate
+        assert prob.numConstraints() == 1 + 2 + 2 + 2 * num_rides + 1
+
+# Test that multiplying the number of rides by 8 multiplies the build time by much less than the 64 of a quadratic build
+def test_build_time_is_linear():
+    for make_park in (constant_park, dynamic_park):
+        small_park = make_park(sizes[0])
+        large_park = make_park(sizes[-1])
+        for small_build, large_build in ((small_park.build_maximize_problem, large_park.build_maximize_problem), (small_park.build_minimize_problem, large_park.build_minimize_problem)):
+            small_time = build_time(small_build, small_park.set_ride_weights())
+            large_time = build_time(large_build, large_park.set_ride_weights())
+            assert large_time < 24 * small_time
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+import optimization.park_service as ps
+import optimization.wait_time_store as ws
+
+# Stub of the park data API: every park returns a list of rides, with an ETag that changes whenever the data of the park changes
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("If-None-Match")))
+            status = server.statuses.get(self.path, 200)
+            data = server.data.get(self.path)
+        if server.delay:
+            time.sleep(server.delay)
+        if status != 200:
+            self.send_response(status)
+            self.end_headers()
+            return
+        etag = f'"{hash(json.dumps(data))}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.statuses = {}
+    server.delay = 0
+    server.data = {f"/{park}": [{"name": f"{park} ride", "active": True, "waitTime": 10}] for park in ["a", "b", "c"]}
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_service(server, **kwargs):
+    host, port = server.server_address
+    parks = {park: f"http://{host}:{port}/{park}" for park in ["a", "b", "c"]}
+    return ps.ParkDataService(parks, retries=0, timeout=5, **kwargs)
+
+# Test that unchanged data is revalidated with a conditional request, and changed data is downloaded again
+def test_conditional_requests(server):
+    service = make_service(server)
+    assert service.fetch("a") == server.data["/a"]
+    assert server.requests[-1] == ("/a", None)
+    # The second request sends the ETag of the first, and the stub answers 304
+    assert service.fetch("a") == server.data["/a"]
+    assert server.requests[-1][1] != None
+    server.data["/a"] = [{"name": "a ride", "active": True, "waitTime": 25}]
+    assert service.fetch("a")[0]["waitTime"] == 25
+    service.close()
+
+# Test that every park is fetched concurrently
+def test_fetch_all_concurrently(server):
+    server.delay = 0.3
+    service = make_service(server)
+    start = time.perf_counter()
+    results = service.fetch_all()
+    assert set(results.keys()) == {"a", "b", "c"}
+    # Fetching one park after another would take at least 0.9 seconds
+    assert time.perf_counter() - start < 0.8
+    service.close()
+
+# Test that stale data is served right away while it is refreshed in the background
+def test_stale_while_revalidate(server):
+    service = make_service(server, ttl=60, refresh_ahead=10, max_stale=60)
+    assert service.get("b")[0]["waitTime"] == 10
+    server.data["/b"] = [{"name": "b ride", "active": True, "waitTime": 40}]
+    # Still fresh, so no request is made
+    count = len(server.requests)
+    assert service.get("b")[0]["waitTime"] == 10
+    assert len(server.requests) == count
+    # Close to expiring: the cached data is returned and a refresh starts in the background
+    service.entries["b"].fetched_at -= 55
+    assert service.get("b")[0]["waitTime"] == 10
+    for _ in range(100):
+        if service.entries["b"].data[0]["waitTime"] == 40:
+            break
+        time.sleep(0.01)
+    assert service.get("b")[0]["waitTime"] == 40
+    service.close()
+
+# Test that the cached data is served when the API fails, and that an error is raised when there is no cached data
+def test_errors(server):
+    service = make_service(server, ttl=60, refresh_ahead=10, max_stale=0)
+    assert service.get("c")[0]["waitTime"] == 10
+    server.statuses["/c"] = 503
+    service.entries["c"].fetched_at -= 120
+    assert service.get("c")[0]["waitTime"] == 10
+    server.statuses["/a"] = 503
+    with pytest.raises(requests.RequestException):
+        service.get("a")
+    with pytest.raises(KeyError):
+        service.get("d")
+    service.close()
+
+# Test that every fetched snapshot, changed or not, is recorded to the wait time store
+def test_record_snapshots(server, tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path))
+    service = make_service(server, store=store)
+    service.fetch("a")
+    service.fetch("a")
+    assert store.read("a", 0, 2**40).num_rows == 2
+    # A batch of fetches is written to disk right away
+    service.fetch_all()
+    assert store.buffers == {} and store.read("a", 0, 2**31).num_rows == 3
+    service.close()
+
+# A wait time store whose writes fail, like a full disk
+class FailingStore():
+    def record(self, park, snapshot, timestamp=None):
+        raise OSError("No space left on device")
+
+    def flush(self, park=None):
+        raise OSError("No space left on device")
+
+# Test that an error other than a request error is kept to its park, and does not end the refresh thread
+def test_store_errors(server):
+    service = make_service(server, ttl=1, refresh_ahead=0, store=FailingStore())
+    # The data of every park is still fetched and served, although it cannot be recorded
+    assert sorted(service.fetch_all().keys()) == ["a", "b", "c"]
+    # The refresh thread keeps fetching every park after its first refresh fails to record them
+    service.start()
+    time.sleep(1.3)
+    assert service.thread.is_alive() and len(server.requests) >= 9
+    service.close()
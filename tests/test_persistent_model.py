@@ -0,0 +1,54 @@
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.persistent_model as pm
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c']
+wait_times = [2, 4, 6]
+dynamic_wait_times = {1: [2, 4, 6], 2: [5, 3, 7]}
+
+# Test that a persistent model gives the same results as building the problem from scratch, while the max time slider moves
+def test_maximize_rides_with_changing_max_time():
+    model = pm.PersistentModel(rides, "maximize")
+    for max_time in [20, 30, 8, 30]:
+        user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=3, max_ride_repeats=None, max_time=max_time, min_total_rides=None)
+        park = ct.OptimizeConstant(rides, wait_times, user_preferences, model=model)
+        fresh_park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+        ride_weights = park.set_ride_weights()
+        assert park.maximize_rides(ride_weights) == fresh_park.maximize_rides(ride_weights)
+
+# Test that changing the avoid rides and the wait times of a persistent model updates its solution
+def test_maximize_rides_with_changing_avoid_rides_and_wait_times():
+    model = pm.PersistentModel(rides, "maximize")
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=['a'], min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences, model=model)
+    assert park.maximize_rides(park.set_ride_weights()) == {'a': 0.0, 'b': 7.0, 'c': 0.0}
+    # No longer avoiding 'a', while 'a' now takes longer than 'c'
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, [10, 4, 3], user_preferences, model=model)
+    assert park.maximize_rides(park.set_ride_weights()) == {'a': 0.0, 'b': 0.0, 'c': 10.0}
+
+# Test that a persistent model for the minimization problem handles required and avoided rides as bounds
+def test_minimize_time_with_all_constraints():
+    model = pm.PersistentModel(rides, "minimize")
+    user_preferences = up.UserPreferences(required_rides=['a', 'c'], avoid_rides=['b'], min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=10)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences, model=model)
+    assert park.minimize_time(park.set_ride_weights()) == {'a': 9.0, 'b': 0.0, 'c': 1.0}
+
+# Test that a persistent model with time steps gives the same results as building the dynamic problem from scratch
+def test_dynamic_maximize_with_changing_preferences():
+    model = pm.PersistentModel(rides, "maximize", time_steps=2)
+    for required_rides, max_ride_repeats in [(['c'], None), (None, 10), (None, None)]:
+        user_preferences = up.UserPreferences(required_rides=required_rides, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=max_ride_repeats, max_time=200, min_total_rides=None)
+        park = dt.OptimizeDynamic(all_rides=rides, time_steps=2, frequency=100, wait_times=dynamic_wait_times, user_preferences=user_preferences, model=model)
+        fresh_park = dt.OptimizeDynamic(all_rides=rides, time_steps=2, frequency=100, wait_times=dynamic_wait_times, user_preferences=user_preferences)
+        ride_weights = park.set_ride_weights()
+        assert sum(park.maximize_rides(ride_weights).values()) == sum(fresh_park.maximize_rides(ride_weights).values())
+
+# Test that a required ride with max ride repeats of 0 makes the persistent model infeasible instead of failing in the solver
+def test_required_ride_with_no_repeats():
+    user_preferences = up.UserPreferences(required_rides=['a'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=0, max_time=30, min_total_rides=3)
+    for objective in ("maximize", "minimize"):
+        model = pm.PersistentModel(rides, objective)
+        assert model.solve({'a': 2, 'b': 4, 'c': 6}, user_preferences) == None
+        assert model.last_report == None
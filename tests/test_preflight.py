@@ -0,0 +1,79 @@
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.persistent_model as pm
+import optimization.preflight as pf
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c', 'd']
+wait_times = [2, 4, 6, 30]
+dynamic_wait_times = {1: [2, 4, 6, 30], 2: [5, 3, 7, 9]}
+
+# Returns the constraint names of every conflict found for a request
+def conflicting_constraints(park, objective: str) -> list:
+    park.set_contradiction_value(park.set_ride_weights(), objective)
+    return [conflict.constraints for conflict in park.conflicts]
+
+# Test that a feasible request has no conflicts
+def test_no_conflicts():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=['a'], min_distinct_rides=2, max_ride_repeats=3, max_time=20, min_total_rides=5)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    assert conflicting_constraints(park, "maximize") == []
+    assert conflicting_constraints(park, "minimize") == []
+
+# Test that requiring and avoiding the same ride is reported with the rides involved
+def test_required_and_avoid():
+    user_preferences = up.UserPreferences(required_rides=['a', 'b'], avoid_rides=['b'], min_distinct_rides=None, max_ride_repeats=None, max_time=20, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    assert conflicting_constraints(park, "maximize") == [("required_rides", "avoid_rides")]
+    assert park.conflicts[0].rides == ['b']
+
+# Test that the required rides must fit in the max time, both one by one and all together
+def test_required_rides_time():
+    user_preferences = up.UserPreferences(required_rides=['d'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=20, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    assert conflicting_constraints(park, "maximize") == [("required_rides", "max_time")]
+    assert park.maximize_rides(park.set_ride_weights()) == None
+
+    user_preferences = up.UserPreferences(required_rides=['b', 'c'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=9, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    assert conflicting_constraints(park, "maximize") == [("required_rides", "max_time")]
+    # The max time does not constrain the minimization problem
+    assert conflicting_constraints(park, "minimize") == []
+
+# Test that the cheapest distinct rides must fit in the max time
+def test_min_distinct_rides_time():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=['a'], min_distinct_rides=2, max_ride_repeats=None, max_time=9, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    # Without 'a', the 2 cheapest rides are 'b' and 'c', which take 10 units of time
+    assert conflicting_constraints(park, "maximize") == [("min_distinct_rides", "required_rides", "max_time")]
+
+# Test that the min total rides cannot be reached when every ride that is not avoided is repeated the max ride repeats
+def test_min_total_rides():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=['a'], min_distinct_rides=None, max_ride_repeats=2, max_time=None, min_total_rides=7)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    assert conflicting_constraints(park, "minimize") == [("min_total_rides", "max_ride_repeats")]
+    assert park.minimize_time(park.set_ride_weights()) == None
+
+# Test that the dynamic problem uses the length of the time steps as well as the max time
+def test_dynamic_frequency():
+    user_preferences = up.UserPreferences(required_rides=['d'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=None)
+    # 'd' only fits in the second time step
+    park = dt.OptimizeDynamic(rides, 2, 10, dynamic_wait_times, user_preferences)
+    assert conflicting_constraints(park, "maximize") == []
+    park = dt.OptimizeDynamic(rides, 2, 8, dynamic_wait_times, user_preferences)
+    assert conflicting_constraints(park, "maximize") == [("required_rides", "max_time", "frequency")]
+    assert park.maximize_rides(park.set_ride_weights()) == None
+
+# Test that a preflight without an objective only runs the checks shared by both optimization problems
+def test_shared_checks():
+    user_preferences = up.UserPreferences(required_rides=['d'], avoid_rides=['a', 'b', 'c'], min_distinct_rides=2, max_ride_repeats=None, max_time=5, min_total_rides=None)
+    ride_weights = dict(zip(rides, wait_times))
+    assert [conflict.constraints for conflict in pf.Preflight(ride_weights, user_preferences).run()] == [("min_distinct_rides", "avoid_rides")]
+
+# Test that a required ride conflicts with a max ride repeats of 0, before any model (persistent or not) reaches the solver
+def test_required_ride_with_no_repeats():
+    user_preferences = up.UserPreferences(required_rides=['r0'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=0, max_time=30, min_total_rides=3)
+    park = ct.OptimizeConstant(['r0', 'r1'], [7, 3], user_preferences, model=pm.PersistentModel(['r0', 'r1'], "maximize"))
+    assert conflicting_constraints(park, "maximize") == [("required_rides", "max_ride_repeats")]
+    assert park.maximize_rides(park.set_ride_weights()) == None
+    assert park.sweep_max_time([10, 20], solver="pulp").objectives == [None, None]
@@ -0,0 +1,79 @@
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.presolve as ps
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c', 'd', 'e', 'f']
+wait_times = [0, 4, 4, 50, 6, 3]
+
+# Test that avoided rides, rides longer than the max time and zero wait rides are fixed, and that rides with the same weights are merged
+def test_fix_and_merge():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=['f'], min_distinct_rides=None, max_ride_repeats=3, max_time=30, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    presolve = ps.Presolve(park.set_ride_weights(), user_preferences, "maximize").run()
+    assert presolve.fixed == {'a': (None, 3), 'd': (None, 0), 'f': (None, 0)}
+    assert presolve.groups == {'b': ['b', 'c']}
+    # Only 'b' (standing for 'b' and 'c', up to 6 times) and 'e' are left for the MILP
+    assert presolve.set_rides() == ['b', 'e']
+    assert presolve.set_ride_bounds() == {'b': 6}
+
+# Test that the merged rides are split back up to the max ride repeats, and that the presolved solution is as good as the full one
+def test_maximize_matches_full_model():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=['f'], min_distinct_rides=None, max_ride_repeats=3, max_time=30, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    full_park = ct.OptimizeConstant(rides, wait_times, user_preferences, presolve=False)
+    solution = park.maximize_rides(park.set_ride_weights())
+    # 3 free rides of 'a', then 6 rides of 'b' and 'c' (24 units of time), and one ride of 'e' (6 units of time)
+    assert solution == {'a': 3.0, 'b': 3.0, 'c': 3.0, 'd': 0.0, 'e': 1.0, 'f': 0.0}
+    assert sum(solution.values()) == sum(full_park.maximize_rides(full_park.set_ride_weights()).values())
+
+# Test that dominated rides are removed when rides can be repeated any number of times
+def test_remove_dominated():
+    user_preferences = up.UserPreferences(required_rides=['e'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    park = ct.OptimizeConstant(rides[1:], wait_times[1:], user_preferences)
+    presolve = ps.Presolve(park.set_ride_weights(), user_preferences, "maximize").run()
+    # 'f' is the cheapest ride, and 'e' is required, so only 'd' is fixed (too long) and 'b', 'c' are dominated by 'f'
+    assert presolve.set_rides() == ['e', 'f']
+    assert park.maximize_rides(park.set_ride_weights()) == {'b': 0.0, 'c': 0.0, 'd': 0.0, 'e': 1.0, 'f': 8.0}
+
+# Test that a required ride longer than the max time is found infeasible without building a model
+def test_required_ride_too_long():
+    user_preferences = up.UserPreferences(required_rides=['d'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=30, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    assert park.maximize_rides(park.set_ride_weights()) == None
+    assert park.last_report == None
+
+# Test that zero wait rides count towards the min total rides and min distinct rides of the minimization problem
+def test_minimize_with_fixed_rides():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=2, max_ride_repeats=2, max_time=None, min_total_rides=4)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+    full_park = ct.OptimizeConstant(rides, wait_times, user_preferences, presolve=False)
+    solution = park.minimize_time(park.set_ride_weights())
+    assert solution == {'a': 2.0, 'b': 0.0, 'c': 0.0, 'd': 0.0, 'e': 0.0, 'f': 2.0}
+    assert solution == full_park.minimize_time(full_park.set_ride_weights())
+
+# Test that merged rides in the dynamic problem are split per time step, without going over the max ride repeats
+def test_dynamic_merge():
+    dynamic_rides = ['a', 'b', 'c']
+    dynamic_wait_times = {1: [2, 2, 9], 2: [5, 5, 0]}
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=4, max_time=None, min_total_rides=None)
+    park = dt.OptimizeDynamic(dynamic_rides, 2, 10, dynamic_wait_times, user_preferences)
+    full_park = dt.OptimizeDynamic(dynamic_rides, 2, 10, dynamic_wait_times, user_preferences, presolve=False)
+    solution = park.maximize_rides(park.set_ride_weights())
+    for ride in dynamic_rides:
+        assert solution[ride, 1] + solution[ride, 2] <= 4
+    assert sum(solution.values()) == sum(full_park.maximize_rides(full_park.set_ride_weights()).values())
+    # 'c' has no wait in the second time step, so it is fixed at 4 rides there
+    assert (solution['c', 1], solution['c', 2]) == (0.0, 4.0)
+
+# Test that a max ride repeats of 0 allows no rides at all, with or without the presolve and with the DP
+def test_no_repeats():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=0, max_time=20, min_total_rides=None)
+    zeros = {ride: 0.0 for ride in rides}
+    for presolve in (True, False):
+        park = ct.OptimizeConstant(rides, wait_times, user_preferences, presolve=presolve)
+        assert park.maximize_rides(park.set_ride_weights()) == zeros
+    assert {ride: float(times) for ride, times in park.maximize_rides(park.set_ride_weights(), solver="dp").items()} == zeros
+    # A required ride cannot be ridden with no repeats
+    user_preferences.required_rides = ['b']
+    assert ps.Presolve(park.set_ride_weights(), user_preferences, "maximize").run().infeasible
@@ -0,0 +1,85 @@
+import numpy as np
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.robust as rs
+import optimization.robustness as rb
+import optimization.solvers as sv
+import optimization.user_preferences as up
+from benchmarks import parks as bp
+
+user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=6, max_time=60, min_total_rides=2)
+park = ct.OptimizeConstant(['a', 'b'], [10, 20], user_preferences)
+# 'a' takes 30 minutes instead of 10 in one scenario out of 10
+scenarios = [[10, 20]] * 9 + [[30, 20]]
+
+# Test that the chance constraint may ignore the scenarios within 1 - confidence, and that the cvar constraint (the mean of the worst 10%) cannot
+def test_scenarios():
+    plan = rs.RobustOptimizer(park, scenarios, confidence=0.9, method="saa").maximize_rides()
+    assert plan == {'a': 6.0, 'b': 0.0}
+    robust = rs.RobustOptimizer(park, scenarios, confidence=0.95, method="saa")
+    plan = robust.maximize_rides()
+    assert sum(plan.values()) == 3 and robust.set_violation_probability(plan) == 0
+    robust = rs.RobustOptimizer(park, scenarios, confidence=0.9)
+    assert robust.method == "cvar" and sum(robust.maximize_rides().values()) == 3
+    # The minimization problem goes on the min total rides with the least time in 90% of the scenarios
+    assert rs.RobustOptimizer(park, scenarios, confidence=0.9, method="saa").minimize_time() == {'a': 2.0, 'b': 0.0}
+
+# Test that the budgeted method plans for the expected weights with a gamma of 0, and for the top of every interval with a gamma of the number of rides
+def test_budgeted():
+    intervals = {'a': (5, 25), 'b': (15, 25)}
+    robust = rs.RobustOptimizer(park, intervals=intervals, gamma=0)
+    assert robust.maximize_rides() == {'a': 4.0, 'b': 0.0}
+    robust = rs.RobustOptimizer(park, intervals=intervals, gamma=2)
+    assert sum(robust.maximize_rides().values()) == 2
+    assert robust.set_violation_probability({'a': 2}) == None
+
+# Test that fast forward selection keeps one scenario of each cluster, with the probability of the whole cluster
+def test_reduce_scenarios():
+    scenarios = np.repeat(np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]]), [5, 3, 2], axis=0) + np.random.default_rng(0).normal(0, 0.1, (10, 2))
+    selected, probabilities = rs.reduce_scenarios(scenarios, np.full(10, 0.1), 3)
+    assert sorted(np.round(scenarios[selected, :] / 10).tolist()) == [[0, 0], [0, 1], [1, 0]]
+    assert sorted(np.round(probabilities, 6).tolist()) == [0.2, 0.3, 0.5]
+
+# Test that 200 scenarios of a 60 ride park with dynamic times are reduced and solved, with a plan that rarely overruns where the deterministic plan often does
+def test_dynamic_park():
+    park = bp.SyntheticPark(60, 4, "sparse", 0)
+    optimizer = dt.OptimizeDynamic(park.all_rides, park.time_steps, park.frequency, park.set_dynamic_wait_times(), park.user_preferences)
+    scenarios = rb.RobustnessEvaluator(optimizer.set_ride_weights(), seed=0).sample_weights(200)
+    robust = rs.RobustOptimizer(optimizer, scenarios, confidence=0.9)
+    plan = robust.maximize_rides()
+    assert robust.model_scenarios == 200 and robust.last_report.status == "Optimal"
+    assert set(plan.keys()) == set((ride, time_step) for ride in park.all_rides for time_step in range(1, 5))
+    assert robust.set_violation_probability(plan) <= 0.1
+    assert robust.set_violation_probability(optimizer.maximize_rides(optimizer.set_ride_weights())) > 0.5
+    plan = robust.minimize_time()
+    assert sum(plan.values()) >= park.user_preferences.min_total_rides
+
+# Test that a max ride repeats of 0 allows no rides, like the deterministic optimizer
+def test_no_repeats():
+    no_repeats = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=0, max_time=60, min_total_rides=None)
+    park = ct.OptimizeConstant(['a', 'b'], [10, 20], no_repeats)
+    for method in ("saa", "cvar"):
+        assert rs.RobustOptimizer(park, scenarios, method=method).maximize_rides() == {'a': 0.0, 'b': 0.0}
+    assert rs.RobustOptimizer(park, intervals={'a': (5, 25), 'b': (15, 25)}).maximize_rides() == {'a': 0.0, 'b': 0.0}
+
+# Test that a saa plan of the reduced scenarios is checked against all of them, and tightened until it holds the chance constraint
+def test_reduced_saa():
+    park = bp.SyntheticPark(60, 1, "sparse", 0)
+    optimizer = ct.OptimizeConstant(park.all_rides, park.set_constant_wait_times(), park.user_preferences)
+    scenarios = rb.RobustnessEvaluator(optimizer.set_ride_weights(), seed=0).sample_weights(200)
+    robust = rs.RobustOptimizer(optimizer, scenarios, method="saa")
+    plan = robust.maximize_rides()
+    assert robust.model_scenarios == 50 and robust.set_violation_probability(plan) <= 0.1
+    assert robust.violation_budget == 1 - robust.confidence and robust.reduce
+    plan = robust.minimize_time()
+    assert robust.model_scenarios == 50 and sum(plan.values()) >= park.user_preferences.min_total_rides
+
+# Test that the robust solves get the default time limit unless the solver config of the optimizer sets one
+def test_time_limit():
+    assert rs.RobustOptimizer(park, scenarios).set_solver_config().time_limit == rs.TIME_LIMIT
+    assert rs.RobustOptimizer(park, scenarios, time_limit=None).set_solver_config().time_limit == None
+    limited = ct.OptimizeConstant(['a', 'b'], [10, 20], user_preferences, solver_config=sv.SolverConfig(time_limit=3))
+    robust = rs.RobustOptimizer(limited, scenarios)
+    assert robust.set_solver_config().time_limit == 3 and limited.solver_config.time_limit == 3
+    robust.maximize_rides()
+    assert robust.last_report.set_proven_value()
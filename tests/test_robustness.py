@@ -0,0 +1,51 @@
+import time
+import numpy as np
+import optimization.constant_times as ct
+import optimization.robustness as rb
+import optimization.user_preferences as up
+
+ride_weights = {'a': 5, 'b': 10, 'c': 20, 'd': 30}
+
+# Test that with no uncertainty, every scenario takes the planned time and does every planned ride
+def test_no_uncertainty():
+    plan = {'a': 2, 'b': 1, 'c': 0, 'd': 1}
+    report = rb.RobustnessEvaluator(ride_weights, noise=0, drift=0, downtime=0, seed=0).evaluate(plan, budget=50, scenarios=100)
+    assert report.planned_time == 50 and report.planned_rides == 4
+    assert np.allclose(report.completion_times, 50)
+    assert np.all(report.ride_counts == 4)
+    assert report.set_overrun_probability() == 0.0
+
+# Test that a plan overruns more often the less slack it has, never counts more rides than planned, and is reproducible with a seed
+def test_overrun():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=3, max_time=60, min_total_rides=None)
+    park = ct.OptimizeConstant(list(ride_weights), list(ride_weights.values()), user_preferences)
+    plan = park.maximize_rides(park.set_ride_weights())
+    report = rb.evaluate_plan(park, plan, scenarios=2000, seed=1)
+    summary = report.summary()
+    assert summary["budget"] == 60 and summary["scenarios"] == 2000
+    # The plan takes 45 of the 60 minutes, so it overruns on some days, and on many days with no slack at all
+    assert 0 < summary["overrun_probability"] < 0.5
+    assert rb.RobustnessEvaluator(ride_weights, seed=1).evaluate(plan, budget=45, scenarios=2000).set_overrun_probability() > 0.2
+    assert np.all(report.ride_counts <= report.planned_rides)
+    assert summary["ride_count"]["p5"] < report.planned_rides
+    assert np.array_equal(rb.evaluate_plan(park, plan, scenarios=2000, seed=1).completion_times, report.completion_times)
+
+# Test that 10,000 scenarios of a dynamic plan with 80 rides take well under a second, with the overrun probability of each time step
+def test_dynamic_plan():
+    rides = [f'r{i}' for i in range(80)]
+    weights = {ride: [5 + (i % 7) + time_step for time_step in range(1, 5)] for i, ride in enumerate(rides)}
+    plan = {(ride, time_step): 1 for ride in rides[:20] for time_step in range(1, 5)}
+    evaluator = rb.RobustnessEvaluator(weights, seed=2)
+    start = time.perf_counter()
+    report = evaluator.evaluate(plan, budget=None, scenarios=10000, frequency=200)
+    assert time.perf_counter() - start < 1
+    probabilities = report.set_step_overrun_probabilities()
+    assert len(probabilities) == 4 and all(0 <= probability <= 1 for probability in probabilities)
+    assert report.step_times.shape == (10000, 4)
+    assert np.allclose(report.step_times.sum(axis=1), report.completion_times)
+
+# Test that sampled ride weights have the shape of the weights, with the posted weights as their mean
+def test_sample_weights():
+    weights = rb.RobustnessEvaluator({'a': [10, 20, 30], 'b': [40, 50, 60]}, noise=0.2, drift=0.1, seed=3).sample_weights(20000)
+    assert weights.shape == (20000, 2, 3)
+    assert np.allclose(weights.mean(axis=0), [[10, 20, 30], [40, 50, 60]], rtol=0.02)
@@ -0,0 +1,57 @@
+import optimization.dynamic_times as dt
+import optimization.rolling_horizon as rh
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c']
+live_waits = {'a': 10, 'b': 20, 'c': 30}
+
+# Test that the first plan of the day is the same as solving the dynamic problem once
+def test_first_plan_matches_dynamic():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=2, max_ride_repeats=3, max_time=None, min_total_rides=None)
+    planner = rh.RollingHorizonPlanner(rides, 3, 60, user_preferences)
+    plan = planner.replan(live_waits, 0)
+    park = dt.OptimizeDynamic(rides, 3, 60, {1: [10, 20, 30], 2: [10, 20, 30], 3: [10, 20, 30]}, user_preferences)
+    assert sum(plan.values()) == sum(park.maximize_rides(park.set_ride_weights()).values())
+    assert planner.last_report.status == "Optimal"
+
+# Test that rides already taken count toward the preferences, and that the time steps that passed are closed
+def test_replan_with_taken_rides():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=2, max_ride_repeats=3, max_time=None, min_total_rides=None)
+    planner = rh.RollingHorizonPlanner(rides, 3, 60, user_preferences)
+    planner.replan(live_waits, 0)
+    # 70 minutes in, 'a' was taken twice and 'c' once, so only 50 minutes are left in the second time step
+    plan = planner.replan(live_waits, 70, taken=['a', 'a', 'c'])
+    assert all(plan[ride, 1] == 0 for ride in rides)
+    assert sum(plan[ride, 2] * live_waits[ride] for ride in rides) <= 50
+    assert plan['a', 2] + plan['a', 3] <= 1
+    assert sum(plan.values()) == 5
+    assert planner.time_spent == 50
+    # 'c' closes, so it cannot be planned in the current time step, and 'a' already reached its max ride repeats
+    plan = planner.replan({'a': 10, 'b': 20}, 130, taken=['a'])
+    assert planner.next_rides() == {'b': 2.0}
+    assert plan['a', 3] == 0 and plan['c', 3] == 0
+    # Once the day is over there is nothing left to plan
+    assert sum(planner.replan(live_waits, 190).values()) == 0
+
+# Test that the time steps after the current one come from the forecast
+def test_replan_with_forecast():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=None)
+    # 'c' is forecasted to have no line from the next time step on
+    forecast = lambda rides, time_steps, frequency: {time_step: [10, 20, 1] for time_step in range(1, time_steps+1)}
+    planner = rh.RollingHorizonPlanner(rides, 3, 60, user_preferences, forecast=forecast, time_cap=1)
+    plan = planner.replan(live_waits, 30)
+    assert planner.weights.column(1).tolist() == [10, 20, 30]
+    assert planner.weights.column(3).tolist() == [10, 20, 1]
+    assert (plan['a', 1], plan['c', 2], plan['c', 3]) == (3.0, 60.0, 60.0)
+    # Every re-plan is capped by the solver time limit
+    assert planner.solver_config.time_limit == 1
+    assert planner.latency < 1
+
+# Test that the minimization problem only plans the rides that are still missing
+def test_replan_minimize_time():
+    user_preferences = up.UserPreferences(required_rides=['b'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=4)
+    planner = rh.RollingHorizonPlanner(rides, 2, 60, user_preferences, objective="minimize")
+    assert planner.replan(live_waits, 0) == {('a', 1): 3.0, ('a', 2): 0.0, ('b', 1): 1.0, ('b', 2): 0.0, ('c', 1): 0.0, ('c', 2): 0.0}
+    plan = planner.replan(live_waits, 65, taken=['b', ('a', 12), 'a'])
+    assert plan == {('a', 1): 0.0, ('a', 2): 1.0, ('b', 1): 0.0, ('b', 2): 0.0, ('c', 1): 0.0, ('c', 2): 0.0}
+    assert planner.history[1] == ('a', 1, 12)
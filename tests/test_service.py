@@ -0,0 +1,45 @@
+import asyncio
+import requests
+import benchmarks.load as bl
+import optimization.service as svc
+
+body = {"objective": "maximize", "rides": ["a", "b", "c"], "wait_times": [10, 20, 30], "preferences": {"max_time": 60, "required_rides": ["c"]}}
+
+# Test that a request lists every problem with it, and that a valid request is solved
+def test_validate_request():
+    problem, errors = svc.validate_request({"objective": "minimize", "rides": ["a", "b"], "wait_times": [-1, 5], "preferences": {"avoid_rides": ["z"], "speed": 1}, "deadline": 0}, 300)
+    assert problem == None
+    assert errors == ["wait_times must only have finite non-negative numbers", "Unknown preferences: speed", "avoid_rides must be a list of names from rides", "min_total_rides is required to minimize the time", "deadline must be a number of seconds in (0, 300]"]
+    problem, errors = svc.validate_request(body, 300)
+    assert errors == [] and problem["preferences"]["required_rides"] == ["c"]
+    result = svc.solve_problem(problem, float("inf"))
+    assert result["status"] == "optimal" and result["plan"] == {"a": 3, "b": 0, "c": 1} and result["objective"] == 4
+
+# Test that identical requests in flight share one solve, and that new solves past the capacity are rejected
+def test_coalescing_and_backpressure():
+    service = svc.OptimizationService(workers=1, queue_size=1, processes=False)
+
+    async def send():
+        return await asyncio.gather(*[service.optimize(body) for _ in range(3)], service.optimize(dict(body, wait_times=[5, 5, 5])), service.optimize(dict(body, wait_times=[6, 5, 5])))
+
+    responses = asyncio.run(send())
+    service.close()
+    assert [status for status, _, _ in responses] == [200, 200, 200, 200, 429]
+    assert [payload["coalesced"] for _, payload, _ in responses[:3]] == [False, True, True]
+    assert responses[0][1]["plan"] == responses[2][1]["plan"]
+    assert responses[4][2] == [(b"retry-after", b"1")]
+    assert service.stats()["solves"] == 2 and service.stats()["pending"] == 0
+
+# Test that a request past its deadline gets a 504 response, and that a dynamic problem is served over HTTP
+def test_deadlines_and_http():
+    service = svc.OptimizationService(workers=1, processes=False)
+    status, payload, _ = asyncio.run(service.optimize(dict(body, deadline=1e-6)))
+    assert status == 504
+    url = bl.start_service(service)
+    dynamic_body = {"time_assumption": "dynamic", "objective": "maximize", "rides": ["a", "b"], "wait_times": [[10, 20], [20, 5]], "frequency": 30, "preferences": {"required_rides": ["a"]}}
+    response = requests.post(f"{url}/v1/optimize", json=dynamic_body, timeout=60)
+    assert response.status_code == 200
+    assert response.json()["plan"] == {"a": [3, 0], "b": [0, 6]}
+    assert requests.post(f"{url}/v1/optimize", data="{", timeout=60).status_code == 400
+    assert requests.get(f"{url}/healthz", timeout=60).json()["timeouts"] == 1
+    service.close()
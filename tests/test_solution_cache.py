@@ -0,0 +1,57 @@
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.solution_cache as sc
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c']
+wait_times = [2, 4, 6]
+
+def constant_park(max_time: int, required_rides=None):
+    user_preferences = up.UserPreferences(required_rides=required_rides, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=max_time, min_total_rides=None)
+    return ct.OptimizeConstant(rides, wait_times, user_preferences)
+
+# Test that identical inputs hit the cache, and that different inputs miss it
+def test_hits_and_misses():
+    cache = sc.SolutionCache()
+    park = constant_park(20)
+    assert cache.solve(park, "maximize_rides", park.set_ride_weights()) == {'a': 10.0, 'b': 0.0, 'c': 0.0}
+    assert cache.solve(constant_park(20), "maximize_rides", park.set_ride_weights()) == {'a': 10.0, 'b': 0.0, 'c': 0.0}
+    assert cache.solve(constant_park(30), "maximize_rides", park.set_ride_weights()) == {'a': 15.0, 'b': 0.0, 'c': 0.0}
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+# Test that the order of the required rides does not change the cache key, while the objective does
+def test_canonical_keys():
+    cache = sc.SolutionCache()
+    first = constant_park(30, ['a', 'b'])
+    second = constant_park(30, ['b', 'a'])
+    ride_weights = first.set_ride_weights()
+    assert cache.set_key(first, "maximize_rides", ride_weights) == cache.set_key(second, "maximize_rides", ride_weights)
+    assert cache.set_key(first, "maximize_rides", ride_weights) != cache.set_key(first, "minimize_time", ride_weights)
+
+# Test that infeasible solutions (None) are cached too
+def test_cached_none():
+    cache = sc.SolutionCache()
+    park = constant_park(None)
+    assert cache.solve(park, "maximize_rides", park.set_ride_weights()) == None
+    assert cache.solve(park, "maximize_rides", park.set_ride_weights()) == None
+    assert cache.stats()["hits"] == 1
+
+# Test the LRU and TTL evictions
+def test_evictions():
+    cache = sc.SolutionCache(maxsize=1)
+    cache.put("first", 1)
+    cache.put("second", 2)
+    assert cache.get("first") == (False, None)
+    assert cache.get("second") == (True, 2)
+    expired_cache = sc.SolutionCache(ttl=-1)
+    expired_cache.put("first", 1)
+    assert expired_cache.get("first") == (False, None)
+
+# Test that the on-disk backend survives a new cache instance (e.g., after a process restart)
+def test_disk_backend(tmp_path):
+    park = dt.OptimizeDynamic(all_rides=rides, time_steps=2, frequency=100, wait_times={1: [2, 4, 6], 2: [5, 3, 7]}, user_preferences=up.UserPreferences(max_time=200))
+    ride_weights = park.set_ride_weights()
+    solution = sc.SolutionCache(directory=str(tmp_path)).solve(park, "maximize_rides", ride_weights)
+    restarted_cache = sc.SolutionCache(directory=str(tmp_path))
+    assert restarted_cache.solve(park, "maximize_rides", ride_weights) == solution
+    assert restarted_cache.stats()["hits"] == 1
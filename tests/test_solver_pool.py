@@ -0,0 +1,73 @@
+import asyncio
+import time
+import numpy as np
+import pulp
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.solver_pool as sp
+import optimization.solvers as sv
+import optimization.user_preferences as up
+
+# Returns the maximization problem of a park that CBC takes well over 10 seconds to prove optimal
+def hard_problem():
+    random = np.random.RandomState(1)
+    rides = [f"ride {i}" for i in range(80)]
+    wait_times = {t: random.randint(5, 90, 80).tolist() for t in range(1, 17)}
+    user_preferences = up.UserPreferences(required_rides=rides[:10], avoid_rides=rides[10:12], min_distinct_rides=40, max_ride_repeats=1, max_time=None, min_total_rides=None)
+    park = dt.OptimizeDynamic(rides, 16, 60, wait_times, user_preferences, presolve=False)
+    return park.build_maximize_problem(park.set_ride_weights())[0]
+
+# Test that a solve in the pool gives the same solution as a solve in the current process
+def test_pool_solve():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=2, max_ride_repeats=3, max_time=60, min_total_rides=None)
+    with sp.SolverPool(workers=1) as pool:
+        park = ct.OptimizeConstant(['a', 'b', 'c'], [5, 10, 20], user_preferences, solver_config=sv.SolverConfig(pool=pool), presolve=False)
+        solution = park.maximize_rides(park.set_ride_weights())
+        assert park.last_report.status == "Optimal" and park.last_report.set_proven_value()
+        assert pool.stats()["solves"] == 1
+    park = ct.OptimizeConstant(['a', 'b', 'c'], [5, 10, 20], user_preferences, presolve=False)
+    assert solution == park.maximize_rides(park.set_ride_weights())
+
+# Test that a solve stops at its deadline with the best plan found so far, and that a solve still queued at its deadline is skipped
+def test_pool_deadlines():
+    prob = hard_problem()
+    small = pulp.LpProblem("small", pulp.LpMaximize)
+    x = pulp.LpVariable("x", lowBound=0, upBound=3, cat=pulp.LpInteger)
+    small += x
+    with sp.SolverPool(workers=1, grace=0.5) as pool:
+        start = time.perf_counter()
+        future = pool.submit(prob, deadline=2)
+        queued = pool.submit(small, deadline=0.5)
+        report = future.result()
+        assert time.perf_counter() - start < 3
+        assert report.status == "Optimal" and not report.set_proven_value()
+        assert pulp.value(prob.objective) > 0
+        assert queued.result().status == "Not Solved" and x.varValue == None
+        assert pool.stats()["expired"] == 1
+
+# Test that cancelling an awaited solve kills its worker, and that a new worker takes its place
+def test_pool_cancel():
+    prob = hard_problem()
+    with sp.SolverPool(workers=1) as pool:
+        pid = pool.workers[0].process.pid
+
+        async def cancel():
+            task = asyncio.ensure_future(pool.solve_async(prob, deadline=60))
+            await asyncio.sleep(0.5)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return True
+
+        start = time.perf_counter()
+        assert asyncio.run(cancel())
+        assert time.perf_counter() - start < 2
+        # The worker is replaced in the background, right after the awaitable is cancelled
+        while pool.stats()["pending"] > 0 and time.perf_counter() - start < 5:
+            time.sleep(0.05)
+        assert pool.stats()["cancelled"] == 1 and pool.workers[0].process.pid != pid
+        small = pulp.LpProblem("small", pulp.LpMaximize)
+        x = pulp.LpVariable("x", lowBound=0, upBound=3, cat=pulp.LpInteger)
+        small += x
+        assert pool.solve(small).status == "Optimal" and x.varValue == 3
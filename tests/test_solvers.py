@@ -0,0 +1,88 @@
+import pytest
+import optimization.constant_times as ct
+import optimization.dynamic_times as dt
+import optimization.persistent_model as pm
+import optimization.solvers as sv
+import optimization.user_preferences as up
+
+rides = ['a', 'b', 'c']
+wait_times = [2, 4, 6]
+dynamic_wait_times = {1: [2, 4, 6], 2: [5, 3, 7]}
+
+# Skip the HiGHS tests when highspy is not installed
+requires_highs = pytest.mark.skipif(not sv.SolverConfig("highs").set_available_value(), reason="highspy is not installed")
+
+# Test that an unknown backend is rejected
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        sv.SolverConfig("gurobi")
+
+# Test that the default configuration keeps the previous CBC results, and reports the status, wall time and gap of the solve
+def test_cbc_report():
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=3, max_ride_repeats=None, max_time=20, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences, solver_config=sv.SolverConfig("cbc", threads=1))
+    assert park.last_report == None
+    # Riding 'b' and 'c' once each leaves 10 units of time for 5 rides of 'a'
+    assert park.maximize_rides(park.set_ride_weights()) == {'a': 5.0, 'b': 1.0, 'c': 1.0}
+    assert park.last_report.status == "Optimal"
+    assert park.last_report.set_proven_value()
+    assert park.last_report.gap == 0.0
+    assert park.last_report.wall_time > 0
+
+# Test that the gap of a CBC solve is read from the final bound in its log, and is None when the log has no solution or no bound
+def test_cbc_gap():
+    assert sv.read_cbc_gap("Result - Optimal solution found\n\nObjective value:                10.00000000\nEnumerated nodes:               0\n") == 0.0
+    assert sv.read_cbc_gap("Result - Stopped on time limit\n\nObjective value:                8.00000000\nUpper bound:                    10.000\nGap:                            -0.20\n") == 0.25
+    assert sv.read_cbc_gap("Result - Stopped on time limit\n\nObjective value:                10.00000000\nLower bound:                    8.000\n") == 0.2
+    assert sv.read_cbc_gap("Result - Stopped on time limit\n\nObjective value:                10.00000000\n") == None
+    assert sv.read_cbc_gap("Result - Problem proven infeasible\n") == None
+    # A solve that stops at its gap tolerance reports the gap it reached, and without the log only a proven optimal solution has a known gap
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=3, max_ride_repeats=None, max_time=20, min_total_rides=None)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences, solver_config=sv.SolverConfig("cbc", gap_rel=0.5))
+    park.maximize_rides(park.set_ride_weights())
+    assert park.last_report.gap != None and park.last_report.gap <= 0.5
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences, solver_config=sv.SolverConfig("cbc", gap_rel=0.5, msg=True))
+    park.maximize_rides(park.set_ride_weights())
+    assert park.last_report.gap == None
+
+# Test that HiGHS gives the same optimal number of rides as CBC for both optimizers
+@requires_highs
+def test_highs_matches_cbc():
+    user_preferences = up.UserPreferences(required_rides=['c'], avoid_rides=None, min_distinct_rides=2, max_ride_repeats=20, max_time=150, min_total_rides=None)
+    for solver_config in [sv.SolverConfig("highs"), sv.SolverConfig("highs", threads=1, time_limit=10, gap_rel=0.0)]:
+        park = ct.OptimizeConstant(rides, wait_times, user_preferences, solver_config=solver_config)
+        fresh_park = ct.OptimizeConstant(rides, wait_times, user_preferences)
+        assert sum(park.maximize_rides(park.set_ride_weights()).values()) == sum(fresh_park.maximize_rides(fresh_park.set_ride_weights()).values())
+        assert park.last_report.backend == "highs"
+        assert park.last_report.gap == 0.0
+
+        park = dt.OptimizeDynamic(rides, 2, 100, dynamic_wait_times, user_preferences, solver_config=solver_config)
+        fresh_park = dt.OptimizeDynamic(rides, 2, 100, dynamic_wait_times, user_preferences)
+        assert sum(park.maximize_rides(park.set_ride_weights()).values()) == sum(fresh_park.maximize_rides(fresh_park.set_ride_weights()).values())
+
+# Test that infeasible problems still return None with HiGHS, and that the report says why
+@requires_highs
+def test_highs_infeasible():
+    user_preferences = up.UserPreferences(required_rides=['b', 'c'], avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=None)
+    # Both required rides only fit in the first time step, where together they take longer than the time step
+    park = dt.OptimizeDynamic(rides, 2, 8, {1: [2, 4, 6], 2: [5, 9, 9]}, user_preferences, solver_config=sv.SolverConfig("highs"))
+    assert park.maximize_rides(park.set_ride_weights()) == None
+    assert park.last_report.status == "Infeasible"
+    assert park.last_report.gap == None
+
+# Test that a persistent model solves with its own solver configuration, and that the optimizer exposes the report
+@requires_highs
+def test_persistent_model_with_highs():
+    model = pm.PersistentModel(rides, "minimize", solver_config=sv.SolverConfig("highs"))
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=5)
+    park = ct.OptimizeConstant(rides, wait_times, user_preferences, model=model)
+    assert park.minimize_time(park.set_ride_weights()) == {'a': 5.0, 'b': 0.0, 'c': 0.0}
+    assert park.last_report is model.last_report
+    assert park.last_report.backend == "highs"
+
+# Test that prewarming runs a trivial solve once per backend and process
+def test_prewarm():
+    sv.prewarmed.discard("cbc")
+    assert sv.prewarm() > 0
+    assert "cbc" in sv.prewarmed
+    assert sv.prewarm(sv.SolverConfig("cbc", time_limit=5)) == 0
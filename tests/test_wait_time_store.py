@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pyarrow.parquet as pq
+import optimization.dynamic_times as dt
+import optimization.user_preferences as up
+import optimization.wait_time_store as ws
+
+# Midnight UTC of a day, so that the time steps below line up with hours
+start = 1_700_006_400
+
+def snapshot(waits: dict, inactive: list = []) -> list:
+    return [{"name": ride, "active": ride not in inactive, "waitTime": wait} for ride, wait in waits.items()]
+
+# Test that the average wait time of each ride in each time step is returned as a rides x time steps matrix
+def test_query_matrix(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path))
+    store.record("Park", snapshot({"b": 10, "a": 20}), start)
+    store.record("Park", snapshot({"b": 30, "a": 40}), start + 1800)
+    store.record("Park", snapshot({"b": 50, "a": 60}), start + 3600)
+    store.flush()
+    weights = store.query("Park", start, 2, 60)
+    # Rides are sorted by name, and each column averages the snapshots of one hour
+    assert weights.rides == ['a', 'b']
+    assert weights.matrix.tolist() == [[30.0, 60.0], [20.0, 50.0]]
+    assert weights.to_wait_times() == {1: [30.0, 20.0], 2: [60.0, 50.0]}
+
+# Test that inactive rides and missing time steps are filled from the closest time step with data
+def test_query_fills_missing(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path))
+    store.record("Park", snapshot({"a": 10, "b": None}), start + 3600)
+    store.record("Park", snapshot({"a": 99, "b": 20}, inactive=["a"]), start + 7200)
+    weights = store.query("Park", start, 4, 60, rides=['a', 'b', 'c'])
+    assert weights.matrix.tolist() == [[10.0, 10.0, 10.0, 10.0], [20.0, 20.0, 20.0, 20.0], [0.0, 0.0, 0.0, 0.0]]
+
+# Test that buffered rows and rows written to disk are both queried, and that compaction keeps one file per date
+def test_flush_and_compact(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path), flush_rows=4)
+    for minute in range(10):
+        store.record("Big Park", snapshot({"a": minute, "b": 2 * minute}), start + 86400 - 300 + minute * 60)
+    partitions = sorted(os.listdir(os.path.join(str(tmp_path), "park=Big%20Park")))
+    # The snapshots cross midnight, so they are split between two dates
+    assert partitions == ["date=2023-11-15", "date=2023-11-16"]
+    weights = store.query("Big Park", start + 86400 - 300, 1, 10)
+    assert weights.matrix.tolist() == [[4.5], [9.0]]
+
+    store.compact("Big Park")
+    for partition in partitions:
+        files = os.listdir(os.path.join(str(tmp_path), "park=Big%20Park", partition))
+        assert len(files) == 1
+        # Ride names are stored dictionary-encoded
+        assert str(pq.read_schema(os.path.join(str(tmp_path), "park=Big%20Park", partition, files[0])).field("ride").type) == "dictionary<values=string, indices=int32, ordered=0>"
+    assert store.query("Big Park", start + 86400 - 300, 1, 10).matrix.tolist() == [[4.5], [9.0]]
+
+# Test that a buffer is written once its oldest row is flush_interval seconds old, and that open stores are flushed when the interpreter exits
+def test_flush_interval(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path / "interval"), flush_interval=0)
+    store.record("Park", snapshot({"a": 10}), start)
+    assert store.buffers == {} and os.listdir(os.path.join(str(tmp_path), "interval", "park=Park", "date=2023-11-15"))
+    code = "; ".join([
+        "import optimization.wait_time_store as ws",
+        f"store = ws.WaitTimeStore({str(tmp_path / 'exit')!r})",
+        f"store.record('Park', [{{'name': 'a', 'active': True, 'waitTime': 10}}], {start})",
+    ])
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+    assert ws.WaitTimeStore(str(tmp_path / "exit"), flush_at_exit=False).read("Park", start, start + 1).num_rows == 1
+
+# Test that the matrix can be given to OptimizeDynamic as its wait times
+def test_query_for_optimize_dynamic(tmp_path):
+    store = ws.WaitTimeStore(str(tmp_path))
+    for hour in range(3):
+        store.record("Park", snapshot({"a": 5 + hour, "b": 8 - hour}), start + hour * 3600)
+    weights = store.query("Park", start, 3, 60)
+    user_preferences = up.UserPreferences(required_rides=None, avoid_rides=None, min_distinct_rides=None, max_ride_repeats=None, max_time=None, min_total_rides=None)
+    park = dt.OptimizeDynamic(weights.rides, 3, 60, weights.to_wait_times(), user_preferences)
+    assert np.array_equal(park.set_ride_weights().matrix, weights.matrix)
+    solution = park.maximize_rides(park.set_ride_weights())
+    # 'a' is cheaper in the first two hours, and 'b' in the last one
+    assert (solution['a', 1], solution['a', 2], solution['b', 3]) == (12.0, 10.0, 10.0)